@@ -2,16 +2,22 @@
 Add missing stock symbols to nasdaq_top100 and nse_500 tables.
 - NASDAQ: Top 2000 US stocks by market cap from nasdaq.com screener API
 - NSE: Top 2000 Indian stocks from NSE India index APIs + all-equity listing
-Fetches company_name, sector, industry, sub_industry from yfinance.
+Fetches company_name, sector, industry, sub_industry from yfinance (concurrently, with an
+on-disk cache - see metadata_resolver.py) and inserts the new tickers in one bulk MERGE per table.
 All new tickers get process_flag='Y'.
 """
+import logging
+import pandas as pd
 import pyodbc
 import requests
-import yfinance as yf
 import time
-import csv
-import io
 from datetime import datetime
+from io import StringIO
+from metadata_resolver import resolve_metadata
+from sql_loader import bulk_merge
+
+TICKER_COLUMNS = ['ticker', 'company_name', 'process_flag', 'sector', 'industry', 'sub_industry']
+NSE_EQUITY_LIST_URL = "https://archives.nseindia.com/content/equities/EQUITY_L.csv"
 
 
 def get_connection():
@@ -29,10 +35,11 @@ def get_existing_tickers(cursor, table_name):
 
 
 # ─── NASDAQ: Top 2000 by market cap from screener API ────────────────
-def fetch_nasdaq_top2000():
+def fetch_nasdaq_screener(names=None, errors=None):
     """
-    Fetch all US stocks from NASDAQ screener API across 3 exchanges,
-    parse market cap, sort descending, return top 2000 symbols.
+    Fetch all US stocks from NASDAQ screener API across 3 exchanges (not capped by rank):
+    list of (symbol, market_cap). If a `names` dict is passed it is filled with
+    {symbol: company name}; an `errors` list gets one entry per exchange that failed.
     """
     print("Fetching US stocks from NASDAQ screener API...")
     
@@ -40,6 +47,7 @@ def fetch_nasdaq_top2000():
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Accept': 'application/json',
     }
+    errors = errors if errors is not None else []
     
     stocks = []  # list of (symbol, market_cap_float)
     
@@ -64,11 +72,29 @@ def fetch_nasdaq_top2000():
                         mcap = 0
                     
                     stocks.append((sym, mcap))
+                    if names is not None:
+                        names[sym] = (row.get('name') or '').strip() or None
                     count += 1
                 print(f"  {exchange.upper()}: {count} stocks")
+                if not count:
+                    errors.append(f"{exchange.upper()}: no rows returned")
+            else:
+                print(f"  {exchange.upper()}: HTTP {resp.status_code}")
+                errors.append(f"{exchange.upper()}: HTTP {resp.status_code}")
             time.sleep(1)
         except Exception as e:
             print(f"  {exchange.upper()}: error - {e}")
+            errors.append(f"{exchange.upper()}: {e}")
+    
+    return stocks
+
+
+def fetch_nasdaq_top2000(names=None, errors=None):
+    """
+    Top 2000 symbols by market cap from the NASDAQ screener (see fetch_nasdaq_screener
+    for `names` / `errors`).
+    """
+    stocks = fetch_nasdaq_screener(names, errors)
     
     # Sort by market cap descending, take top 2000
     stocks.sort(key=lambda x: x[1], reverse=True)
@@ -99,8 +125,12 @@ def create_nse_session():
     return session
 
 
-def fetch_nse_from_indices(session):
-    """Fetch NSE stock symbols from all available index APIs."""
+def fetch_nse_from_indices(session, names=None, errors=None):
+    """
+    Fetch NSE stock symbols from all available index APIs (company names into `names` if given,
+    one entry per failed index into `errors` if given).
+    """
+    errors = errors if errors is not None else []
     print("Fetching NSE stocks from index APIs...")
     
     tickers = set()
@@ -135,14 +165,18 @@ def fetch_nse_from_indices(session):
                     sym = item.get('symbol', '').strip()
                     if sym and not sym.startswith('NIFTY') and 'India VIX' not in sym:
                         tickers.add(sym)
+                        if names is not None and item.get('meta', {}).get('companyName'):
+                            names[sym] = item['meta']['companyName'].strip()
                 added_count = len(tickers) - before
                 if added_count > 0:
                     print(f"  {idx}: +{added_count} new (total: {len(tickers)})")
             else:
                 print(f"  {idx}: HTTP {resp.status_code}")
+                errors.append(f"{idx}: HTTP {resp.status_code}")
             time.sleep(1)
         except Exception as e:
             print(f"  {idx}: error - {e}")
+            errors.append(f"{idx}: {e}")
             # Re-init session if needed
             try:
                 session.get('https://www.nseindia.com/', timeout=15)
@@ -153,8 +187,12 @@ def fetch_nse_from_indices(session):
     return tickers
 
 
-def fetch_nse_sector_indices(session):
-    """Fetch stocks from NSE sector/thematic indices for broader coverage."""
+def fetch_nse_sector_indices(session, names=None, errors=None):
+    """
+    Fetch stocks from NSE sector/thematic indices for broader coverage (company names into
+    `names` if given, one entry per failed index into `errors` if given).
+    """
+    errors = errors if errors is not None else []
     print("Fetching NSE sector/thematic indices...")
     
     tickers = set()
@@ -189,17 +227,22 @@ def fetch_nse_sector_indices(session):
                     sym = item.get('symbol', '').strip()
                     if sym and not sym.startswith('NIFTY') and 'India VIX' not in sym:
                         tickers.add(sym)
+                        if names is not None and item.get('meta', {}).get('companyName'):
+                            names[sym] = item['meta']['companyName'].strip()
+            else:
+                errors.append(f"{idx}: HTTP {resp.status_code}")
             time.sleep(0.8)
-        except:
-            pass
+        except Exception as e:
+            errors.append(f"{idx}: {e}")
     
     print(f"  Sector/thematic indices added up to: {len(tickers)} unique symbols")
     return tickers
 
 
-def fetch_nse_all_equity(session):
-    """Try to get all NSE listed equities from market data APIs."""
+def fetch_nse_all_equity(session, errors=None):
+    """Try to get all NSE listed equities from market data APIs (failed calls into `errors` if given)."""
     print("Fetching NSE all-equity listing...")
+    errors = errors if errors is not None else []
     
     tickers = set()
     
@@ -215,10 +258,14 @@ def fetch_nse_all_equity(session):
                 if sym:
                     tickers.add(sym)
             print(f"  Pre-open ALL: {len(tickers)} symbols")
+        else:
+            errors.append(f"pre-open: HTTP {resp.status_code}")
     except Exception as e:
         print(f"  Pre-open error: {e}")
+        errors.append(f"pre-open: {e}")
     
     # Try all listed stocks by letter
+    failed_letters = []
     for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ':
         try:
             url = f'https://www.nseindia.com/api/equity-master?index=allAlpha&key={letter}'
@@ -230,162 +277,122 @@ def fetch_nse_all_equity(session):
                         sym = item.get('symbol', '').strip() if isinstance(item, dict) else ''
                         if sym:
                             tickers.add(sym)
+            else:
+                failed_letters.append(letter)
             time.sleep(0.3)
-        except:
-            pass
+        except Exception:
+            failed_letters.append(letter)
+    if failed_letters:
+        errors.append(f"equity-master: {len(failed_letters)}/26 letters failed ({''.join(failed_letters)})")
     
     if tickers:
         print(f"  All-equity listing: {len(tickers)} symbols")
     return tickers
 
 
-def fetch_nse_top2000():
-    """Combine multiple NSE sources to get as many stocks as possible."""
+def fetch_nse_top2000(names=None, errors=None):
+    """
+    Combine multiple NSE sources to get as many stocks as possible.
+    If a `names` dict is passed it is filled with {SYMBOL.NS: company name} where the index APIs report one;
+    an `errors` list gets every failed index / listing call.
+    """
     session = create_nse_session()
     
     all_tickers = set()
+    raw_names = {}
     
     # Method 1: Index-based
-    all_tickers |= fetch_nse_from_indices(session)
+    all_tickers |= fetch_nse_from_indices(session, raw_names, errors)
     
     # Method 2: Sector indices (re-init session as cookie may expire)
     session = create_nse_session()
-    all_tickers |= fetch_nse_sector_indices(session)
+    all_tickers |= fetch_nse_sector_indices(session, raw_names, errors)
     
     # Method 3: All equity listing
     session = create_nse_session()
-    all_tickers |= fetch_nse_all_equity(session)
+    all_tickers |= fetch_nse_all_equity(session, errors)
     
     # Add .NS suffix for yfinance compatibility
     result = set(f"{sym}.NS" for sym in all_tickers)
+    if names is not None:
+        names.update({f"{sym}.NS": name for sym, name in raw_names.items()})
     
     print(f"\n  Total unique NSE symbols collected: {len(result)}")
     return result
 
 
-# ─── yfinance details fetch ──────────────────────────────────────────
-def fetch_details_yf(ticker):
-    """Fetch company_name, sector, industry, sub_industry from yfinance."""
-    try:
-        info = yf.Ticker(ticker).info
-        name = info.get('longName') or info.get('shortName')
-        sector = info.get('sector') or None
-        industry = info.get('industry') or None
-        sub_industry = info.get('industryDisp') or info.get('industry') or None
-        return name, sector, industry, sub_industry
-    except Exception:
-        return None, None, None, None
-
-
-def insert_ticker(cursor, conn, table_name, ticker, name, sector, industry, sub_industry):
-    cursor.execute(
-        f"""INSERT INTO {table_name} 
-            (ticker, company_name, process_flag, sector, industry, sub_industry, last_updated) 
-            VALUES (?, ?, 'Y', ?, ?, ?, GETDATE())""",
-        ticker, name, sector, industry, sub_industry
-    )
-    conn.commit()
+def fetch_nse_equity_list(names=None):
+    """
+    Every equity listed on NSE from its published EQUITY_L.csv (not capped by index membership),
+    as SYMBOL.NS. If a `names` dict is passed it is filled with {SYMBOL.NS: company name}.
+    Raises on any failure, so a partial list is never mistaken for the full one.
+    """
+    print("Fetching NSE equity list (EQUITY_L.csv)...")
+    session = create_nse_session()
+    resp = session.get(NSE_EQUITY_LIST_URL, timeout=30)
+    resp.raise_for_status()
+    frame = pd.read_csv(StringIO(resp.text))
+    frame.columns = [str(c).strip() for c in frame.columns]
+    result = set()
+    for sym, name in zip(frame['SYMBOL'], frame.get('NAME OF COMPANY', pd.Series(None, index=frame.index))):
+        sym = str(sym).strip()
+        if not sym or sym == 'nan':
+            continue
+        result.add(f"{sym}.NS")
+        if names is not None and isinstance(name, str) and name.strip():
+            names[f"{sym}.NS"] = name.strip()
+    if not result:
+        raise ValueError(f"No symbols in {NSE_EQUITY_LIST_URL}")
+    print(f"  NSE equity list: {len(result)} symbols")
+    return result
 
 
-# ─── Process NASDAQ ──────────────────────────────────────────────────
-def process_nasdaq():
+# ─── Add missing tickers ─────────────────────────────────────────────
+def add_tickers(table_name, label, candidates):
+    """Resolve metadata for candidates not yet in table_name and insert them in one bulk MERGE."""
     conn = get_connection()
     cursor = conn.cursor()
     
-    existing = get_existing_tickers(cursor, 'nasdaq_top100')
-    print(f"\nExisting NASDAQ tickers in DB: {len(existing)}")
-    
-    top2000 = fetch_nasdaq_top2000()
+    existing = get_existing_tickers(cursor, table_name)
+    print(f"\nExisting {label} tickers in DB: {len(existing)}")
     
-    missing = sorted(top2000 - existing)
-    print(f"Missing tickers to add (top 2000 - existing): {len(missing)}")
+    missing = sorted(candidates - existing)
+    print(f"Missing {label} tickers to add: {len(missing)}")
     
     if not missing:
-        print("All top 2000 NASDAQ stocks are already in the DB!")
+        print(f"All collected {label} stocks are already in the DB!")
         cursor.close()
         conn.close()
         return 0
     
-    added = 0
-    skipped = 0
+    metadata, failures = resolve_metadata(missing)
+    rows = [(ticker, m['company_name'], 'Y', m['sector'], m['industry'], m['sub_industry'])
+            for ticker, m in metadata.items() if m]
+    skipped = [ticker for ticker, m in metadata.items() if not m]
+    for ticker in skipped:
+        print(f"  SKIPPED: {ticker} (yfinance returned no data)")
+    for ticker, error in sorted(failures.items()):
+        print(f"  FAILED: {ticker} ({error})")
     
-    for i, ticker in enumerate(missing):
-        name, sector, industry, sub_industry = fetch_details_yf(ticker)
-        if name:
-            try:
-                insert_ticker(cursor, conn, 'nasdaq_top100', ticker, name, sector, industry, sub_industry)
-                print(f"  [{i+1}/{len(missing)}] ADDED: {ticker} -> {name} | {sector} | {industry}")
-                added += 1
-            except pyodbc.IntegrityError:
-                print(f"  [{i+1}/{len(missing)}] DUPLICATE: {ticker}")
-                skipped += 1
-            except Exception as e:
-                print(f"  [{i+1}/{len(missing)}] DB ERROR: {ticker} - {e}")
-                skipped += 1
-        else:
-            print(f"  [{i+1}/{len(missing)}] SKIPPED: {ticker} (yfinance returned no data)")
-            skipped += 1
-        
-        if (i + 1) % 100 == 0:
-            print(f"\n  --- Progress: {i+1}/{len(missing)} | Added: {added} | Skipped: {skipped} ---\n")
-        time.sleep(0.15)
-    
-    print(f"\nNASDAQ: Added={added}, Skipped={skipped}")
+    added, _ = bulk_merge(conn, table_name, TICKER_COLUMNS, ['ticker'], rows, mode='insert',
+                          extra_set={'last_updated': 'GETDATE()'})
+    
+    print(f"\n{label}: Added={added}, Skipped={len(skipped)}, Failed={len(failures)}")
     cursor.close()
     conn.close()
     return added
 
 
-# ─── Process NSE ─────────────────────────────────────────────────────
+def process_nasdaq():
+    return add_tickers('nasdaq_top100', 'NASDAQ', fetch_nasdaq_top2000())
+
+
 def process_nse():
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    existing = get_existing_tickers(cursor, 'nse_500')
-    print(f"\nExisting NSE tickers in DB: {len(existing)}")
-    
-    nse_all = fetch_nse_top2000()
-    
-    missing = sorted(nse_all - existing)
-    print(f"Missing NSE tickers to add: {len(missing)}")
-    
-    if not missing:
-        print("All collected NSE stocks are already in the DB!")
-        cursor.close()
-        conn.close()
-        return 0
-    
-    added = 0
-    skipped = 0
-    
-    for i, ticker in enumerate(missing):
-        name, sector, industry, sub_industry = fetch_details_yf(ticker)
-        if name:
-            try:
-                insert_ticker(cursor, conn, 'nse_500', ticker, name, sector, industry, sub_industry)
-                print(f"  [{i+1}/{len(missing)}] ADDED: {ticker} -> {name} | {sector} | {industry}")
-                added += 1
-            except pyodbc.IntegrityError:
-                print(f"  [{i+1}/{len(missing)}] DUPLICATE: {ticker}")
-                skipped += 1
-            except Exception as e:
-                print(f"  [{i+1}/{len(missing)}] DB ERROR: {ticker} - {e}")
-                skipped += 1
-        else:
-            print(f"  [{i+1}/{len(missing)}] SKIPPED: {ticker} (yfinance returned no data)")
-            skipped += 1
-        
-        if (i + 1) % 100 == 0:
-            print(f"\n  --- Progress: {i+1}/{len(missing)} | Added: {added} | Skipped: {skipped} ---\n")
-        time.sleep(0.15)
-    
-    print(f"\nNSE: Added={added}, Skipped={skipped}")
-    cursor.close()
-    conn.close()
-    return added
+    return add_tickers('nse_500', 'NSE', fetch_nse_top2000())
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     print("=" * 70)
     print("ADD MISSING TICKERS (TOP 2000) TO nasdaq_top100 AND nse_500")
     print(f"Started: {datetime.now()}")
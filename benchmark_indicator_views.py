@@ -0,0 +1,156 @@
+"""
+Indicator View Benchmark
+========================
+Times the same screening queries against
+    baseline      the existing hand-written views      (e.g. forex_RSI_calculation)
+    generated     views from generate_indicator_views  (e.g. forex_gen_RSI_calculation)
+    materialized  the indicator/signals tables         (forex_indicators, signals)
+and prints min / median wall time and row counts per query.
+
+Create the generated copy side by side first, then benchmark:
+    python generate_indicator_views.py --market nse --prefix nse_500_gen --apply
+    python benchmark_indicator_views.py --market nse --candidate nse_500_gen
+
+Once create_<prefix>_views.sql has been applied, the market-prefix views are generated ones
+too (they are created WITH SCHEMABINDING, the hand-written ones are not); the benchmark
+refuses to use them as the baseline, and refuses a baseline equal to the candidate. The
+hand-written forex views are kept in create_forex_views_legacy.sql to restore the baseline.
+
+Usage:
+    python benchmark_indicator_views.py --market fx --candidate forex_gen --repeat 5
+    python benchmark_indicator_views.py --market nse --baseline nse_500 --candidate nse_500_gen --symbol RELIANCE.NS
+"""
+
+import argparse
+import statistics
+import time
+
+import pyodbc
+
+from generate_indicator_views import MARKETS
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+INDICATOR_TABLES = {'fx': 'forex_indicators', 'nasdaq': 'nasdaq_100_indicators', 'nse': 'nse_500_indicators'}
+
+
+def view_queries(prefix, sym, last_date_sql):
+    """Screening queries over one view family (prefix_RSI_calculation, prefix_ema_sma_view, ...)."""
+    return {
+        'latest RSI < 30, all symbols':
+            f"SELECT {sym}, RSI FROM dbo.{prefix}_RSI_calculation "
+            f"WHERE trading_date = ({last_date_sql}) AND RSI < 30",
+        'latest close > SMA200, all symbols':
+            f"SELECT {sym}, close_price, SMA_200 FROM dbo.{prefix}_ema_sma_view "
+            f"WHERE trading_date = ({last_date_sql}) AND close_price > SMA_200",
+        'latest MACD crossovers':
+            f"SELECT {sym}, MACD_Signal FROM dbo.{prefix}_macd_signals "
+            f"WHERE trading_date = ({last_date_sql}) AND MACD_Signal <> 'No Signal'",
+        'one symbol, full MACD history':
+            f"SELECT trading_date, MACD, Signal_Line FROM dbo.{prefix}_macd WHERE {sym} = ? ORDER BY trading_date",
+    }
+
+
+def materialized_queries(market, last_date_sql):
+    table = INDICATOR_TABLES[market]
+    return {
+        'latest RSI < 30, all symbols':
+            f"SELECT symbol, rsi_14 FROM {table} WHERE trading_date = ({last_date_sql}) AND rsi_14 < 30",
+        'latest close > SMA200, all symbols':
+            f"SELECT symbol, close_price, sma_200 FROM {table} "
+            f"WHERE trading_date = ({last_date_sql}) AND close_price > sma_200",
+        'latest MACD crossovers':
+            f"SELECT symbol, signal_type FROM signals WHERE trading_date = ({last_date_sql}) "
+            f"AND market = '{market}' AND signal_type IN ('macd_bullish_cross', 'macd_bearish_cross')",
+        'one symbol, full MACD history':
+            f"SELECT trading_date, macd, macd_signal FROM {table} WHERE symbol = ? ORDER BY trading_date",
+    }
+
+
+def object_exists(cursor, name):
+    cursor.execute("SELECT OBJECT_ID(?)", f"dbo.{name}")
+    return cursor.fetchone()[0] is not None
+
+
+def is_generated(cursor, prefix):
+    """True when prefix_RSI_calculation was created by generate_indicator_views (schema-bound)."""
+    cursor.execute("SELECT OBJECTPROPERTY(OBJECT_ID(?), 'IsSchemaBound')", f"dbo.{prefix}_RSI_calculation")
+    return cursor.fetchone()[0] == 1
+
+
+def time_query(cursor, sql, params, repeat):
+    """(min_ms, median_ms, rows) over `repeat` runs after one warm-up run."""
+    cursor.execute(sql, params).fetchall()
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(cursor.execute(sql, params).fetchall())
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), statistics.median(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark indicator views against generated views and tables')
+    parser.add_argument('--market', required=True, choices=sorted(MARKETS))
+    parser.add_argument('--baseline', help='Prefix of the existing views (default: market prefix)')
+    parser.add_argument('--candidate', help='Prefix of the generated views (default: <market prefix>_gen)')
+    parser.add_argument('--symbol', help='Symbol for the single-symbol query (default: first symbol)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query (default: 3)')
+    args = parser.parse_args()
+
+    config = MARKETS[args.market]
+    sym, table = config['symbol_column'], config['table']
+    baseline = args.baseline or config['prefix']
+    candidate = args.candidate or f"{config['prefix']}_gen"
+    if baseline == candidate:
+        parser.error(f"--baseline and --candidate are both {baseline}_*: nothing to compare")
+    last_date_sql = f"SELECT MAX(trading_date) FROM {table}"
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    cursor = conn.cursor()
+    if is_generated(cursor, baseline):
+        conn.close()
+        parser.error(f"baseline views {baseline}_* are generated (schema-bound), not the hand-written ones; "
+                     f"pass --baseline with a prefix of the original views")
+    symbol = args.symbol
+    if not symbol:
+        cursor.execute(f"SELECT MIN({sym}) FROM {table}")
+        symbol = cursor.fetchone()[0]
+
+    variants = []
+    for label, prefix in (('baseline', baseline), ('generated', candidate)):
+        if object_exists(cursor, f"{prefix}_RSI_calculation"):
+            variants.append((f"{label} ({prefix}_*)", view_queries(prefix, sym, last_date_sql)))
+        else:
+            print(f"⚠️  Skipping {label}: views {prefix}_* not found")
+    if object_exists(cursor, INDICATOR_TABLES[args.market]):
+        variants.append((f"materialized ({INDICATOR_TABLES[args.market]})",
+                         materialized_queries(args.market, last_date_sql)))
+    else:
+        print(f"⚠️  Skipping materialized: {INDICATOR_TABLES[args.market]} not found (run indicator_engine.py)")
+
+    print(f"\n📊 {args.market} indicator benchmark ({args.repeat} runs per query, symbol {symbol})")
+    print(f"{'query':<38} {'variant':<40} {'min ms':>10} {'median ms':>10} {'rows':>7}")
+    print("-" * 109)
+    for query_name in view_queries(baseline, sym, last_date_sql):
+        for variant_name, queries in variants:
+            sql = queries[query_name]
+            params = [symbol] if '?' in sql else []
+            try:
+                fastest, median, rows = time_query(cursor, sql, params, args.repeat)
+                print(f"{query_name:<38} {variant_name:<40} {fastest:>10.1f} {median:>10.1f} {rows:>7}")
+            except pyodbc.Error as e:
+                print(f"{query_name:<38} {variant_name:<40} ❌ {e}")
+        print()
+
+    cursor.close()
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,10 @@ Script to:
 2. Fetch top 1000 NASDAQ and NSE 1000 ticker lists
 3. Compare and find missing tickers
 4. Generate SQL INSERT scripts for the missing ones
+Step 1 also syncs symbol_master / symbol_map and reports duplicate or non-standard tickers.
 """
 import pyodbc
-import json
+from symbol_master import derive_source_symbol, get_resolver, sync_symbol_master
 
 conn = pyodbc.connect(
     'DRIVER={ODBC Driver 17 for SQL Server};'
@@ -55,13 +56,18 @@ print(f'Existing NSE tickers: {len(existing_nse)}')
 print('\nSample NASDAQ tickers:', sorted(existing_nasdaq)[:10])
 print('Sample NSE tickers:', sorted(existing_nse)[:10])
 
-# Check if NSE tickers have .NS suffix
-nse_with_ns = [t for t in existing_nse if t.endswith('.NS')]
-nse_without_ns = [t for t in existing_nse if not t.endswith('.NS')]
-print(f'\nNSE with .NS suffix: {len(nse_with_ns)}')
-print(f'NSE without .NS suffix: {len(nse_without_ns)}')
-if nse_without_ns:
-    print('NSE without .NS:', nse_without_ns[:5])
+# Resolve through the symbol master instead of checking suffixes by hand
+for market, existing in (('nasdaq', existing_nasdaq), ('nse', existing_nse)):
+    duplicates = sync_symbol_master(conn, market)
+    symbols = get_resolver(conn)
+    nonstandard = sorted(t for t in existing
+                         if t != derive_source_symbol(market, 'yfinance', symbols.canonical('yfinance', t, market))
+                         and t not in duplicates)
+    print(f'\n{market.upper()}: {len(existing) - len(duplicates)} instruments in symbol_master')
+    if duplicates:
+        print(f'  Duplicate tickers (same instrument as another row): {duplicates[:10]}')
+    if nonstandard:
+        print(f'  Tickers not in standard yfinance format: {nonstandard[:10]}')
 
 conn.close()
 print('\nDone. Now run step 2 to fetch top 1000 lists.')
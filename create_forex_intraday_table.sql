@@ -0,0 +1,57 @@
+-- =============================================
+-- Create Forex Intraday (sub-daily) Data Table for SQL Server
+-- H1 / M15 / M5 OANDA candles loaded by get_forex_intraday.py
+-- Monthly partitions on bar_time + PAGE compression keep it compact and
+-- let old months be switched out / truncated without touching recent data.
+-- =============================================
+
+USE stockdata_db;
+GO
+
+-- Monthly partition function (RANGE RIGHT: each boundary is the first instant of a month).
+-- Boundaries from 2024-01 through 2027-12; get_forex_intraday.py adds future months
+-- automatically (SPLIT RANGE) before loading.
+IF NOT EXISTS (SELECT * FROM sys.partition_functions WHERE name = 'PF_forex_intraday_month')
+BEGIN
+    DECLARE @boundaries NVARCHAR(MAX) = N'';
+    DECLARE @month DATE = '2024-01-01';
+    WHILE @month <= '2027-12-01'
+    BEGIN
+        SET @boundaries = @boundaries
+            + CASE WHEN @boundaries = N'' THEN N'' ELSE N', ' END
+            + N'''' + CONVERT(NVARCHAR(10), @month, 120) + N'''';
+        SET @month = DATEADD(MONTH, 1, @month);
+    END
+    EXEC (N'CREATE PARTITION FUNCTION PF_forex_intraday_month (DATETIME2(0)) AS RANGE RIGHT FOR VALUES ('
+          + @boundaries + N')');
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.partition_schemes WHERE name = 'PS_forex_intraday_month')
+BEGIN
+    CREATE PARTITION SCHEME PS_forex_intraday_month
+        AS PARTITION PF_forex_intraday_month ALL TO ([PRIMARY]);
+END
+GO
+
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'forex_intraday_data')
+BEGIN
+    CREATE TABLE dbo.forex_intraday_data (
+        symbol VARCHAR(20) NOT NULL,                 -- forex_master symbol, e.g. 'EURUSD'
+        granularity VARCHAR(4) NOT NULL,             -- 'H1', 'M15', 'M5' ('M1' from the price stream)
+        bar_time DATETIME2(0) NOT NULL,              -- Candle open time (UTC)
+        open_price DECIMAL(18, 8) NOT NULL,
+        high_price DECIMAL(18, 8) NOT NULL,
+        low_price DECIMAL(18, 8) NOT NULL,
+        close_price DECIMAL(18, 8) NOT NULL,
+        volume INT NULL,                             -- Tick volume
+        CONSTRAINT PK_forex_intraday_data
+            PRIMARY KEY CLUSTERED (symbol, granularity, bar_time)
+            WITH (DATA_COMPRESSION = PAGE)
+            ON PS_forex_intraday_month (bar_time)
+    );
+END
+GO
+
+PRINT 'Forex intraday table created successfully!';
+GO
@@ -0,0 +1,365 @@
+-- ============================================
+-- NASDAQ_100 TECHNICAL INDICATOR VIEWS
+-- Generated by generate_indicator_views.py from dbo.nasdaq_100_hist_data; edit the generator, not this file.
+-- The same indicators are materialized per (symbol, trading_date) by indicator_engine.py,
+-- and the signal views as rows of the narrow signals table (signal_generator.py);
+-- prefer those tables for queries.
+-- ============================================
+
+-- Persisted numeric close: cast once on write instead of on every view query
+IF COL_LENGTH('dbo.nasdaq_100_hist_data', 'close_num') IS NULL
+    ALTER TABLE dbo.nasdaq_100_hist_data ADD close_num AS TRY_CAST(close_price AS FLOAT) PERSISTED;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_nasdaq_100_hist_data_close_num')
+    CREATE NONCLUSTERED INDEX IX_nasdaq_100_hist_data_close_num
+        ON dbo.nasdaq_100_hist_data (ticker, trading_date) INCLUDE (close_num);
+GO
+
+IF OBJECT_ID('dbo.nasdaq_100_sma_signals', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_sma_signals;
+IF OBJECT_ID('dbo.nasdaq_100_rsi_signals', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_rsi_signals;
+IF OBJECT_ID('dbo.nasdaq_100_macd_signals', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_macd_signals;
+IF OBJECT_ID('dbo.nasdaq_100_bb_signals', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_bb_signals;
+IF OBJECT_ID('dbo.nasdaq_100_atr_spikes', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_atr_spikes;
+IF OBJECT_ID('dbo.nasdaq_100_ema_sma_view', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_ema_sma_view;
+IF OBJECT_ID('dbo.nasdaq_100_atr', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_atr;
+IF OBJECT_ID('dbo.nasdaq_100_bollingerband', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_bollingerband;
+IF OBJECT_ID('dbo.nasdaq_100_macd', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_macd;
+IF OBJECT_ID('dbo.nasdaq_100_RSI_calculation', 'V') IS NOT NULL DROP VIEW dbo.nasdaq_100_RSI_calculation;
+GO
+
+-- 1. nasdaq_100_RSI_calculation
+CREATE VIEW dbo.nasdaq_100_RSI_calculation
+WITH SCHEMABINDING
+AS
+WITH GainsLosses AS (
+    SELECT
+        ticker,
+        trading_date,
+        close_num AS close_price,
+        LAG(close_num, 1) OVER (PARTITION BY ticker ORDER BY trading_date) AS prev_close
+    FROM dbo.nasdaq_100_hist_data
+    WHERE close_num IS NOT NULL
+),
+AvgGainsLosses AS (
+    SELECT
+        ticker,
+        trading_date,
+        AVG(CASE WHEN close_price > prev_close THEN close_price - prev_close ELSE 0 END)
+            OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS avg_gain,
+        AVG(CASE WHEN close_price < prev_close THEN prev_close - close_price ELSE 0 END)
+            OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS avg_loss
+    FROM GainsLosses
+)
+SELECT
+    ticker,
+    trading_date,
+    CASE
+        WHEN avg_loss = 0 THEN 100
+        ELSE 100 - (100 / (1 + (avg_gain / NULLIF(avg_loss, 0))))
+    END AS RSI
+FROM AvgGainsLosses;
+GO
+
+-- 2. nasdaq_100_macd
+CREATE VIEW dbo.nasdaq_100_macd
+WITH SCHEMABINDING
+AS
+WITH PriceData AS (
+    SELECT
+        ticker,
+        trading_date,
+        close_num AS close_price,
+        ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trading_date) AS RowNum
+    FROM dbo.nasdaq_100_hist_data
+    WHERE close_num IS NOT NULL
+),
+MACD_Calculations AS (
+    SELECT
+        p.ticker,
+        p.trading_date,
+        SUM(p.close_price * POWER(1 - (2.0 / 13), p.RowNum - 1))
+            OVER (PARTITION BY p.ticker ORDER BY p.trading_date ROWS BETWEEN 11 PRECEDING AND CURRENT ROW) /
+        NULLIF(SUM(POWER(1 - (2.0 / 13), p.RowNum - 1))
+            OVER (PARTITION BY p.ticker ORDER BY p.trading_date ROWS BETWEEN 11 PRECEDING AND CURRENT ROW), 0) AS EMA_12,
+        SUM(p.close_price * POWER(1 - (2.0 / 27), p.RowNum - 1))
+            OVER (PARTITION BY p.ticker ORDER BY p.trading_date ROWS BETWEEN 25 PRECEDING AND CURRENT ROW) /
+        NULLIF(SUM(POWER(1 - (2.0 / 27), p.RowNum - 1))
+            OVER (PARTITION BY p.ticker ORDER BY p.trading_date ROWS BETWEEN 25 PRECEDING AND CURRENT ROW), 0) AS EMA_26
+    FROM PriceData p
+),
+Signal_Line_Calculations AS (
+    SELECT
+        ticker,
+        trading_date,
+        EMA_12,
+        EMA_26,
+        EMA_12 - EMA_26 AS MACD,
+        AVG(EMA_12 - EMA_26) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 8 PRECEDING AND CURRENT ROW) AS Signal_Line
+    FROM MACD_Calculations
+)
+SELECT
+    ticker,
+    trading_date,
+    EMA_12,
+    EMA_26,
+    MACD,
+    Signal_Line,
+    CASE WHEN MACD > Signal_Line THEN 'Bullish Crossover' ELSE 'Bearish Crossover' END AS MACD_Signal
+FROM Signal_Line_Calculations
+WHERE EMA_12 IS NOT NULL AND EMA_26 IS NOT NULL;
+GO
+
+-- 3. nasdaq_100_bollingerband
+CREATE VIEW dbo.nasdaq_100_bollingerband
+WITH SCHEMABINDING
+AS
+SELECT
+    ticker,
+    trading_date,
+    close_price,
+    SMA_20,
+    SMA_20 + 2 * STD_20 AS Upper_Band,
+    SMA_20 - 2 * STD_20 AS Lower_Band
+FROM (
+    SELECT
+        ticker,
+        trading_date,
+        close_num AS close_price,
+        AVG(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS SMA_20,
+        STDEV(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS STD_20
+    FROM dbo.nasdaq_100_hist_data
+    WHERE close_num IS NOT NULL
+) AS bands;
+GO
+
+-- 4. nasdaq_100_atr
+CREATE VIEW dbo.nasdaq_100_atr
+WITH SCHEMABINDING
+AS
+WITH TR_Calculations AS (
+    SELECT
+        ticker,
+        trading_date,
+        ABS(close_num - LAG(close_num, 1) OVER (PARTITION BY ticker ORDER BY trading_date)) AS True_Range
+    FROM dbo.nasdaq_100_hist_data
+    WHERE close_num IS NOT NULL
+)
+SELECT
+    ticker,
+    trading_date,
+    AVG(True_Range) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS ATR_14
+FROM TR_Calculations;
+GO
+
+-- 5. nasdaq_100_ema_sma_view
+CREATE VIEW dbo.nasdaq_100_ema_sma_view
+WITH SCHEMABINDING
+AS
+WITH PriceData AS (
+    SELECT
+        ticker,
+        trading_date,
+        close_num AS close_price,
+        AVG(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 199 PRECEDING AND CURRENT ROW) AS SMA_200,
+        AVG(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 99 PRECEDING AND CURRENT ROW) AS SMA_100,
+        AVG(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) AS SMA_50,
+        AVG(close_num) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS SMA_20,
+        ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trading_date) AS RowNum
+    FROM dbo.nasdaq_100_hist_data
+    WHERE close_num IS NOT NULL
+),
+EMA_Base AS (
+    SELECT
+        p.ticker,
+        p.trading_date,
+        p.close_price,
+        p.SMA_200,
+        p.SMA_100,
+        p.SMA_50,
+        p.SMA_20,
+        p.RowNum,
+        POWER(1 - (2.0 / (200 + 1)), RowNum - 1) AS Weight_200,
+        POWER(1 - (2.0 / (100 + 1)), RowNum - 1) AS Weight_100,
+        POWER(1 - (2.0 / (50 + 1)), RowNum - 1) AS Weight_50,
+        POWER(1 - (2.0 / (20 + 1)), RowNum - 1) AS Weight_20
+    FROM PriceData p
+),
+EMA_Calculations AS (
+    SELECT
+        e.ticker,
+        e.trading_date,
+        e.close_price,
+        e.SMA_200,
+        e.SMA_100,
+        e.SMA_50,
+        e.SMA_20,
+
+        SUM(e.close_price * e.Weight_200) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 199 PRECEDING AND CURRENT ROW) /
+        CASE WHEN SUM(e.Weight_200) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 199 PRECEDING AND CURRENT ROW) = 0 THEN 1
+             ELSE SUM(e.Weight_200) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 199 PRECEDING AND CURRENT ROW) END AS EMA_200,
+
+        SUM(e.close_price * e.Weight_100) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 99 PRECEDING AND CURRENT ROW) /
+        CASE WHEN SUM(e.Weight_100) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 99 PRECEDING AND CURRENT ROW) = 0 THEN 1
+             ELSE SUM(e.Weight_100) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 99 PRECEDING AND CURRENT ROW) END AS EMA_100,
+
+        SUM(e.close_price * e.Weight_50) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) /
+        CASE WHEN SUM(e.Weight_50) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) = 0 THEN 1
+             ELSE SUM(e.Weight_50) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 49 PRECEDING AND CURRENT ROW) END AS EMA_50,
+
+        SUM(e.close_price * e.Weight_20) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) /
+        CASE WHEN SUM(e.Weight_20) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) = 0 THEN 1
+             ELSE SUM(e.Weight_20) OVER (PARTITION BY e.ticker ORDER BY e.trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) END AS EMA_20
+    FROM EMA_Base e
+)
+SELECT
+    ticker,
+    trading_date,
+    close_price,
+    SMA_200,
+    SMA_100,
+    SMA_50,
+    SMA_20,
+    EMA_200,
+    EMA_100,
+    EMA_50,
+    EMA_20,
+    CASE WHEN close_price > SMA_200 THEN 'Above' ELSE 'Below' END AS SMA_200_Flag,
+    CASE WHEN close_price > SMA_100 THEN 'Above' ELSE 'Below' END AS SMA_100_Flag,
+    CASE WHEN close_price > SMA_50 THEN 'Above' ELSE 'Below' END AS SMA_50_Flag,
+    CASE WHEN close_price > SMA_20 THEN 'Above' ELSE 'Below' END AS SMA_20_Flag,
+    CASE WHEN close_price > EMA_200 THEN 'Above' ELSE 'Below' END AS EMA_200_Flag,
+    CASE WHEN close_price > EMA_100 THEN 'Above' ELSE 'Below' END AS EMA_100_Flag,
+    CASE WHEN close_price > EMA_50 THEN 'Above' ELSE 'Below' END AS EMA_50_Flag,
+    CASE WHEN close_price > EMA_20 THEN 'Above' ELSE 'Below' END AS EMA_20_Flag
+FROM EMA_Calculations;
+GO
+
+-- 6. nasdaq_100_atr_spikes
+CREATE VIEW dbo.nasdaq_100_atr_spikes
+WITH SCHEMABINDING
+AS
+SELECT
+    ticker,
+    trading_date,
+    ATR_14,
+    CASE
+        WHEN ATR_14 > AVG(ATR_14) OVER (PARTITION BY ticker ORDER BY trading_date ROWS BETWEEN 20 PRECEDING AND CURRENT ROW) * 1.5
+            THEN 'High Volatility'
+        ELSE NULL
+    END AS atr_volatility_signal
+FROM dbo.nasdaq_100_atr
+WHERE ATR_14 IS NOT NULL;
+GO
+
+-- 7. nasdaq_100_bb_signals
+CREATE VIEW dbo.nasdaq_100_bb_signals
+WITH SCHEMABINDING
+AS
+SELECT
+    ticker,
+    trading_date,
+    close_price,
+    SMA_20,
+    Upper_Band,
+    Lower_Band,
+    CASE
+        WHEN close_price > Upper_Band THEN 'Breakout Above Upper Band (Sell Zone)'
+        WHEN close_price < Lower_Band THEN 'Breakdown Below Lower Band (Buy Zone)'
+        ELSE NULL
+    END AS bb_trade_signal
+FROM dbo.nasdaq_100_bollingerband
+WHERE Upper_Band IS NOT NULL AND Lower_Band IS NOT NULL;
+GO
+
+-- 8. nasdaq_100_macd_signals
+CREATE VIEW dbo.nasdaq_100_macd_signals
+WITH SCHEMABINDING
+AS
+WITH cte AS (
+    SELECT
+        ticker,
+        trading_date,
+        MACD,
+        Signal_Line,
+        LAG(MACD) OVER (PARTITION BY ticker ORDER BY trading_date) AS prev_macd,
+        LAG(Signal_Line) OVER (PARTITION BY ticker ORDER BY trading_date) AS prev_signal
+    FROM dbo.nasdaq_100_macd
+)
+SELECT
+    ticker,
+    trading_date,
+    MACD,
+    Signal_Line,
+    CASE
+        WHEN prev_macd < prev_signal AND MACD > Signal_Line THEN 'Bullish Crossover'
+        WHEN prev_macd > prev_signal AND MACD < Signal_Line THEN 'Bearish Crossover'
+        ELSE 'No Signal'
+    END AS MACD_Signal
+FROM cte;
+GO
+
+-- 9. nasdaq_100_rsi_signals
+CREATE VIEW dbo.nasdaq_100_rsi_signals
+WITH SCHEMABINDING
+AS
+SELECT
+    ticker,
+    trading_date,
+    RSI,
+    CASE
+        WHEN RSI < 30 THEN 'Oversold (Buy)'
+        WHEN RSI > 70 THEN 'Overbought (Sell)'
+        ELSE NULL
+    END AS rsi_trade_signal
+FROM dbo.nasdaq_100_RSI_calculation
+WHERE RSI IS NOT NULL;
+GO
+
+-- 10. nasdaq_100_sma_signals
+CREATE VIEW dbo.nasdaq_100_sma_signals
+WITH SCHEMABINDING
+AS
+SELECT
+    ticker,
+    trading_date,
+    close_price,
+    SMA_200,
+    SMA_100,
+    SMA_50,
+    SMA_20,
+    EMA_200,
+    EMA_100,
+    EMA_50,
+    EMA_20,
+    SMA_200_Flag,
+    SMA_100_Flag,
+    SMA_50_Flag,
+    SMA_20_Flag,
+    EMA_200_Flag,
+    EMA_100_Flag,
+    EMA_50_Flag,
+    EMA_20_Flag,
+    CASE
+        WHEN LAG(SMA_20, 1) OVER (PARTITION BY ticker ORDER BY trading_date) < LAG(SMA_50, 1) OVER (PARTITION BY ticker ORDER BY trading_date)
+             AND SMA_20 > SMA_50 THEN 'Golden Cross'
+        WHEN LAG(SMA_20, 1) OVER (PARTITION BY ticker ORDER BY trading_date) > LAG(SMA_50, 1) OVER (PARTITION BY ticker ORDER BY trading_date)
+             AND SMA_20 < SMA_50 THEN 'Death Cross'
+        ELSE NULL
+    END AS sma_trade_signal
+FROM dbo.nasdaq_100_ema_sma_view
+WHERE SMA_20 IS NOT NULL AND SMA_50 IS NOT NULL;
+GO
+
+PRINT 'nasdaq_100 technical indicator views created:';
+PRINT '  1. nasdaq_100_RSI_calculation';
+PRINT '  2. nasdaq_100_macd';
+PRINT '  3. nasdaq_100_bollingerband';
+PRINT '  4. nasdaq_100_atr';
+PRINT '  5. nasdaq_100_ema_sma_view';
+PRINT '  6. nasdaq_100_atr_spikes';
+PRINT '  7. nasdaq_100_bb_signals';
+PRINT '  8. nasdaq_100_macd_signals';
+PRINT '  9. nasdaq_100_rsi_signals';
+PRINT '  10. nasdaq_100_sma_signals';
+GO
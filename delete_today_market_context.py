@@ -1,4 +1,9 @@
-"""Delete today's incomplete market_context_daily row"""
+"""Delete today's incomplete market_context_daily row
+
+SUPERSEDED: partial rows no longer need deleting — get_market_context_daily.py marks
+closes fetched before the market close as provisional (market_context_freshness)
+and re-requests them on the next run.
+"""
 import pyodbc
 from datetime import date
 
@@ -1,10 +1,12 @@
 """
 Fix 'TBD' company names in nasdaq_top100 and nse_500 tables.
-Fetches real company names from yfinance and updates SQL Server.
+Fetches real company names from yfinance (concurrently, with an on-disk cache - see
+metadata_resolver.py) and updates SQL Server with one bulk MERGE per table.
 """
+import logging
 import pyodbc
-import yfinance as yf
-import time
+from metadata_resolver import resolve_metadata
+from sql_loader import bulk_merge
 
 def get_connection():
     return pyodbc.connect(
@@ -18,62 +20,39 @@ def get_tbd_tickers(cursor, table_name):
     cursor.execute(f"SELECT ticker FROM {table_name} WHERE company_name='TBD'")
     return [row[0] for row in cursor.fetchall()]
 
-def fetch_company_name(ticker):
-    """Fetch company name from yfinance."""
-    try:
-        info = yf.Ticker(ticker).info
-        name = info.get('longName') or info.get('shortName')
-        return name
-    except Exception as e:
-        print(f"  ERROR fetching {ticker}: {e}")
-        return None
-
-def update_company_name(cursor, conn, table_name, ticker, company_name):
-    cursor.execute(
-        f"UPDATE {table_name} SET company_name = ? WHERE ticker = ?",
-        company_name, ticker
-    )
-    conn.commit()
-
-def main():
-    conn = get_connection()
+def fix_table(conn, table_name):
     cursor = conn.cursor()
-
-    # --- NASDAQ ---
     print("=" * 60)
-    print("Fixing nasdaq_top100 TBD entries")
+    print(f"Fixing {table_name} TBD entries")
     print("=" * 60)
-    nasdaq_tbd = get_tbd_tickers(cursor, 'nasdaq_top100')
-    print(f"Found {len(nasdaq_tbd)} TBD tickers\n")
-
-    for ticker in nasdaq_tbd:
-        name = fetch_company_name(ticker)
-        if name:
-            update_company_name(cursor, conn, 'nasdaq_top100', ticker, name)
-            print(f"  UPDATED: {ticker} -> {name}")
+    tbd = get_tbd_tickers(cursor, table_name)
+    print(f"Found {len(tbd)} TBD tickers\n")
+    if not tbd:
+        return
+
+    metadata, failures = resolve_metadata(tbd)
+    rows = []
+    for ticker in tbd:
+        if metadata.get(ticker):
+            rows.append((ticker, metadata[ticker]['company_name']))
+            print(f"  UPDATED: {ticker} -> {metadata[ticker]['company_name']}")
+        elif ticker in failures:
+            print(f"  FAILED: {ticker} ({failures[ticker]})")
         else:
             print(f"  SKIPPED: {ticker} (could not fetch name)")
-        time.sleep(0.3)
+    # Every key already exists, so the MERGE only updates company_name
+    bulk_merge(conn, table_name, ['ticker', 'company_name'], ['ticker'], rows)
+    print()
 
-    # --- NSE ---
-    print("\n" + "=" * 60)
-    print("Fixing nse_500 TBD entries")
-    print("=" * 60)
-    nse_tbd = get_tbd_tickers(cursor, 'nse_500')
-    print(f"Found {len(nse_tbd)} TBD tickers\n")
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = get_connection()
 
-    for ticker in nse_tbd:
-        name = fetch_company_name(ticker)
-        if name:
-            update_company_name(cursor, conn, 'nse_500', ticker, name)
-            print(f"  UPDATED: {ticker} -> {name}")
-        else:
-            print(f"  SKIPPED: {ticker} (could not fetch name)")
-        time.sleep(0.3)
+    fix_table(conn, 'nasdaq_top100')
+    fix_table(conn, 'nse_500')
 
-    cursor.close()
     conn.close()
-    print("\nDone!")
+    print("Done!")
 
 if __name__ == "__main__":
     main()
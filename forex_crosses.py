@@ -0,0 +1,282 @@
+"""
+Synthetic Forex Cross Engine
+============================
+Derives cross pairs (e.g. EURJPY) locally from the USD legs already stored in
+forex_hist_data (EURUSD, USDJPY), so a cross costs no provider request.
+
+forex_master.source_type marks each pair:
+    'sourced' - fetched from a provider by the daily/adhoc loaders (default)
+    'derived' - computed here from two sourced USD legs; the loaders skip it
+
+Every currency is first expressed as a USD value per unit (EURUSD as-is, USDJPY
+inverted: open/close -> 1/x, high -> 1/low, low -> 1/high). A cross A/B is then
+USD(A) / USD(B), computed column-wise for all derived pairs at once.
+
+OHLC approximation rules (both legs use the same 17:00 New York daily alignment):
+    open, close  exact: ratio of the legs' opens / closes
+    high         the true cross high lies between max(open, close) and the bound
+                 high(A)/low(B) (legs at opposite extremes at the same instant, which
+                 overstates the range since legs are correlated); we store the
+                 geometric midpoint sqrt(max(open, close) * bound)
+    low          symmetric: sqrt(min(open, close) * low(A)/high(B))
+    USD leg      when A or B is USD the bound is exact and used as-is
+    volume       NULL (tick volumes of different instruments do not combine)
+
+Usage:
+    python forex_crosses.py                      # Derive missing days for all derived pairs
+    python forex_crosses.py --full               # Recompute derived pairs over all stored leg history
+    python forex_crosses.py --add EURJPY GBPJPY  # Register new crosses as derived (no API cost)
+    python forex_crosses.py --classify           # Flag active non-USD pairs with both legs sourced as derived
+"""
+
+import argparse
+import logging
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyodbc
+
+from forex_store import ensure_source_type, fill_daily_changes, get_watermarks, upsert_bars
+from sql_loader import server_time
+from symbol_master import get_resolver, sync_symbol_master
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+master_table = "forex_master"
+target_table = "forex_hist_data"
+
+logger = logging.getLogger(__name__)
+
+# Derived days re-computed before each pair's last stored date (legs may have been revised)
+RECOMPUTE_DAYS = 7
+OHLC = ['open_price', 'high_price', 'low_price', 'close_price']
+
+
+def load_pairs(conn):
+    """Active pairs: list of (symbol, currency_from, currency_to, source_type)."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT symbol, currency_from, currency_to, ISNULL(source_type, 'sourced')
+        FROM {master_table}
+        WHERE is_active = 'Y'
+        ORDER BY symbol
+    """)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def basis_legs(pairs):
+    """USD leg per currency from the sourced pairs: {currency: (symbol, inverted)}."""
+    legs = {}
+    for symbol, c_from, c_to, source_type in pairs:
+        if source_type != 'sourced':
+            continue
+        if c_to == 'USD' and c_from != 'USD':
+            legs[c_from] = (symbol, False)                 # XXXUSD preferred
+        elif c_from == 'USD' and c_to != 'USD':
+            legs.setdefault(c_to, (symbol, True))          # USDXXX, inverted
+    return legs
+
+
+def load_leg_bars(conn, symbols, start_date=None):
+    """Leg OHLC from forex_hist_data as {field: DataFrame(trading_date x symbol)}."""
+    placeholders = ', '.join('?' for _ in symbols)
+    sql = f"""
+        SELECT symbol, trading_date,
+               CAST(open_price AS FLOAT), CAST(high_price AS FLOAT),
+               CAST(low_price AS FLOAT), CAST(close_price AS FLOAT)
+        FROM {target_table}
+        WHERE symbol IN ({placeholders})
+    """
+    params = list(symbols)
+    if start_date is not None:
+        sql += " AND trading_date >= ?"
+        params.append(start_date)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    bars = pd.DataFrame.from_records(cursor.fetchall(), columns=['symbol', 'trading_date'] + OHLC)
+    if bars.empty:
+        return {}
+    return {field: bars.pivot(index='trading_date', columns='symbol', values=field).sort_index() for field in OHLC}
+
+
+def usd_values(leg_bars, legs, currencies):
+    """USD value per unit of each currency: {field: DataFrame(trading_date x currency)}."""
+    index = leg_bars['close_price'].index
+    values = {field: pd.DataFrame(index=index) for field in OHLC}
+    for currency in currencies:
+        if currency == 'USD':
+            for field in OHLC:
+                values[field][currency] = 1.0
+            continue
+        symbol, inverted = legs[currency]
+        if not inverted:
+            for field in OHLC:
+                values[field][currency] = leg_bars[field][symbol]
+        else:
+            values['open_price'][currency] = 1.0 / leg_bars['open_price'][symbol]
+            values['high_price'][currency] = 1.0 / leg_bars['low_price'][symbol]
+            values['low_price'][currency] = 1.0 / leg_bars['high_price'][symbol]
+            values['close_price'][currency] = 1.0 / leg_bars['close_price'][symbol]
+    return values
+
+
+def derive_ohlc(usd, crosses):
+    """
+    Vectorized cross OHLC for crosses [(symbol, base, quote), ...].
+    Returns {field: DataFrame(trading_date x symbol)} following the approximation rules above.
+    """
+    symbols = [c[0] for c in crosses]
+    base = [c[1] for c in crosses]
+    quote = [c[2] for c in crosses]
+
+    def ratio(num_field, den_field):
+        return usd[num_field][base].to_numpy() / usd[den_field][quote].to_numpy()
+
+    open_ = ratio('open_price', 'open_price')
+    close = ratio('close_price', 'close_price')
+    high_bound = ratio('high_price', 'low_price')
+    low_bound = ratio('low_price', 'high_price')
+
+    exact = np.array([b == 'USD' or q == 'USD' for _, b, q in crosses])
+    with np.errstate(invalid='ignore'):
+        high = np.where(exact, high_bound, np.sqrt(np.maximum(open_, close) * high_bound))
+        low = np.where(exact, low_bound, np.sqrt(np.minimum(open_, close) * low_bound))
+
+    index = usd['close_price'].index
+    return {
+        field: pd.DataFrame(values, index=index, columns=symbols)
+        for field, values in zip(OHLC, [open_, high, low, close])
+    }
+
+
+def derive_crosses(conn, full=False):
+    """Derive and upsert every active 'derived' pair. Returns the number of bars written."""
+    ensure_source_type(conn)
+    pairs = load_pairs(conn)
+    legs = basis_legs(pairs)
+
+    crosses = []
+    for symbol, c_from, c_to, source_type in pairs:
+        if source_type != 'derived':
+            continue
+        missing = [c for c in (c_from, c_to) if c != 'USD' and c not in legs]
+        if missing:
+            logger.warning(f"{symbol}: no sourced USD leg for {', '.join(missing)}; skipping")
+            continue
+        crosses.append((symbol, c_from, c_to))
+
+    if not crosses:
+        logger.info("No derived forex pairs to compute")
+        return 0
+
+    watermarks = get_watermarks(conn)
+    if full or any(symbol not in watermarks for symbol, _, _ in crosses):
+        start_date = None
+    else:
+        start_date = min(watermarks[symbol] for symbol, _, _ in crosses) - timedelta(days=RECOMPUTE_DAYS)
+
+    currencies = sorted({c for _, b, q in crosses for c in (b, q)})
+    leg_symbols = sorted({legs[c][0] for c in currencies if c != 'USD'})
+    leg_bars = load_leg_bars(conn, leg_symbols, start_date)
+    if not leg_bars:
+        logger.warning("No stored leg data to derive crosses from")
+        return 0
+
+    ohlc = derive_ohlc(usd_values(leg_bars, legs, currencies), crosses)
+
+    # Long form: one bar per (cross, date) where every leg traded
+    stacked = pd.concat({field: frame.stack() for field, frame in ohlc.items()}, axis=1).dropna()
+    names = {symbol: (base, quote) for symbol, base, quote in crosses}
+    bars = [
+        {
+            'symbol': symbol,
+            'currency_from': names[symbol][0],
+            'currency_to': names[symbol][1],
+            'trading_date': trading_date,
+            'open_price': row['open_price'],
+            'high_price': row['high_price'],
+            'low_price': row['low_price'],
+            'close_price': row['close_price'],
+            'volume': None,
+        }
+        for (trading_date, symbol), row in stacked.iterrows()
+    ]
+    upsert_bars(conn, bars, data_source='derived')
+    logger.info(f"Derived {len(bars)} bars for {len(crosses)} cross pair(s) from {len(leg_symbols)} USD leg(s)")
+    return len(bars)
+
+
+def classify_pairs(conn):
+    """Flag active non-USD pairs whose two USD legs are sourced as 'derived'. Returns symbols flagged."""
+    ensure_source_type(conn)
+    pairs = load_pairs(conn)
+    legs = basis_legs(pairs)
+    flagged = [
+        symbol for symbol, c_from, c_to, source_type in pairs
+        if source_type == 'sourced' and 'USD' not in (c_from, c_to) and c_from in legs and c_to in legs
+    ]
+    if flagged:
+        cursor = conn.cursor()
+        cursor.executemany(f"UPDATE {master_table} SET source_type = 'derived' WHERE symbol = ?",
+                           [(s,) for s in flagged])
+        conn.commit()
+    logger.info(f"Flagged {len(flagged)} pair(s) as derived: {', '.join(flagged) or '-'}")
+    return flagged
+
+
+def add_crosses(conn, symbols):
+    """Register new 6-letter crosses (e.g. EURJPY) in forex_master as active derived pairs."""
+    ensure_source_type(conn)
+    resolver = get_resolver(conn)
+    cursor = conn.cursor()
+    for symbol in symbols:
+        symbol = symbol.upper()
+        c_from, c_to = symbol[:3], symbol[3:]
+        cursor.execute(f"""
+            IF NOT EXISTS (SELECT 1 FROM {master_table} WHERE symbol = ?)
+                INSERT INTO {master_table} (symbol, currency_from, currency_to, yfinance_symbol, is_active, source_type)
+                VALUES (?, ?, ?, ?, 'Y', 'derived')
+        """, (symbol, symbol, c_from, c_to, resolver.source_symbol('yfinance', symbol, 'fx')))
+    conn.commit()
+    sync_symbol_master(conn, 'fx')
+    logger.info(f"Registered {len(symbols)} derived cross(es)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Derive forex cross pairs from stored USD legs')
+    parser.add_argument('--full', action='store_true', help='Recompute derived pairs over all stored leg history')
+    parser.add_argument('--add', nargs='+', metavar='SYMBOL', help='Register crosses (e.g. EURJPY) as derived pairs')
+    parser.add_argument('--classify', action='store_true',
+                        help='Flag active non-USD pairs with both USD legs sourced as derived')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "forex_crosses.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    if args.add:
+        add_crosses(conn, args.add)
+    if args.classify:
+        classify_pairs(conn)
+    run_started = server_time(conn)
+    if derive_crosses(conn, full=args.full):
+        fill_daily_changes(conn, since=None if args.full else run_started)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+"""
+Live FX Price Stream Consumer
+=============================
+Consumes the OANDA v20 pricing stream (newline-delimited JSON PRICE / HEARTBEAT messages)
+and aggregates mid-price ticks into 1-minute bars held in a preallocated numpy ring buffer
+(one row of slots per instrument, MinuteBarBuffer). Completed minutes are flushed in batches
+to forex_intraday_data as granularity 'M1' (one staged insert per flush).
+
+In-process API (run inside another script):
+    stream = PriceStream(['EURUSD', 'USDJPY'], resolver=get_resolver(conn), on_flush=...)
+    stream.start()
+    stream.latest_quote('EURUSD')     # {'time', 'bid', 'ask', 'mid'} or None
+    stream.recent_bars('EURUSD', 60)  # DataFrame of the last 60 one-minute bars (incl. current)
+    stream.stop()
+
+The stream reconnects with backoff when the connection drops or no heartbeat arrives
+(OANDA sends one every 5s). For local testing, run the stand-in server and point at it:
+    python oanda_stream_standin.py --port 8765
+    python forex_price_stream.py --stream-url http://127.0.0.1:8765 --dry-run --duration 180
+
+Usage:
+    python forex_price_stream.py                        # All active sourced forex_master pairs
+    python forex_price_stream.py --pairs EURUSD GBPUSD --flush-seconds 60
+"""
+
+import argparse
+import calendar
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyodbc
+import requests
+from dotenv import load_dotenv
+
+from sql_loader import bulk_merge
+from symbol_master import derive_source_symbol, get_resolver
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+source_table = "forex_master"
+intraday_table = "forex_intraday_data"
+
+OANDA_API_TOKEN = os.getenv("OANDA_API_TOKEN")
+OANDA_ACCOUNT_ID = os.getenv("OANDA_ACCOUNT_ID")
+OANDA_ENVIRONMENT = os.getenv("OANDA_ENVIRONMENT", "practice")  # "practice" or "live"
+OANDA_STREAM_URL = (
+    "https://stream-fxpractice.oanda.com" if OANDA_ENVIRONMENT == "practice"
+    else "https://stream-fxtrade.oanda.com"
+)
+
+BUFFER_MINUTES = 1440          # ring buffer depth per instrument (one day of 1-minute bars)
+FLUSH_SECONDS = 30             # completed bars are written in batches this often
+HEARTBEAT_TIMEOUT = 15         # reconnect if the stream is silent this long
+MAX_BACKOFF_SECONDS = 60
+
+INTRADAY_COLUMNS = ['symbol', 'granularity', 'bar_time', 'open_price', 'high_price',
+                    'low_price', 'close_price', 'volume']
+
+logger = logging.getLogger(__name__)
+
+
+def parse_stream_time(value):
+    """OANDA RFC3339 time ('2026-04-21T13:45:07.123456789Z') -> epoch seconds (float)."""
+    whole, _, fraction = value.rstrip('Z').partition('.')
+    seconds = calendar.timegm(time.strptime(whole, '%Y-%m-%dT%H:%M:%S'))
+    return seconds + (float(f"0.{fraction}") if fraction else 0.0)
+
+
+class MinuteBarBuffer:
+    """
+    Preallocated ring buffer of 1-minute OHLC bars, one row per instrument.
+
+    Slot arrays are (instruments x capacity); each instrument's head points at its
+    current (forming) minute. Bars are never reallocated — a new minute overwrites
+    the oldest slot, so capacity must cover the flush interval with margin.
+    """
+
+    def __init__(self, symbols, capacity=BUFFER_MINUTES):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.capacity = capacity
+        shape = (len(self.symbols), capacity)
+        self.minute = np.full(shape, -1, dtype=np.int64)     # epoch minute of the bar, -1 = empty
+        self.open = np.zeros(shape)
+        self.high = np.zeros(shape)
+        self.low = np.zeros(shape)
+        self.close = np.zeros(shape)
+        self.ticks = np.zeros(shape, dtype=np.int32)
+        self.head = np.zeros(len(self.symbols), dtype=np.int64)
+        self.flushed_minute = np.full(len(self.symbols), -1, dtype=np.int64)
+        self.lock = threading.Lock()
+
+    def add_tick(self, symbol, epoch_seconds, price):
+        i = self.index[symbol]
+        minute = int(epoch_seconds // 60)
+        with self.lock:
+            h = self.head[i]
+            current = self.minute[i, h]
+            if minute < current:
+                return  # late tick for an already-closed minute
+            if minute != current:
+                if current != -1:
+                    h = (h + 1) % self.capacity
+                    self.head[i] = h
+                    overwritten = self.minute[i, h]
+                    if overwritten > self.flushed_minute[i]:
+                        logger.warning(f"{symbol}: ring buffer full, unflushed bar {overwritten} dropped")
+                self.minute[i, h] = minute
+                self.open[i, h] = self.high[i, h] = self.low[i, h] = price
+                self.ticks[i, h] = 0
+            else:
+                self.high[i, h] = max(self.high[i, h], price)
+                self.low[i, h] = min(self.low[i, h], price)
+            self.close[i, h] = price
+            self.ticks[i, h] += 1
+
+    def drain_completed(self, now_seconds=None):
+        """Bars whose minute has ended and that were not flushed yet, as forex_intraday_data rows."""
+        now_minute = int((now_seconds or time.time()) // 60)
+        with self.lock:
+            mask = (self.minute > self.flushed_minute[:, None]) & (self.minute < now_minute)
+            rows_i, slots = np.nonzero(mask)
+            rows = [
+                (self.symbols[i], 'M1', datetime.utcfromtimestamp(int(self.minute[i, s]) * 60),
+                 float(self.open[i, s]), float(self.high[i, s]), float(self.low[i, s]),
+                 float(self.close[i, s]), int(self.ticks[i, s]))
+                for i, s in zip(rows_i, slots)
+            ]
+            if rows:
+                completed = np.where(mask, self.minute, -1).max(axis=1)
+                self.flushed_minute = np.maximum(self.flushed_minute, completed)
+        return rows
+
+    def recent(self, symbol, count):
+        """Last `count` bars (oldest first, including the forming one) as a DataFrame."""
+        i = self.index[symbol]
+        with self.lock:
+            order = (self.head[i] - np.arange(count)[::-1]) % self.capacity
+            minute = self.minute[i, order]
+            valid = minute >= 0
+            frame = pd.DataFrame({
+                'bar_time': pd.to_datetime(minute[valid] * 60, unit='s'),
+                'open_price': self.open[i, order][valid],
+                'high_price': self.high[i, order][valid],
+                'low_price': self.low[i, order][valid],
+                'close_price': self.close[i, order][valid],
+                'ticks': self.ticks[i, order][valid],
+            })
+        return frame
+
+
+class PriceStream:
+    """Background consumer of the OANDA pricing stream feeding a MinuteBarBuffer."""
+
+    def __init__(self, symbols, resolver=None, stream_url=OANDA_STREAM_URL, api_token=OANDA_API_TOKEN,
+                 account_id=OANDA_ACCOUNT_ID, flush_seconds=FLUSH_SECONDS, on_flush=None):
+        # forex_master symbols (EURUSD) <-> OANDA instruments (EUR_USD) from the symbol master;
+        # without a database (--dry-run --pairs) from its format rules
+        self.instruments = {
+            (resolver.source_symbol('oanda', s, 'fx') if resolver else derive_source_symbol('fx', 'oanda', s)): s
+            for s in symbols
+        }
+        self.buffer = MinuteBarBuffer(symbols)
+        self.stream_url = stream_url.rstrip('/')
+        self.api_token = api_token
+        self.account_id = account_id or 'standin'
+        self.flush_seconds = flush_seconds
+        self.on_flush = on_flush
+        self.quotes = {}
+        self.quotes_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    # ---- in-process API -------------------------------------------------
+    def latest_quote(self, symbol):
+        with self.quotes_lock:
+            quote = self.quotes.get(symbol)
+            return dict(quote) if quote else None
+
+    def recent_bars(self, symbol, count=60):
+        return self.buffer.recent(symbol, count)
+
+    def start(self):
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._consume, name='fx-stream', daemon=True),
+                         threading.Thread(target=self._flush_loop, name='fx-flush', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=HEARTBEAT_TIMEOUT + 5)
+        # Only completed minutes: the forming one is dropped rather than written as a
+        # partial bar that the insert-only flusher could never correct later
+        self.flush()
+
+    # ---- internals ------------------------------------------------------
+    def _handle(self, message):
+        if message.get('type') != 'PRICE':
+            return  # HEARTBEAT: only keeps the read timeout from firing
+        symbol = self.instruments.get(message.get('instrument'))
+        if symbol is None or not message.get('bids') or not message.get('asks'):
+            return
+        bid = float(message['bids'][0]['price'])
+        ask = float(message['asks'][0]['price'])
+        mid = (bid + ask) / 2
+        epoch = parse_stream_time(message['time'])
+        self.buffer.add_tick(symbol, epoch, mid)
+        with self.quotes_lock:
+            self.quotes[symbol] = {'time': message['time'], 'bid': bid, 'ask': ask, 'mid': mid}
+
+    def _consume(self):
+        url = f"{self.stream_url}/v3/accounts/{self.account_id}/pricing/stream"
+        headers = {'Authorization': f'Bearer {self.api_token}'} if self.api_token else {}
+        params = {'instruments': ','.join(self.instruments)}
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                with requests.get(url, headers=headers, params=params, stream=True,
+                                  timeout=(10, HEARTBEAT_TIMEOUT)) as response:
+                    response.raise_for_status()
+                    logger.info(f"Connected to price stream ({len(self.instruments)} instruments)")
+                    backoff = 1
+                    for line in response.iter_lines():
+                        if self._stop.is_set():
+                            return
+                        if line:
+                            self._handle(json.loads(line))
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if self._stop.is_set():
+                    return
+                logger.warning(f"Price stream dropped ({type(e).__name__}: {e}); reconnecting in {backoff}s")
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        rows = self.buffer.drain_completed(time.time())
+        if rows and self.on_flush:
+            try:
+                self.on_flush(rows)
+            except Exception as e:
+                logger.error(f"Flush of {len(rows)} bars failed: {e}")
+        return rows
+
+
+def sql_flusher(conn):
+    """on_flush callback writing M1 bars to forex_intraday_data (insert-only staged MERGE)."""
+    def write(rows):
+        inserted, _ = bulk_merge(conn, intraday_table, INTRADAY_COLUMNS,
+                                 ['symbol', 'granularity', 'bar_time'], rows, mode='insert')
+        logger.info(f"Flushed {len(rows)} M1 bars ({inserted} new)")
+    return write
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Consume the OANDA pricing stream into 1-minute bars')
+    parser.add_argument('--pairs', nargs='+', help='forex_master symbols (default: all active sourced pairs)')
+    parser.add_argument('--stream-url', default=OANDA_STREAM_URL,
+                        help='Stream base URL (e.g. a local oanda_stream_standin.py server)')
+    parser.add_argument('--flush-seconds', type=int, default=FLUSH_SECONDS,
+                        help=f'Seconds between batch flushes (default {FLUSH_SECONDS})')
+    parser.add_argument('--duration', type=int, default=0, help='Stop after N seconds (default: run until Ctrl+C)')
+    parser.add_argument('--dry-run', action='store_true', help='Log flushed bars instead of writing to SQL')
+    args = parser.parse_args()
+
+    log_dir = os.path.join(SCRIPT_DIR, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, 'forex_price_stream.log'), encoding='utf-8'),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = None
+    if not args.dry_run or not args.pairs:
+        conn = pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+            f"DATABASE={database};Trusted_Connection=yes;"
+        )
+    pairs = args.pairs
+    if not pairs:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT symbol FROM {source_table}
+            WHERE is_active = 'Y' AND ISNULL(source_type, 'sourced') = 'sourced'
+            ORDER BY symbol
+        """)
+        pairs = [row[0] for row in cursor.fetchall()]
+
+    if args.dry_run:
+        on_flush = lambda rows: logger.info(f"[dry-run] {len(rows)} completed bars, e.g. {rows[0]}")
+    else:
+        on_flush = sql_flusher(conn)
+
+    stream = PriceStream(pairs, resolver=get_resolver(conn) if conn is not None else None,
+                         stream_url=args.stream_url, flush_seconds=args.flush_seconds, on_flush=on_flush)
+    stream.start()
+    started = time.time()
+    try:
+        while not args.duration or time.time() - started < args.duration:
+            time.sleep(10)
+            quotes = [f"{s} {q['mid']:.5f}" for s in pairs[:5] if (q := stream.latest_quote(s))]
+            if quotes:
+                logger.info("Latest: " + ' | '.join(quotes))
+    except KeyboardInterrupt:
+        logger.info("Stopping price stream...")
+    finally:
+        stream.stop()
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,328 @@
+"""
+Forex data providers with failover
+==================================
+One interface for the daily FX sources that used to live in copy-pasted scripts:
+
+    OandaProvider    - OANDA v20 daily mid candles (17:00 New York alignment), concurrent (oanda_async)
+    PolygonProvider  - Polygon.io per-pair daily aggregates (UTC-day bars)
+    YFinanceProvider - yfinance batch download of the forex_master yfinance_symbol (=X tickers)
+
+Every provider implements fetch_daily(pairs, end_date) -> {symbol: [bar, ...]}, where pairs
+are (symbol, currency_from, currency_to, yfinance_symbol, start_date) and bars are dicts keyed
+by forex_store.BAR_COLUMNS. Provider tickers (EUR_USD, C:EURUSD) come from the symbol master.
+Trading dates follow the OANDA convention (the session ending 17:00 New York, Monday-Friday);
+Polygon and yfinance bars are labelled by UTC day, which covers most of the same session, and
+their weekend (Sunday evening open) bars are dropped.
+
+ProviderRouter always tries the configured primary (the first provider) first while its
+circuit is closed, so forex_hist_data keeps one source. The fallbacks are ordered fastest-first
+(EWMA latency; unmeasured providers after measured ones, in configured order). A provider is
+failed over when it raises, exceeds its slow-response timeout, or returns nothing for some
+pairs (those go to the next one). Per-provider success/failure counters and latency histograms
+are kept in logs/forex_provider_stats.json; consecutive failures open a circuit breaker for a cooldown.
+
+Usage:
+    from forex_providers import build_router
+    from symbol_master import get_resolver
+    router = build_router(get_resolver(conn), max_rps=100)
+    results = router.fetch_daily(pairs, end_date)     # {symbol: (provider_name, [bar, ...])}
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import requests
+import yfinance as yf
+
+from forex_store import is_weekday
+from oanda_async import fetch_candles_many, DEFAULT_MAX_RPS
+
+logger = logging.getLogger(__name__)
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STATS_FILE = os.path.join(SCRIPT_DIR, 'logs', 'forex_provider_stats.json')
+
+LATENCY_BUCKETS = [0.25, 0.5, 1, 2, 5, 10, 30]   # seconds; last bucket is '+inf'
+EWMA_ALPHA = 0.3
+FAILURE_THRESHOLD = 3         # consecutive failures before the circuit opens
+COOLDOWN_SECONDS = 15 * 60    # circuit stays open this long
+
+
+def make_bar(symbol, currency_from, currency_to, trading_date, o, h, l, c, volume):
+    return {
+        'symbol': symbol,
+        'currency_from': currency_from,
+        'currency_to': currency_to,
+        'trading_date': trading_date,
+        'open_price': float(o),
+        'high_price': float(h),
+        'low_price': float(l),
+        'close_price': float(c),
+        'volume': int(volume or 0),
+    }
+
+
+# ============================================================
+# Providers
+# ============================================================
+
+class ForexProvider:
+    """Base class: name, slow-response timeout and fetch_daily()."""
+    name = 'base'
+    timeout = 30
+
+    def fetch_daily(self, pairs, end_date):
+        raise NotImplementedError
+
+
+class OandaProvider(ForexProvider):
+    """OANDA v20 daily mid candles; one ranged request per pair, all pairs concurrently."""
+    name = 'oanda'
+    timeout = 20
+
+    def __init__(self, api_token, symbols, environment='practice', max_rps=DEFAULT_MAX_RPS):
+        self.api_token = api_token
+        self.symbols = symbols
+        self.base_url = ("https://api-fxpractice.oanda.com" if environment == "practice"
+                         else "https://api-fxtrade.oanda.com")
+        self.max_rps = max_rps
+
+    @staticmethod
+    def candle_request(instrument, start_date):
+        # The bar for trading date D opens at 17:00 New York on D-1 (21:00/22:00Z), so start
+        # the range at midnight UTC of D-1. No 'to': OANDA returns candles up to now.
+        params = {
+            'price': 'M',                          # Mid prices (bid/ask average)
+            'granularity': 'D',                    # Daily bars
+            'from': f"{(start_date - timedelta(days=1)).strftime('%Y-%m-%d')}T00:00:00Z",
+            'dailyAlignment': '17',                # 5pm NY close convention
+            'alignmentTimezone': 'America/New_York',
+        }
+        return instrument, params
+
+    @staticmethod
+    def candle_trading_date(candle_time):
+        """Trading date of a daily candle: the NY calendar day after the 17:00 NY open."""
+        opened_utc = datetime.strptime(candle_time[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=ZoneInfo('UTC'))
+        return opened_utc.astimezone(ZoneInfo('America/New_York')).date() + timedelta(days=1)
+
+    def fetch_daily(self, pairs, end_date):
+        jobs = {symbol: self.candle_request(self.symbols.source_symbol(self.name, symbol, 'fx'), start)
+                for symbol, _, _, _, start in pairs}
+        responses = fetch_candles_many(jobs, self.api_token, self.base_url, max_rps=self.max_rps)
+        results = {}
+        for symbol, c_from, c_to, _, start in pairs:
+            bars = []
+            # Complete candles only (incomplete = still forming in current session)
+            for candle in (responses.get(symbol) or {}).get('candles', []):
+                if not candle.get('complete', False):
+                    continue
+                trading_date = self.candle_trading_date(candle['time'])
+                if start <= trading_date <= end_date:
+                    mid = candle['mid']
+                    bars.append(make_bar(symbol, c_from, c_to, trading_date,
+                                         mid['o'], mid['h'], mid['l'], mid['c'], candle.get('volume', 0)))
+            results[symbol] = bars
+        return results
+
+
+class PolygonProvider(ForexProvider):
+    """Polygon.io daily aggregates, one request per pair (UTC-day bars)."""
+    name = 'polygon'
+    timeout = 60
+
+    def __init__(self, api_key, symbols):
+        self.api_key = api_key
+        self.symbols = symbols
+
+    def fetch_daily(self, pairs, end_date):
+        results = {}
+        for symbol, c_from, c_to, _, start in pairs:
+            ticker = self.symbols.source_symbol(self.name, symbol, 'fx')
+            url = (f"https://api.polygon.io/v2/aggs/ticker/{ticker}/range/1/day/"
+                   f"{start.strftime('%Y-%m-%d')}/{end_date.strftime('%Y-%m-%d')}")
+            response = requests.get(url, params={'apiKey': self.api_key, 'adjusted': 'true', 'limit': 50000},
+                                    timeout=self.timeout)
+            # 429 is not waited out here: the router fails over to the next provider instead
+            response.raise_for_status()
+            data = response.json()
+            if data.get('status') == 'ERROR':
+                raise RuntimeError(f"Polygon API error for {symbol}: {data.get('error')}")
+            bars = []
+            for bar in data.get('results') or []:
+                trading_date = datetime.utcfromtimestamp(bar['t'] / 1000).date()
+                if is_weekday(trading_date):
+                    bars.append(make_bar(symbol, c_from, c_to, trading_date,
+                                         bar['o'], bar['h'], bar['l'], bar['c'], bar.get('v', 0)))
+            results[symbol] = bars
+        return results
+
+
+class YFinanceProvider(ForexProvider):
+    """yfinance batch download of all pairs' =X tickers in one call."""
+    name = 'yfinance'
+    timeout = 60
+
+    def fetch_daily(self, pairs, end_date):
+        by_ticker = {yf_symbol: (symbol, c_from, c_to, start) for symbol, c_from, c_to, yf_symbol, start in pairs
+                     if yf_symbol}
+        if not by_ticker:
+            return {}
+        start = min(p[3] for p in by_ticker.values())
+        raw = yf.download(' '.join(by_ticker), start=start.strftime('%Y-%m-%d'),
+                          end=(end_date + timedelta(days=1)).strftime('%Y-%m-%d'),
+                          interval='1d', group_by='ticker', auto_adjust=False, threads=True, progress=False)
+        results = {}
+        for yf_symbol, (symbol, c_from, c_to, pair_start) in by_ticker.items():
+            if raw.empty:
+                results[symbol] = []
+                continue
+            if isinstance(raw.columns, pd.MultiIndex):
+                if yf_symbol not in raw.columns.get_level_values(0):
+                    results[symbol] = []
+                    continue
+                frame = raw[yf_symbol]
+            else:
+                frame = raw  # single ticker without a ticker level
+            frame = frame.dropna(subset=['Close'])
+            results[symbol] = [
+                make_bar(symbol, c_from, c_to, ts.date(), row['Open'], row['High'], row['Low'], row['Close'],
+                         row.get('Volume', 0))
+                for ts, row in frame.iterrows()
+                if pair_start <= ts.date() <= end_date and is_weekday(ts.date())
+            ]
+        return results
+
+
+# ============================================================
+# Router
+# ============================================================
+
+class ProviderRouter:
+    """Primary-first routing with latency-ordered failover, latency histograms and a circuit breaker."""
+
+    def __init__(self, providers, stats_file=STATS_FILE):
+        self.providers = providers
+        self.stats_file = stats_file
+        self.stats = self._load_stats()
+
+    def _load_stats(self):
+        stats = {}
+        if os.path.exists(self.stats_file):
+            try:
+                with open(self.stats_file, encoding='utf-8') as f:
+                    stats = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read provider stats ({e}); starting fresh")
+        for provider in self.providers:
+            stats.setdefault(provider.name, {
+                'success': 0, 'failure': 0, 'slow': 0,
+                'latency_histogram': {str(b): 0 for b in LATENCY_BUCKETS + ['+inf']},
+                'ewma_latency': None, 'consecutive_failures': 0, 'open_until': 0,
+            })
+        return stats
+
+    def save_stats(self):
+        os.makedirs(os.path.dirname(self.stats_file), exist_ok=True)
+        with open(self.stats_file, 'w', encoding='utf-8') as f:
+            json.dump(self.stats, f, indent=2)
+
+    def _record(self, provider, latency, ok, slow=False):
+        s = self.stats[provider.name]
+        bucket = next((str(b) for b in LATENCY_BUCKETS if latency <= b), '+inf')
+        s['latency_histogram'][bucket] += 1
+        # A failure counts as at least a full timeout, so fast errors never look like a fast source
+        effective = latency if ok else max(latency, provider.timeout)
+        s['ewma_latency'] = effective if s['ewma_latency'] is None else (
+            EWMA_ALPHA * effective + (1 - EWMA_ALPHA) * s['ewma_latency'])
+        if ok:
+            s['success'] += 1
+            s['consecutive_failures'] = 0
+            return
+        s['failure'] += 1
+        s['slow'] += int(slow)
+        s['consecutive_failures'] += 1
+        if s['consecutive_failures'] >= FAILURE_THRESHOLD:
+            s['open_until'] = time.time() + COOLDOWN_SECONDS
+            logger.warning(f"{provider.name}: circuit open for {COOLDOWN_SECONDS // 60} min "
+                           f"after {s['consecutive_failures']} consecutive failures")
+
+    def healthy(self):
+        """
+        Providers whose circuit is closed: the configured primary first, then the fallbacks
+        fastest (EWMA latency) first; unmeasured ones keep configured order. Latency never
+        promotes a fallback over the primary, whose session convention the table is stored in.
+        """
+        now = time.time()
+        order = {p.name: i for i, p in enumerate(self.providers)}
+
+        def speed(provider):
+            ewma = self.stats[provider.name]['ewma_latency']
+            return (ewma if ewma is not None else float('inf'), order[provider.name])
+
+        available = [p for p in self.providers if self.stats[p.name]['open_until'] <= now]
+        primary = [p for p in available if p is self.providers[0]]
+        return primary + sorted((p for p in available if p is not self.providers[0]), key=speed)
+
+    def fetch_daily(self, pairs, end_date):
+        """Fetch pairs through the healthy providers. Returns {symbol: (provider_name, [bar, ...])}."""
+        results = {}
+        pending = list(pairs)
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            for provider in self.healthy():
+                if not pending:
+                    break
+                started = time.monotonic()
+                future = executor.submit(provider.fetch_daily, pending, end_date)
+                try:
+                    fetched = future.result(timeout=provider.timeout)
+                except FutureTimeout:
+                    self._record(provider, time.monotonic() - started, ok=False, slow=True)
+                    logger.warning(f"{provider.name}: no response within {provider.timeout}s; failing over")
+                    # The slow call keeps running in its worker; use a fresh one for the next provider
+                    executor.shutdown(wait=False)
+                    executor = ThreadPoolExecutor(max_workers=1)
+                    continue
+                except Exception as e:
+                    self._record(provider, time.monotonic() - started, ok=False)
+                    logger.warning(f"{provider.name}: {type(e).__name__}: {e}; failing over")
+                    continue
+
+                latency = time.monotonic() - started
+                got = {symbol: bars for symbol, bars in fetched.items() if bars}
+                self._record(provider, latency, ok=bool(got))
+                for symbol, bars in got.items():
+                    results[symbol] = (provider.name, bars)
+                pending = [p for p in pending if p[0] not in results]
+                logger.info(f"{provider.name}: {len(got)} pair(s) in {latency:.2f}s"
+                            + (f", {len(pending)} left for failover" if pending else ""))
+        finally:
+            executor.shutdown(wait=False)
+            self.save_stats()
+
+        for symbol, *_ in pending:
+            logger.warning(f"{symbol}: no provider returned data")
+        return results
+
+
+def build_router(symbols, max_rps=DEFAULT_MAX_RPS):
+    """
+    Router over every provider that has credentials configured (OANDA, Polygon, then yfinance).
+    symbols: symbol_master.SymbolResolver, for the providers' ticker formats.
+    """
+    providers = []
+    if os.getenv("OANDA_API_TOKEN"):
+        providers.append(OandaProvider(os.getenv("OANDA_API_TOKEN"), symbols,
+                                       os.getenv("OANDA_ENVIRONMENT", "practice"), max_rps=max_rps))
+    if os.getenv("POLYGON_API_KEY"):
+        providers.append(PolygonProvider(os.getenv("POLYGON_API_KEY"), symbols))
+    providers.append(YFinanceProvider())
+    logger.info(f"Forex providers: {', '.join(p.name for p in providers)}")
+    return ProviderRouter(providers)
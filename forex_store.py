@@ -0,0 +1,150 @@
+"""
+forex_hist_data storage helpers
+===============================
+Shared by the forex loaders:
+    get_watermarks(conn)             - last stored trading_date per pair (one GROUP BY)
+    upsert_bars(conn, bars)          - bulk upsert of daily OHLC bars via sql_loader.bulk_merge
+    ensure_source_type(conn)         - forex_master.source_type ('sourced' = fetched, 'derived' = cross)
+    fill_daily_changes(conn, since)  - post-load stage: previous_close / daily_change / daily_change_pct
+                                       from LAG(close_price), one set-based UPDATE over the pairs
+                                       written since the run started
+    is_weekday(trading_date)         - OANDA-convention trading dates (Monday-Friday) filter for
+                                       UTC-day sources (Polygon, yfinance)
+
+Usage:
+    from forex_store import get_watermarks, upsert_bars, fill_daily_changes
+    from sql_loader import server_time
+    watermarks = get_watermarks(conn)                  # {'EURUSD': date(2026, 4, 20), ...}
+    upsert_bars(conn, bars, data_source='oanda')       # bars: list of dicts (see BAR_COLUMNS)
+    run_started = server_time(conn)                    # before the run's upserts
+    fill_daily_changes(conn, since=run_started)        # after every load
+"""
+
+import logging
+from sql_loader import bulk_merge, to_db_value
+
+logger = logging.getLogger(__name__)
+
+target_table = "forex_hist_data"
+master_table = "forex_master"
+
+# Columns written by the loaders; previous_close / daily_change(_pct) are derived in-database
+BAR_COLUMNS = [
+    'symbol', 'currency_from', 'currency_to', 'trading_date',
+    'open_price', 'high_price', 'low_price', 'close_price', 'volume',
+]
+UPSERT_COLUMNS = BAR_COLUMNS + ['exchange', 'market_state', 'data_source']
+
+
+ADD_SOURCE_TYPE_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS
+               WHERE TABLE_NAME = '{master_table}' AND COLUMN_NAME = 'source_type')
+BEGIN
+    ALTER TABLE {master_table} ADD source_type VARCHAR(10) NOT NULL
+        CONSTRAINT DF_{master_table}_source_type DEFAULT 'sourced';
+END
+"""
+
+
+def ensure_source_type(conn):
+    """Add forex_master.source_type if missing (existing pairs default to 'sourced')."""
+    cursor = conn.cursor()
+    cursor.execute(ADD_SOURCE_TYPE_SQL)
+    conn.commit()
+
+
+def is_weekday(trading_date):
+    """OANDA-convention trading dates are Monday-Friday; UTC-day sources also emit a partial Sunday bar."""
+    return trading_date.weekday() < 5
+
+
+def get_watermarks(conn, table=target_table):
+    """Last stored trading_date per symbol: {symbol: date}."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT symbol, MAX(trading_date) FROM {table} GROUP BY symbol")
+    return {symbol: last_date for symbol, last_date in cursor.fetchall()}
+
+
+def upsert_bars(conn, bars, data_source, table=target_table, mode='overwrite'):
+    """
+    Upsert daily bars (dicts keyed by BAR_COLUMNS) into forex_hist_data in one staged MERGE.
+    Existing (symbol, trading_date) rows are overwritten only when a value changed;
+    mode='insert' leaves them untouched.
+
+    Returns (inserted, updated).
+    """
+    rows = [
+        tuple(to_db_value(bar[c]) for c in BAR_COLUMNS) + ('CCY', 'REGULAR', data_source)
+        for bar in bars
+    ]
+    return bulk_merge(conn, table, UPSERT_COLUMNS, ['symbol', 'trading_date'], rows, mode=mode,
+                      extra_set={'last_updated': 'GETDATE()'})
+
+
+# Rows whose stored previous_close / daily_change no longer match the prior session
+# (new rows, back-filled gaps, revised closes on either side). LAG runs over the
+# (symbol, trading_date) order, served by UQ_forex_symbol_date, so the first bar of a run
+# sees the right prior close.
+FILL_CHANGES_SET_SQL = """
+UPDATE ordered
+SET previous_close = lag_close,
+    daily_change = close_price - lag_close,
+    daily_change_pct = CAST((close_price - lag_close) * 100.0 / lag_close AS DECIMAL(10, 4))
+WHERE lag_close IS NOT NULL
+  AND lag_close <> 0
+  AND trading_date >= first_date
+  AND (previous_close IS NULL OR previous_close <> lag_close
+       OR daily_change IS NULL OR daily_change <> close_price - lag_close);
+"""
+
+# Whole table (full rebuilds)
+FILL_CHANGES_SQL = """
+WITH ordered AS (
+    SELECT
+        trading_date, close_price, previous_close, daily_change, daily_change_pct,
+        CAST('1900-01-01' AS DATE) AS first_date,
+        LAG(close_price) OVER (PARTITION BY symbol ORDER BY trading_date) AS lag_close
+    FROM {table}
+)
+""" + FILL_CHANGES_SET_SQL
+
+# Only symbols with rows written since @since (last_updated is stamped by upsert_bars on real
+# changes), from the bar before their earliest written trading_date: that bar anchors LAG,
+# and every later row is rechecked because a revised close also changes the next day's change.
+FILL_CHANGES_SINCE_SQL = """
+DECLARE @since DATETIME2(3) = ?;
+WITH touched AS (
+    SELECT symbol, MIN(trading_date) AS first_date
+    FROM {table}
+    WHERE last_updated >= @since
+    GROUP BY symbol
+),
+ordered AS (
+    SELECT
+        f.trading_date, f.close_price, f.previous_close, f.daily_change, f.daily_change_pct,
+        t.first_date,
+        LAG(f.close_price) OVER (PARTITION BY f.symbol ORDER BY f.trading_date) AS lag_close
+    FROM {table} AS f
+    JOIN touched AS t ON t.symbol = f.symbol
+    WHERE f.trading_date >= ISNULL((SELECT MAX(p.trading_date) FROM {table} AS p
+                                    WHERE p.symbol = f.symbol AND p.trading_date < t.first_date),
+                                   t.first_date)
+)
+""" + FILL_CHANGES_SET_SQL
+
+
+def fill_daily_changes(conn, table=target_table, since=None):
+    """
+    Derive previous_close / daily_change / daily_change_pct in-database. Returns rows updated.
+    since: server time (sql_loader.server_time) taken before the run's upserts; only the pairs
+    written after it are rescanned. None rescans the whole table.
+    """
+    cursor = conn.cursor()
+    if since is None:
+        cursor.execute(FILL_CHANGES_SQL.format(table=table))
+    else:
+        cursor.execute(FILL_CHANGES_SINCE_SQL.format(table=table), since)
+    updated = cursor.rowcount
+    conn.commit()
+    logger.info(f"{table}: previous_close/daily_change filled for {updated} row(s)")
+    return updated
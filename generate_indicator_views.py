@@ -0,0 +1,414 @@
+"""
+Indicator View DDL Generator
+============================
+Emits the technical-indicator views (RSI, MACD, Bollinger bands, ATR, EMA/SMA and the
+signal views on top of them) for any daily OHLCV table from the single definition in
+VIEW_TEMPLATES, instead of hand-copied per-market scripts.
+
+Per table:
+    - VARCHAR price tables (nse_500_hist_data, nasdaq_100_hist_data) get a persisted
+      computed column close_num = TRY_CAST(close_price AS FLOAT) and a covering index
+      (symbol, trading_date) INCLUDE (close_num). The views window over that narrow
+      index instead of casting every VARCHAR row of the base table on each query.
+    - Numeric price tables (forex_hist_data) cast DECIMAL -> FLOAT inline.
+    - Views are created WITH SCHEMABINDING, so the price columns and close_num they
+      depend on cannot be dropped or altered underneath them.
+
+SQL Server cannot index a view that uses window functions (OVER / LAG), so these
+views are never indexed views. The persisted column + index above is the indexable
+part; the fully materialized results live in the indicator tables written by
+indicator_engine.py (forex_indicators, nse_500_indicators, nasdaq_100_indicators).
+
+The formulas keep the legacy view semantics (weighted-window "EMA", simple-average RSI,
+close-to-close ATR) so generated views are drop-in replacements; benchmark_indicator_views.py
+compares them with the existing views and the indicator tables.
+
+Usage:
+    python generate_indicator_views.py                        # Write create_<prefix>_views.sql for all markets
+    python generate_indicator_views.py --market nse --apply   # Run the DDL against stockdata_db
+    python generate_indicator_views.py --table my_hist --symbol-column ticker --varchar-prices --prefix my
+    python generate_indicator_views.py --market fx --prefix forex_gen   # Side-by-side copy for benchmarking
+"""
+
+import argparse
+import re
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+MARKETS = {
+    'fx': {'table': 'forex_hist_data', 'symbol_column': 'symbol', 'varchar_prices': False, 'prefix': 'forex'},
+    'nse': {'table': 'nse_500_hist_data', 'symbol_column': 'ticker', 'varchar_prices': True, 'prefix': 'nse_500'},
+    'nasdaq': {'table': 'nasdaq_100_hist_data', 'symbol_column': 'ticker', 'varchar_prices': True,
+               'prefix': 'nasdaq_100'},
+}
+
+SMA_WINDOWS = (200, 100, 50, 20)
+
+# Dependency order: base indicator views first, signal views after
+VIEW_NAMES = ['RSI_calculation', 'macd', 'bollingerband', 'atr', 'ema_sma_view',
+              'atr_spikes', 'bb_signals', 'macd_signals', 'rsi_signals', 'sma_signals']
+
+
+def ema_columns(spans, indent):
+    """Weighted-window EMA expressions for the ema_sma view (legacy definition)."""
+    lines = []
+    for span in spans:
+        window = f"PARTITION BY e.{{sym}} ORDER BY e.trading_date ROWS BETWEEN {span - 1} PRECEDING AND CURRENT ROW"
+        lines.append(
+            f"{indent}SUM(e.close_price * e.Weight_{span}) OVER ({window}) /\n"
+            f"{indent}CASE WHEN SUM(e.Weight_{span}) OVER ({window}) = 0 THEN 1\n"
+            f"{indent}     ELSE SUM(e.Weight_{span}) OVER ({window}) END AS EMA_{span}"
+        )
+    return ',\n\n'.join(lines)
+
+
+def sma_columns(windows, indent):
+    return ',\n'.join(
+        f"{indent}AVG({{close}}) OVER (PARTITION BY {{sym}} ORDER BY trading_date "
+        f"ROWS BETWEEN {w - 1} PRECEDING AND CURRENT ROW) AS SMA_{w}"
+        for w in windows
+    )
+
+
+EMA_SMA_OUTPUT = (['close_price'] + [f'SMA_{w}' for w in SMA_WINDOWS] + [f'EMA_{w}' for w in SMA_WINDOWS]
+                  + [f'SMA_{w}_Flag' for w in SMA_WINDOWS] + [f'EMA_{w}_Flag' for w in SMA_WINDOWS])
+
+VIEW_TEMPLATES = {
+    'RSI_calculation': """
+WITH GainsLosses AS (
+    SELECT
+        {sym},
+        trading_date,
+        {close} AS close_price,
+        LAG({close}, 1) OVER (PARTITION BY {sym} ORDER BY trading_date) AS prev_close
+    FROM {source}
+    WHERE {close} IS NOT NULL
+),
+AvgGainsLosses AS (
+    SELECT
+        {sym},
+        trading_date,
+        AVG(CASE WHEN close_price > prev_close THEN close_price - prev_close ELSE 0 END)
+            OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS avg_gain,
+        AVG(CASE WHEN close_price < prev_close THEN prev_close - close_price ELSE 0 END)
+            OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS avg_loss
+    FROM GainsLosses
+)
+SELECT
+    {sym},
+    trading_date,
+    CASE
+        WHEN avg_loss = 0 THEN 100
+        ELSE 100 - (100 / (1 + (avg_gain / NULLIF(avg_loss, 0))))
+    END AS RSI
+FROM AvgGainsLosses""",
+
+    'macd': """
+WITH PriceData AS (
+    SELECT
+        {sym},
+        trading_date,
+        {close} AS close_price,
+        ROW_NUMBER() OVER (PARTITION BY {sym} ORDER BY trading_date) AS RowNum
+    FROM {source}
+    WHERE {close} IS NOT NULL
+),
+MACD_Calculations AS (
+    SELECT
+        p.{sym},
+        p.trading_date,
+        SUM(p.close_price * POWER(1 - (2.0 / 13), p.RowNum - 1))
+            OVER (PARTITION BY p.{sym} ORDER BY p.trading_date ROWS BETWEEN 11 PRECEDING AND CURRENT ROW) /
+        NULLIF(SUM(POWER(1 - (2.0 / 13), p.RowNum - 1))
+            OVER (PARTITION BY p.{sym} ORDER BY p.trading_date ROWS BETWEEN 11 PRECEDING AND CURRENT ROW), 0) AS EMA_12,
+        SUM(p.close_price * POWER(1 - (2.0 / 27), p.RowNum - 1))
+            OVER (PARTITION BY p.{sym} ORDER BY p.trading_date ROWS BETWEEN 25 PRECEDING AND CURRENT ROW) /
+        NULLIF(SUM(POWER(1 - (2.0 / 27), p.RowNum - 1))
+            OVER (PARTITION BY p.{sym} ORDER BY p.trading_date ROWS BETWEEN 25 PRECEDING AND CURRENT ROW), 0) AS EMA_26
+    FROM PriceData p
+),
+Signal_Line_Calculations AS (
+    SELECT
+        {sym},
+        trading_date,
+        EMA_12,
+        EMA_26,
+        EMA_12 - EMA_26 AS MACD,
+        AVG(EMA_12 - EMA_26) OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 8 PRECEDING AND CURRENT ROW) AS Signal_Line
+    FROM MACD_Calculations
+)
+SELECT
+    {sym},
+    trading_date,
+    EMA_12,
+    EMA_26,
+    MACD,
+    Signal_Line,
+    CASE WHEN MACD > Signal_Line THEN 'Bullish Crossover' ELSE 'Bearish Crossover' END AS MACD_Signal
+FROM Signal_Line_Calculations
+WHERE EMA_12 IS NOT NULL AND EMA_26 IS NOT NULL""",
+
+    'bollingerband': """
+SELECT
+    {sym},
+    trading_date,
+    close_price,
+    SMA_20,
+    SMA_20 + 2 * STD_20 AS Upper_Band,
+    SMA_20 - 2 * STD_20 AS Lower_Band
+FROM (
+    SELECT
+        {sym},
+        trading_date,
+        {close} AS close_price,
+        AVG({close}) OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS SMA_20,
+        STDEV({close}) OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 19 PRECEDING AND CURRENT ROW) AS STD_20
+    FROM {source}
+    WHERE {close} IS NOT NULL
+) AS bands""",
+
+    'atr': """
+WITH TR_Calculations AS (
+    SELECT
+        {sym},
+        trading_date,
+        ABS({close} - LAG({close}, 1) OVER (PARTITION BY {sym} ORDER BY trading_date)) AS True_Range
+    FROM {source}
+    WHERE {close} IS NOT NULL
+)
+SELECT
+    {sym},
+    trading_date,
+    AVG(True_Range) OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 13 PRECEDING AND CURRENT ROW) AS ATR_14
+FROM TR_Calculations""",
+
+    'ema_sma_view': """
+WITH PriceData AS (
+    SELECT
+        {sym},
+        trading_date,
+        {close} AS close_price,
+""" + sma_columns(SMA_WINDOWS, '        ') + """,
+        ROW_NUMBER() OVER (PARTITION BY {sym} ORDER BY trading_date) AS RowNum
+    FROM {source}
+    WHERE {close} IS NOT NULL
+),
+EMA_Base AS (
+    SELECT
+        p.{sym},
+        p.trading_date,
+        p.close_price,
+""" + ',\n'.join(f"        p.SMA_{w}" for w in SMA_WINDOWS) + """,
+        p.RowNum,
+""" + ',\n'.join(f"        POWER(1 - (2.0 / ({w} + 1)), RowNum - 1) AS Weight_{w}" for w in SMA_WINDOWS) + """
+    FROM PriceData p
+),
+EMA_Calculations AS (
+    SELECT
+        e.{sym},
+        e.trading_date,
+        e.close_price,
+""" + ',\n'.join(f"        e.SMA_{w}" for w in SMA_WINDOWS) + """,
+
+""" + ema_columns(SMA_WINDOWS, '        ') + """
+    FROM EMA_Base e
+)
+SELECT
+    {sym},
+    trading_date,
+    close_price,
+""" + ',\n'.join(f"    SMA_{w}" for w in SMA_WINDOWS) + ',\n' + ',\n'.join(f"    EMA_{w}" for w in SMA_WINDOWS) + """,
+""" + ',\n'.join(f"    CASE WHEN close_price > SMA_{w} THEN 'Above' ELSE 'Below' END AS SMA_{w}_Flag"
+                 for w in SMA_WINDOWS) + """,
+""" + ',\n'.join(f"    CASE WHEN close_price > EMA_{w} THEN 'Above' ELSE 'Below' END AS EMA_{w}_Flag"
+                 for w in SMA_WINDOWS) + """
+FROM EMA_Calculations""",
+
+    'atr_spikes': """
+SELECT
+    {sym},
+    trading_date,
+    ATR_14,
+    CASE
+        WHEN ATR_14 > AVG(ATR_14) OVER (PARTITION BY {sym} ORDER BY trading_date ROWS BETWEEN 20 PRECEDING AND CURRENT ROW) * 1.5
+            THEN 'High Volatility'
+        ELSE NULL
+    END AS atr_volatility_signal
+FROM dbo.{prefix}_atr
+WHERE ATR_14 IS NOT NULL""",
+
+    'bb_signals': """
+SELECT
+    {sym},
+    trading_date,
+    close_price,
+    SMA_20,
+    Upper_Band,
+    Lower_Band,
+    CASE
+        WHEN close_price > Upper_Band THEN 'Breakout Above Upper Band (Sell Zone)'
+        WHEN close_price < Lower_Band THEN 'Breakdown Below Lower Band (Buy Zone)'
+        ELSE NULL
+    END AS bb_trade_signal
+FROM dbo.{prefix}_bollingerband
+WHERE Upper_Band IS NOT NULL AND Lower_Band IS NOT NULL""",
+
+    'macd_signals': """
+WITH cte AS (
+    SELECT
+        {sym},
+        trading_date,
+        MACD,
+        Signal_Line,
+        LAG(MACD) OVER (PARTITION BY {sym} ORDER BY trading_date) AS prev_macd,
+        LAG(Signal_Line) OVER (PARTITION BY {sym} ORDER BY trading_date) AS prev_signal
+    FROM dbo.{prefix}_macd
+)
+SELECT
+    {sym},
+    trading_date,
+    MACD,
+    Signal_Line,
+    CASE
+        WHEN prev_macd < prev_signal AND MACD > Signal_Line THEN 'Bullish Crossover'
+        WHEN prev_macd > prev_signal AND MACD < Signal_Line THEN 'Bearish Crossover'
+        ELSE 'No Signal'
+    END AS MACD_Signal
+FROM cte""",
+
+    'rsi_signals': """
+SELECT
+    {sym},
+    trading_date,
+    RSI,
+    CASE
+        WHEN RSI < 30 THEN 'Oversold (Buy)'
+        WHEN RSI > 70 THEN 'Overbought (Sell)'
+        ELSE NULL
+    END AS rsi_trade_signal
+FROM dbo.{prefix}_RSI_calculation
+WHERE RSI IS NOT NULL""",
+
+    'sma_signals': """
+SELECT
+    {sym},
+    trading_date,
+""" + ',\n'.join(f"    {c}" for c in EMA_SMA_OUTPUT) + """,
+    CASE
+        WHEN LAG(SMA_20, 1) OVER (PARTITION BY {sym} ORDER BY trading_date) < LAG(SMA_50, 1) OVER (PARTITION BY {sym} ORDER BY trading_date)
+             AND SMA_20 > SMA_50 THEN 'Golden Cross'
+        WHEN LAG(SMA_20, 1) OVER (PARTITION BY {sym} ORDER BY trading_date) > LAG(SMA_50, 1) OVER (PARTITION BY {sym} ORDER BY trading_date)
+             AND SMA_20 < SMA_50 THEN 'Death Cross'
+        ELSE NULL
+    END AS sma_trade_signal
+FROM dbo.{prefix}_ema_sma_view
+WHERE SMA_20 IS NOT NULL AND SMA_50 IS NOT NULL""",
+}
+
+
+def computed_column_ddl(table, symbol_column):
+    """Persisted numeric close + covering index for a VARCHAR price table."""
+    return f"""-- Persisted numeric close: cast once on write instead of on every view query
+IF COL_LENGTH('dbo.{table}', 'close_num') IS NULL
+    ALTER TABLE dbo.{table} ADD close_num AS TRY_CAST(close_price AS FLOAT) PERSISTED;
+GO
+
+IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'IX_{table}_close_num')
+    CREATE NONCLUSTERED INDEX IX_{table}_close_num
+        ON dbo.{table} ({symbol_column}, trading_date) INCLUDE (close_num);
+GO
+"""
+
+
+def generate_ddl(table, symbol_column, varchar_prices, prefix):
+    """Full DDL script (GO-separated batches) for one OHLCV table."""
+    close = 'close_num' if varchar_prices else 'CAST(close_price AS FLOAT)'
+    values = {'sym': symbol_column, 'source': f'dbo.{table}', 'close': close, 'prefix': prefix}
+
+    parts = [f"""-- ============================================
+-- {prefix.upper()} TECHNICAL INDICATOR VIEWS
+-- Generated by generate_indicator_views.py from dbo.{table}; edit the generator, not this file.
+-- The same indicators are materialized per (symbol, trading_date) by indicator_engine.py,
+-- and the signal views as rows of the narrow signals table (signal_generator.py);
+-- prefer those tables for queries.
+-- ============================================
+"""]
+    if varchar_prices:
+        parts.append(computed_column_ddl(table, symbol_column))
+
+    # Drop in reverse dependency order (schema-bound views block dropping what they reference)
+    parts.append('\n'.join(
+        f"IF OBJECT_ID('dbo.{prefix}_{name}', 'V') IS NOT NULL DROP VIEW dbo.{prefix}_{name};"
+        for name in reversed(VIEW_NAMES)
+    ) + '\nGO\n')
+
+    for number, name in enumerate(VIEW_NAMES, 1):
+        body = VIEW_TEMPLATES[name].format(**values).strip('\n')
+        parts.append(f"-- {number}. {prefix}_{name}\n"
+                     f"CREATE VIEW dbo.{prefix}_{name}\nWITH SCHEMABINDING\nAS\n{body};\nGO\n")
+
+    parts.append('\n'.join(
+        [f"PRINT '{prefix} technical indicator views created:';"]
+        + [f"PRINT '  {number}. {prefix}_{name}';" for number, name in enumerate(VIEW_NAMES, 1)]
+    ) + '\nGO\n')
+    return '\n'.join(parts)
+
+
+def split_batches(ddl):
+    """Split a script on GO lines into batches pyodbc can execute."""
+    return [batch.strip() for batch in re.split(r'^\s*GO\s*$', ddl, flags=re.MULTILINE) if batch.strip()]
+
+
+def apply_ddl(ddl):
+    import pyodbc
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    cursor = conn.cursor()
+    for batch in split_batches(ddl):
+        cursor.execute(batch)
+        conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate indicator view DDL for daily OHLCV tables')
+    parser.add_argument('--market', nargs='+', choices=sorted(MARKETS), help='Configured markets (default: all)')
+    parser.add_argument('--table', help='Any other OHLCV table (with --symbol-column and --prefix)')
+    parser.add_argument('--symbol-column', default='ticker', help='Symbol column of --table (default: ticker)')
+    parser.add_argument('--varchar-prices', action='store_true', help='--table stores prices as VARCHAR')
+    parser.add_argument('--prefix', help='View name prefix (overrides the market default; single --market only)')
+    parser.add_argument('--apply', action='store_true', help='Execute the DDL instead of writing .sql files')
+    args = parser.parse_args()
+
+    if args.table:
+        if not args.prefix:
+            parser.error('--table requires --prefix')
+        targets = [(args.table, args.symbol_column, args.varchar_prices, args.prefix)]
+    else:
+        markets = args.market or sorted(MARKETS)
+        if args.prefix and len(markets) > 1:
+            parser.error('--prefix names one set of views; use it with a single --market')
+        targets = []
+        for market in markets:
+            config = MARKETS[market]
+            targets.append((config['table'], config['symbol_column'], config['varchar_prices'],
+                            args.prefix or config['prefix']))
+
+    for table, symbol_column, varchar_prices, prefix in targets:
+        ddl = generate_ddl(table, symbol_column, varchar_prices, prefix)
+        if args.apply:
+            apply_ddl(ddl)
+            print(f"✅ Applied {prefix} indicator views on {table}")
+        else:
+            path = f"create_{prefix}_views.sql"
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(ddl)
+            print(f"✅ Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
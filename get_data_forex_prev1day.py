@@ -1,21 +1,30 @@
 # This py script runs daily using Windows Task Scheduler to get previous day data for Forex pairs
 # Reads forex symbols from dbo.forex_master table and inserts into dbo.forex_hist_data
-# Uses OANDA v20 REST API for accurate forex data
+# Uses OANDA v20 REST API for accurate forex data, failing over to Polygon.io / yfinance
+# (forex_providers) on errors or slow responses
+# Catches up from each pair's last stored date (one ranged candle request per pair)
+# OANDA pairs are fetched concurrently (oanda_async) under a requests-per-second cap
+# Only source_type='sourced' pairs are requested; 'derived' crosses are computed by forex_crosses
 import os
 import logging
 import argparse
 import pandas as pd
 import pyodbc
-import requests
 from datetime import datetime, timedelta
-import time
 from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
+from oanda_async import DEFAULT_MAX_RPS
+from forex_providers import build_router
+from symbol_master import get_resolver
+from forex_store import get_watermarks, upsert_bars, fill_daily_changes, ensure_source_type
+from forex_crosses import derive_crosses
+from indicator_engine import update_indicators
+from sql_loader import server_time
 
 import sys
 
 # Fix Windows console encoding (charmap) — must be done before any logging
-# Without this, Polygon.io error messages containing non-ASCII chars (e.g. ¥ for JPY)
+# Without this, provider error messages containing non-ASCII chars (e.g. ¥ for JPY)
 # crash the StreamHandler and surface as a misleading 'charmap' error instead of the real one
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
@@ -52,6 +61,12 @@ parser.add_argument(
     default=None,
     help="Specific date to load in YYYY-MM-DD format. If omitted, ET 5 PM cutoff logic is used."
 )
+parser.add_argument(
+    "--max-rps",
+    type=float,
+    default=DEFAULT_MAX_RPS,
+    help=f"OANDA requests-per-second cap (default {DEFAULT_MAX_RPS:g}, env OANDA_MAX_RPS)"
+)
 args = parser.parse_args()
 
 # SQL Server Connection Details
@@ -63,15 +78,14 @@ target_table = "forex_hist_data"
 # OANDA v20 REST API Configuration
 OANDA_API_TOKEN = os.getenv("OANDA_API_TOKEN")
 if not OANDA_API_TOKEN:
-    logger.error("OANDA_API_TOKEN not found in .env file. Exiting.")
-    exit(1)
+    logger.warning("OANDA_API_TOKEN not found in .env file; using the fallback providers only.")
 OANDA_ENVIRONMENT = os.getenv("OANDA_ENVIRONMENT", "practice")  # "practice" or "live"
 OANDA_BASE_URL = (
     "https://api-fxpractice.oanda.com" if OANDA_ENVIRONMENT == "practice"
     else "https://api-fxtrade.oanda.com"
 )
-API_WAIT_TIME = 1   # OANDA allows 120 req/s; small delay between pairs is sufficient
-logger.info(f"OANDA environment: {OANDA_ENVIRONMENT} | Base URL: {OANDA_BASE_URL}")
+CATCHUP_MAX_DAYS = 30  # Longest gap the daily job fills on its own
+logger.info(f"OANDA environment: {OANDA_ENVIRONMENT} | Base URL: {OANDA_BASE_URL} | Max {args.max_rps:g} req/s")
 
 # Connect to SQL Server
 try:
@@ -82,17 +96,19 @@ try:
         f"Trusted_Connection=yes;"
     )
     cursor = conn.cursor()
+    run_started = server_time(conn)  # rows written after this get their daily changes refilled
     logger.info("Connected to SQL Server successfully.")
 except Exception as e:
     logger.error(f"Connection failed: {e}")
     exit(1)
 
-# Fetch active forex symbols from master table
+# Fetch active sourced forex symbols from master table (derived crosses cost no API call)
 try:
+    ensure_source_type(conn)
     cursor.execute(f"""
         SELECT symbol, currency_from, currency_to, yfinance_symbol 
         FROM {source_table} 
-        WHERE is_active = 'Y'
+        WHERE is_active = 'Y' AND ISNULL(source_type, 'sourced') = 'sourced'
         ORDER BY symbol
     """)
     forex_symbols = cursor.fetchall()
@@ -107,102 +123,6 @@ except Exception as e:
     logger.error(f"Failed to fetch forex symbols: {e}")
     exit(1)
 
-# Function to fetch forex data from OANDA v20 REST API
-def fetch_forex_latest(from_currency, to_currency, api_token, target_date, oanda_base_url):
-    """
-    Fetch forex daily mid-price candle from OANDA v20 REST API for a specific date.
-    Daily bars are aligned to 17:00 New York time (standard forex NY close convention).
-
-    Parameters:
-    -----------
-    from_currency : str
-        Base currency (e.g., 'AUD', 'EUR')
-    to_currency : str
-        Quote currency (e.g., 'USD')
-    api_token : str
-        OANDA v20 personal access token
-    target_date : date
-        Target trading date
-    oanda_base_url : str
-        OANDA API base URL (practice or live environment)
-
-    Returns:
-    --------
-    dict or None: Trading data for the target date
-    """
-    # OANDA instrument format: EUR_USD, GBP_USD, etc.
-    instrument = f"{from_currency}_{to_currency}"
-    # Fetch a 3-day window to reliably capture the target date's daily bar.
-    # OANDA daily bars are anchored to 17:00 New York time, so the bar labelled
-    # with time T21:00:00Z (5pm EDT) represents the next calendar day's trading.
-    # A generous window ensures we always capture the right complete candle.
-    from_dt = f"{(target_date - timedelta(days=2)).strftime('%Y-%m-%d')}T00:00:00Z"
-    to_dt = f"{(target_date + timedelta(days=1)).strftime('%Y-%m-%d')}T00:00:00Z"
-
-    url = f"{oanda_base_url}/v3/instruments/{instrument}/candles"
-    headers = {
-        'Authorization': f'Bearer {api_token}',
-        'Accept-Datetime-Format': 'RFC3339',
-    }
-    params = {
-        'price': 'M',                          # Mid prices (bid/ask average)
-        'granularity': 'D',                    # Daily bars
-        'from': from_dt,
-        'to': to_dt,
-        'dailyAlignment': '17',                # 5pm NY close convention
-        'alignmentTimezone': 'America/New_York',
-    }
-
-    for attempt in range(3):
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
-
-            if response.status_code == 429:
-                wait = 60 * (attempt + 1)
-                logger.warning(f"Rate limited (429) for {from_currency}/{to_currency}. Waiting {wait}s before retry {attempt + 1}/3...")
-                time.sleep(wait)
-                continue
-
-            if response.status_code == 401:
-                logger.error(f"OANDA 401 Unauthorized for {from_currency}/{to_currency} — check OANDA_API_TOKEN in .env")
-                return None
-
-            if response.status_code == 404:
-                logger.warning(f"OANDA 404 — instrument {instrument} not found or not supported on this account")
-                return None
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Filter to complete candles only (incomplete = still forming in current session)
-            candles = [c for c in data.get('candles', []) if c.get('complete', False)]
-
-            if not candles:
-                logger.warning(f"No complete candle data from OANDA for {from_currency}/{to_currency} on {target_date}")
-                return None
-
-            # Take the last complete candle in the window (closest to target date)
-            candle = candles[-1]
-            mid = candle['mid']
-
-            return {
-                'trading_date': target_date,
-                'open_price': float(mid['o']),
-                'high_price': float(mid['h']),
-                'low_price': float(mid['l']),
-                'close_price': float(mid['c']),
-                'volume': int(candle.get('volume', 0))  # Tick volume (price tick count)
-            }
-
-        except requests.exceptions.Timeout:
-            logger.warning(f"Request timeout for {from_currency}/{to_currency} (attempt {attempt + 1}/3)")
-        except Exception as e:
-            logger.error(f"Error fetching data for {from_currency}/{to_currency}: {e}")
-            return None
-
-    logger.error(f"All retries exhausted for {from_currency}/{to_currency}")
-    return None
-
 # Calculate target trading day based on ET 5 PM forex daily close
 def get_previous_trading_day(reference_date, steps_back=1):
     """
@@ -258,114 +178,77 @@ cli_target_date = parse_target_date(args.target_date)
 
 if cli_target_date:
     target_day = cli_target_date
-    fallback_day = cli_target_date  # exact-date load by default when override is provided
     logger.info(f"Using CLI override date: {cli_target_date.strftime('%Y-%m-%d')}")
 else:
-    target_day, fallback_day = get_target_and_fallback_days(now_et)
+    target_day, _ = get_target_and_fallback_days(now_et)
 
 target_day_str = target_day.strftime('%Y-%m-%d')
-fallback_day_str = fallback_day.strftime('%Y-%m-%d')
 logger.info(f"Current ET time: {now_et.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-logger.info(f"Primary target date: {target_day_str} | Fallback date: {fallback_day_str}")
+logger.info(f"Target date: {target_day_str}")
+
+# Per-pair watermark: request every missing daily candle since the last stored date
+# (capped at CATCHUP_MAX_DAYS; longer gaps are for get_histdata_forex_adhoc.py).
+# A --target-date override reloads exactly that date.
+watermarks = get_watermarks(conn)
+catchup_floor = target_day - timedelta(days=CATCHUP_MAX_DAYS)
+plan = []
+for symbol, currency_from, currency_to, yfinance_symbol in forex_symbols:
+    last_date = watermarks.get(symbol)
+    if cli_target_date or last_date is None:
+        start = target_day
+    elif last_date >= target_day:
+        logger.info(f"{symbol}: up to date (last stored {last_date})")
+        continue
+    else:
+        start = max(last_date + timedelta(days=1), catchup_floor)
+    plan.append((symbol, currency_from, currency_to, yfinance_symbol, start))
+
+logger.info(f"{len(plan)} pair(s) need data; {len(forex_symbols) - len(plan)} already up to date.")
 
-# Process each forex pair
 success_count = 0
 error_count = 0
-
-for idx, (symbol, currency_from, currency_to, yfinance_symbol) in enumerate(forex_symbols, 1):
-    try:
-        logger.info(f"[{idx}/{len(forex_symbols)}] Processing {symbol} ({currency_from}/{currency_to})...")
-        
-        # Fetch data from OANDA — try primary date first, then fallback date
-        forex_data = fetch_forex_latest(currency_from, currency_to, OANDA_API_TOKEN, target_day, OANDA_BASE_URL)
-
-        if not forex_data and target_day != fallback_day:
-            logger.info(f"Primary date not available, trying fallback date {fallback_day_str}...")
-            forex_data = fetch_forex_latest(currency_from, currency_to, OANDA_API_TOKEN, fallback_day, OANDA_BASE_URL)
-        
-        if not forex_data:
-            logger.warning(f"No data found for {symbol}. Skipping.")
+bars = []
+
+if plan:
+    # Configured primary first, then fallbacks fastest-first; errors / slow responses / missing pairs fail over
+    fetched = build_router(get_resolver(conn), max_rps=args.max_rps).fetch_daily(plan, target_day)
+    bars_by_source = {}
+    for symbol, currency_from, currency_to, yfinance_symbol, start in plan:
+        provider_name, pair_bars = fetched.get(symbol, (None, []))
+        if not pair_bars:
+            logger.warning(f"No data found for {symbol} since {start}. Skipping.")
             error_count += 1
             continue
-        
-        # Extract data from Polygon.io response
-        trading_date = forex_data['trading_date']
-        open_price = forex_data['open_price']
-        high_price = forex_data['high_price']
-        low_price = forex_data['low_price']
-        close_price = forex_data['close_price']
-        volume = forex_data['volume']
-        
-        # Calculate daily change (simplified - no previous_close from API)
-        previous_close = None
-        daily_change = None
-        daily_change_pct = None
-        
-        # Check if record already exists
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM {target_table} 
-            WHERE symbol = ? AND trading_date = ?
-        """, (symbol, trading_date))
-        
-        exists = cursor.fetchone()[0]
-        
-        if exists > 0:
-            # Update existing record
-            update_query = f"""
-            UPDATE {target_table}
-            SET 
-                currency_from = ?,
-                currency_to = ?,
-                open_price = ?,
-                high_price = ?,
-                low_price = ?,
-                close_price = ?,
-                volume = ?,
-                daily_change = ?,
-                daily_change_pct = ?,
-                previous_close = ?,
-                exchange = 'CCY',
-                market_state = 'REGULAR',
-                created_date = GETDATE()
-            WHERE symbol = ? AND trading_date = ?
-            """
-            cursor.execute(update_query, (
-                currency_from, currency_to,
-                open_price, high_price, low_price, close_price, volume,
-                daily_change, daily_change_pct, previous_close,
-                symbol, trading_date
-            ))
-            logger.info(f"Updated {symbol} for {trading_date}")
-        else:
-            # Insert new record
-            insert_query = f"""
-            INSERT INTO {target_table} (
-                symbol, currency_from, currency_to, trading_date,
-                open_price, high_price, low_price, close_price, volume,
-                daily_change, daily_change_pct, previous_close,
-                exchange, market_state, created_date
-            )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'CCY', 'REGULAR', GETDATE())
-            """
-            cursor.execute(insert_query, (
-                symbol, currency_from, currency_to, trading_date,
-                open_price, high_price, low_price, close_price, volume,
-                daily_change, daily_change_pct, previous_close
-            ))
-            logger.info(f"Inserted {symbol} for {trading_date}")
-        
-        conn.commit()
+        logger.info(f"{symbol}: {len(pair_bars)} bar(s) {pair_bars[0]['trading_date']} .. "
+                    f"{pair_bars[-1]['trading_date']} via {provider_name}")
+        bars_by_source.setdefault(provider_name, []).extend(pair_bars)
+        bars.extend(pair_bars)
         success_count += 1
-        
-        # Rate limiting for Polygon free tier safety
-        if idx < len(forex_symbols):
-            time.sleep(API_WAIT_TIME)
-            
+
+    try:
+        inserted = updated = 0
+        for provider_name, source_bars in bars_by_source.items():
+            source_inserted, source_updated = upsert_bars(conn, source_bars, data_source=provider_name)
+            inserted += source_inserted
+            updated += source_updated
     except Exception as e:
-        logger.error(f"Error processing {symbol}: {str(e)}")
-        error_count += 1
+        logger.error(f"Failed to upsert {len(bars)} bars into {target_table}: {e}")
         conn.rollback()
-        continue
+        error_count += success_count
+        success_count = 0
+        inserted = updated = 0
+else:
+    inserted = updated = 0
+
+# Derived crosses from the stored USD legs, previous_close / daily_change(_pct)
+# in-database from the prior session, then indicators for the new bars
+try:
+    derive_crosses(conn)
+    fill_daily_changes(conn, since=run_started)
+    update_indicators(conn, 'fx')
+except Exception as e:
+    logger.error(f"Post-load stage failed: {e}")
+    conn.rollback()
 
 # Close connection
 cursor.close()
@@ -373,7 +256,8 @@ conn.close()
 
 # Summary
 logger.info("=" * 60)
-logger.info("FOREX DATA UPDATE SUMMARY (OANDA v20 REST API)")
-logger.info(f"Successfully processed: {success_count} records | Errors: {error_count} records")
-logger.info(f"Target date: {target_day_str} | Fallback: {fallback_day_str}")
+logger.info("FOREX DATA UPDATE SUMMARY (OANDA v20 REST API with provider failover)")
+logger.info(f"Pairs loaded: {success_count} | Errors: {error_count} | Bars: {len(bars)} "
+            f"({inserted} inserted, {updated} updated)")
+logger.info(f"Target date: {target_day_str}")
 logger.info("=" * 60)
@@ -4,7 +4,11 @@ import pandas as pd
 import pyodbc
 import logging
 import os
+import sys
+import argparse
 from datetime import datetime, timedelta
+import retry_queue
+from indicator_engine import update_indicators
 
 # Logging setup
 log_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
@@ -18,11 +22,17 @@ logging.basicConfig(
     ]
 )
 
+parser = argparse.ArgumentParser(description="Daily NASDAQ price load into nasdaq_100_hist_data")
+parser.add_argument('--retry-failed', action='store_true',
+                    help='Only re-process tickers queued in etl_retry_queue by earlier failed runs')
+args = parser.parse_args()
+
 # SQL Server connection setup
 server = "localhost\\MSSQLSERVER01"
 database = "stockdata_db"
 source_table = "nasdaq_top100"
 target_table = "nasdaq_100_hist_data"
+job_name = f"prices:{target_table}"
 
 # Connect to SQL Server
 try:
@@ -58,15 +68,30 @@ END
 """
 cursor.execute(create_table_query)
 conn.commit()
+retry_queue.ensure_queue_table(conn)
 
 # Fetch NASDAQ-100 tickers
-cursor.execute(f"SELECT ticker, company_name FROM {source_table}")
+# process_flag 'N' = retired by reconcile_universe.py
+cursor.execute(f"SELECT ticker, company_name FROM {source_table} WHERE ISNULL(process_flag, 'Y') <> 'N'")
 nasdaq100_tickers = cursor.fetchall()
 
+if args.retry_failed:
+    due = set(retry_queue.get_due_tickers(conn, job_name))
+    nasdaq100_tickers = [(t, c) for t, c in nasdaq100_tickers if t in due]
+    logging.info(f"Retry mode: {len(nasdaq100_tickers)} queued tickers due for retry")
+    if not nasdaq100_tickers:
+        logging.info("Retry queue is empty. Nothing to do.")
+        exit()
+
 if not nasdaq100_tickers:
     print("❌ No tickers found.")
     exit()
 
+succeeded = []
+failures = []  # (ticker, error_class, error_message) for the retry queue
+# An empty download this many days after the last stored bar is a weekend/holiday, not a failure
+NO_DATA_GRACE_DAYS = 4
+
 # Loop through tickers
 for ticker, company_name in nasdaq100_tickers:
     try:
@@ -88,7 +113,13 @@ for ticker, company_name in nasdaq100_tickers:
         data = stock.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'), interval="1d")
 
         if data.empty:
-            logging.warning(f"{ticker}: No data returned. Skipping.")
+            if max_date and (datetime.today().date() - max_date).days <= NO_DATA_GRACE_DAYS:
+                # Nothing traded since the last stored bar (weekend / holiday): up to date
+                logging.info(f"{ticker}: No new data since {max_date}.")
+                succeeded.append(ticker)
+            else:
+                logging.warning(f"{ticker}: No data returned. Queued for retry.")
+                failures.append((ticker, 'NoData', f"No data returned from {start_date:%Y-%m-%d}"))
             continue
 
         data = data.reset_index().rename(columns={"Date": "trading_date"})
@@ -122,6 +153,7 @@ for ticker, company_name in nasdaq100_tickers:
             inserted += 1
 
         conn.commit()
+        succeeded.append(ticker)
         if skipped > 0:
             logging.info(f"{ticker}: {inserted} inserted, {skipped} skipped (already exist)")
         else:
@@ -129,9 +161,24 @@ for ticker, company_name in nasdaq100_tickers:
 
     except Exception as e:
         logging.error(f"{ticker}: FAILED — {e}")
+        conn.rollback()
+        failures.append((ticker, retry_queue.error_class_of(e), e))
         continue
 
+# Record failures for the next --retry-failed run and drop repaired tickers from the queue
+retry_queue.clear_tickers(conn, job_name, succeeded)
+retry_queue.record_failures(conn, job_name, failures)
+
+# Indicators for the bars loaded in this run
+try:
+    update_indicators(conn, 'nasdaq')
+except Exception as e:
+    logging.error(f"Indicator update failed: {e}")
+    conn.rollback()
+
 # Clean up
 cursor.close()
 conn.close()
-logging.info("All done!")
\ No newline at end of file
+logging.info(f"All done! Succeeded: {len(succeeded)} | Failed (queued for retry): {len(failures)}")
+if failures:
+    sys.exit(1)
\ No newline at end of file
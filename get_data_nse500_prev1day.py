@@ -5,7 +5,10 @@ import pyodbc
 import logging
 import os
 import sys
+import argparse
 from datetime import datetime, timedelta
+import retry_queue
+from indicator_engine import update_indicators
 
 # --- Logging setup ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -23,11 +26,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+parser = argparse.ArgumentParser(description="Daily NSE price load into nse_500_hist_data")
+parser.add_argument("--retry-failed", action="store_true",
+                    help="Only re-process tickers queued in etl_retry_queue by earlier failed runs")
+args = parser.parse_args()
+
 # SQL Server Connection Details
 server = "localhost\\MSSQLSERVER01"
 database = "stockdata_db"
 source_table = "nse_500"
 target_table = "nse_500_hist_data"
+job_name = f"prices:{target_table}"
 
 logger.info("=" * 50)
 logger.info("NSE Stock Fetch started at %s", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
@@ -68,11 +77,21 @@ END
 """
 cursor.execute(create_table_query)
 conn.commit()
+retry_queue.ensure_queue_table(conn)
 
 # Fetch NSE-500 tickers from source table
-cursor.execute(f"SELECT ticker, company_name FROM {source_table}")
+# process_flag 'N' = retired by reconcile_universe.py
+cursor.execute(f"SELECT ticker, company_name FROM {source_table} WHERE ISNULL(process_flag, 'Y') <> 'N'")
 nse500_tickers = cursor.fetchall()
 
+if args.retry_failed:
+    due = set(retry_queue.get_due_tickers(conn, job_name))
+    nse500_tickers = [(t, c) for t, c in nse500_tickers if t in due]
+    logger.info("Retry mode: %d queued tickers due for retry", len(nse500_tickers))
+    if not nse500_tickers:
+        logger.info("Retry queue is empty. Nothing to do.")
+        sys.exit(0)
+
 if not nse500_tickers:
     logger.error("No tickers found in source table.")
     sys.exit(1)
@@ -82,6 +101,10 @@ logger.info("Found %d tickers to process.", len(nse500_tickers))
 success_count = 0
 skip_count = 0
 error_count = 0
+succeeded = []
+failures = []  # (ticker, error_class, error_message) for the retry queue
+# An empty download this many days after the last stored bar is a weekend/holiday, not a failure
+NO_DATA_GRACE_DAYS = 4
 
 # Loop through each ticker
 for ticker, company_name in nse500_tickers:
@@ -104,8 +127,14 @@ for ticker, company_name in nse500_tickers:
         data = stock.history(start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d'), interval="1d")
 
         if data.empty:
-            logger.warning("No data found for %s. Skipping...", ticker)
             skip_count += 1
+            if max_date and (datetime.today().date() - max_date).days <= NO_DATA_GRACE_DAYS:
+                # Nothing traded since the last stored bar (weekend / holiday): up to date
+                logger.info("No new data for %s since %s.", ticker, max_date)
+                succeeded.append(ticker)
+            else:
+                logger.warning("No data found for %s. Queued for retry.", ticker)
+                failures.append((ticker, 'NoData', f"No data returned from {start_date:%Y-%m-%d}"))
             continue
 
         data = data.reset_index().rename(columns={"Date": "trading_date"})
@@ -147,15 +176,32 @@ for ticker, company_name in nse500_tickers:
         else:
             logger.info("Inserted data for %s (%d rows)", ticker, inserted)
         success_count += 1
+        succeeded.append(ticker)
 
     except Exception as e:
         logger.error("Failed to process %s: %s", ticker, e, exc_info=True)
+        conn.rollback()
         error_count += 1
+        failures.append((ticker, retry_queue.error_class_of(e), e))
         continue
 
+# Record failures for the next --retry-failed run and drop repaired tickers from the queue
+retry_queue.clear_tickers(conn, job_name, succeeded)
+retry_queue.record_failures(conn, job_name, failures)
+
+# Indicators for the bars loaded in this run
+try:
+    update_indicators(conn, 'nse')
+except Exception as e:
+    logger.error("Indicator update failed: %s", e, exc_info=True)
+    conn.rollback()
+
 # Cleanup
 cursor.close()
 conn.close()
 logger.info("=" * 50)
 logger.info("NSE-500 fetch complete. Success: %d | Skipped: %d | Errors: %d", success_count, skip_count, error_count)
 logger.info("=" * 50)
+if error_count:
+    logger.warning("%d failed tickers queued in etl_retry_queue — run with --retry-failed to repair them.", error_count)
+    sys.exit(1)
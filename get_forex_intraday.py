@@ -0,0 +1,301 @@
+# This py script loads sub-daily (H1 / M15 / M5) OANDA candles for the active sourced
+# forex_master pairs into dbo.forex_intraday_data (monthly partitions, PAGE compression;
+# create it once with create_forex_intraday_table.sql).
+#
+# Each pair resumes from its last stored bar (per granularity); catch-up beyond OANDA's
+# 5000-candle page is paged automatically, all pairs fetched concurrently (oanda_async).
+# Complete candles are bulk-inserted through one staged MERGE per page.
+#
+# After loading, days missing from forex_hist_data are rolled up from the intraday bars
+# (17:00 New York session boundaries, same as the OANDA daily candles); existing daily
+# rows are never overwritten.
+#
+# Usage:
+#   python get_forex_intraday.py                          # H1, resume / 30-day first load
+#   python get_forex_intraday.py --granularity H1 M15 M5 --days 60
+#   python get_forex_intraday.py --no-rollup
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pyodbc
+from dotenv import load_dotenv
+
+from oanda_async import fetch_candles_many, DEFAULT_MAX_RPS
+from forex_store import ensure_source_type, fill_daily_changes
+from sql_loader import bulk_merge, server_time
+from symbol_master import get_resolver
+
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(encoding='utf-8', errors='replace')
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(SCRIPT_DIR, '.env'))
+
+log_dir = os.path.join(SCRIPT_DIR, 'logs')
+os.makedirs(log_dir, exist_ok=True)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s',
+    handlers=[
+        logging.FileHandler(os.path.join(log_dir, 'get_forex_intraday.log'), encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# SQL Server Connection Details
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+source_table = "forex_master"
+intraday_table = "forex_intraday_data"
+daily_table = "forex_hist_data"
+partition_function = "PF_forex_intraday_month"
+partition_scheme = "PS_forex_intraday_month"
+
+# OANDA v20 REST API Configuration
+OANDA_API_TOKEN = os.getenv("OANDA_API_TOKEN")
+OANDA_ENVIRONMENT = os.getenv("OANDA_ENVIRONMENT", "practice")  # "practice" or "live"
+OANDA_BASE_URL = (
+    "https://api-fxpractice.oanda.com" if OANDA_ENVIRONMENT == "practice"
+    else "https://api-fxtrade.oanda.com"
+)
+
+GRANULARITY_SECONDS = {'H1': 3600, 'M15': 900, 'M5': 300}
+MAX_CANDLES = 5000            # OANDA page size limit per request
+DEFAULT_LOOKBACK_DAYS = 30    # First load for a pair with no intraday history
+ROLLUP_MIN_COVERAGE = 0.9     # Share of a 24h session's bars required before a day is rolled up
+
+INTRADAY_COLUMNS = ['symbol', 'granularity', 'bar_time', 'open_price', 'high_price',
+                    'low_price', 'close_price', 'volume']
+
+# Daily bars from intraday ones: the trading date of a bar is its New York time + 7h
+# (a session runs 17:00 NY -> 17:00 NY), open/close from the first/last bar of the session.
+ROLLUP_SQL = f"""
+WITH bars AS (
+    SELECT symbol, bar_time, open_price, high_price, low_price, close_price, volume,
+           CAST(DATEADD(HOUR, 7, (bar_time AT TIME ZONE 'UTC') AT TIME ZONE 'Eastern Standard Time') AS DATE) AS trading_date
+    FROM {intraday_table}
+    WHERE granularity = ? AND bar_time >= ?
+),
+ranked AS (
+    SELECT *,
+           ROW_NUMBER() OVER (PARTITION BY symbol, trading_date ORDER BY bar_time) AS rn_first,
+           ROW_NUMBER() OVER (PARTITION BY symbol, trading_date ORDER BY bar_time DESC) AS rn_last
+    FROM bars
+),
+daily AS (
+    SELECT symbol, trading_date,
+           MAX(CASE WHEN rn_first = 1 THEN open_price END) AS open_price,
+           MAX(high_price) AS high_price,
+           MIN(low_price) AS low_price,
+           MAX(CASE WHEN rn_last = 1 THEN close_price END) AS close_price,
+           SUM(CAST(volume AS BIGINT)) AS volume,
+           COUNT(*) AS bar_count
+    FROM ranked
+    GROUP BY symbol, trading_date
+)
+INSERT INTO {daily_table} (
+    symbol, currency_from, currency_to, trading_date,
+    open_price, high_price, low_price, close_price, volume,
+    exchange, market_state, data_source, created_date
+)
+SELECT d.symbol, m.currency_from, m.currency_to, d.trading_date,
+       d.open_price, d.high_price, d.low_price, d.close_price, d.volume,
+       'CCY', 'REGULAR', ?, GETDATE()
+FROM daily d
+JOIN {source_table} m ON m.symbol = d.symbol
+WHERE d.trading_date < ?
+  AND d.bar_count >= ?
+  AND NOT EXISTS (
+      SELECT 1 FROM {daily_table} h
+      WHERE h.symbol = d.symbol AND h.trading_date = d.trading_date
+  );
+"""
+
+
+def ensure_partitions(conn, months_ahead=2):
+    """Extend the monthly partition function so the next `months_ahead` months have their own partition."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT MAX(CAST(v.value AS DATETIME2(0)))
+        FROM sys.partition_range_values v
+        JOIN sys.partition_functions f ON f.function_id = v.function_id
+        WHERE f.name = ?
+    """, (partition_function,))
+    last_boundary = cursor.fetchone()[0]
+    if last_boundary is None:
+        logger.error(f"Partition function {partition_function} not found — run create_forex_intraday_table.sql first")
+        exit(1)
+
+    today = datetime.utcnow()
+    month = today.month - 1 + months_ahead
+    horizon = datetime(today.year + month // 12, month % 12 + 1, 1)
+    while last_boundary < horizon:
+        year, month = divmod(last_boundary.month, 12)
+        last_boundary = datetime(last_boundary.year + year, month + 1, 1)
+        boundary = last_boundary.strftime('%Y-%m-%d')
+        cursor.execute(f"ALTER PARTITION SCHEME {partition_scheme} NEXT USED [PRIMARY]")
+        cursor.execute(f"ALTER PARTITION FUNCTION {partition_function}() SPLIT RANGE ('{boundary}')")
+        logger.info(f"Added partition boundary {boundary}")
+    conn.commit()
+
+
+def get_intraday_watermarks(conn, granularity):
+    """Last stored bar_time per symbol for one granularity: {symbol: datetime}."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT symbol, MAX(bar_time) FROM {intraday_table}
+        WHERE granularity = ?
+        GROUP BY symbol
+    """, (granularity,))
+    return {symbol: last_bar for symbol, last_bar in cursor.fetchall()}
+
+
+def candle_request(instrument, granularity, from_time):
+    """(instrument, params) for up to MAX_CANDLES mid-price candles starting at from_time (UTC)."""
+    params = {
+        'price': 'M',
+        'granularity': granularity,
+        'from': from_time.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'count': MAX_CANDLES,
+    }
+    return instrument, params
+
+
+def parse_candle_time(value):
+    """OANDA RFC3339 candle time -> naive UTC datetime."""
+    return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+
+
+def parse_candles(data, symbol, granularity):
+    """Complete candles of a response as forex_intraday_data rows."""
+    rows = []
+    for candle in (data or {}).get('candles', []):
+        if not candle.get('complete', False):
+            continue
+        mid = candle['mid']
+        rows.append((
+            symbol, granularity, parse_candle_time(candle['time']),
+            float(mid['o']), float(mid['h']), float(mid['l']), float(mid['c']),
+            int(candle.get('volume', 0)),
+        ))
+    return rows
+
+
+def load_granularity(conn, pairs, granularity, lookback_days, max_rps):
+    """Resume every pair from its watermark and page through OANDA until caught up. Returns rows inserted."""
+    step = timedelta(seconds=GRANULARITY_SECONDS[granularity])
+    watermarks = get_intraday_watermarks(conn, granularity)
+    first_load_from = datetime.utcnow() - timedelta(days=lookback_days)
+    cursors = {
+        symbol: (watermarks[symbol] + step) if symbol in watermarks else first_load_from
+        for symbol, _, _ in pairs
+    }
+    symbols = get_resolver(conn)
+    instruments = {symbol: symbols.source_symbol('oanda', symbol, 'fx') for symbol, _, _ in pairs}
+
+    total_inserted = 0
+    page = 0
+    while cursors:
+        page += 1
+        jobs = {
+            symbol: candle_request(instruments[symbol], granularity, from_time)
+            for symbol, from_time in cursors.items()
+        }
+        responses = fetch_candles_many(jobs, OANDA_API_TOKEN, OANDA_BASE_URL, max_rps=max_rps)
+
+        rows = []
+        next_cursors = {}
+        for symbol, data in responses.items():
+            candles = (data or {}).get('candles', [])
+            rows.extend(parse_candles(data, symbol, granularity))
+            # A full page means there is more history after the last candle
+            if len(candles) >= MAX_CANDLES:
+                next_cursors[symbol] = parse_candle_time(candles[-1]['time']) + step
+
+        inserted, _ = bulk_merge(conn, intraday_table, INTRADAY_COLUMNS,
+                                 ['symbol', 'granularity', 'bar_time'], rows, mode='insert')
+        total_inserted += inserted
+        logger.info(f"{granularity} page {page}: {len(rows)} complete candles, {inserted} new "
+                    f"({len(next_cursors)} pair(s) need another page)")
+        cursors = next_cursors
+    return total_inserted
+
+
+def rollup_daily(conn, granularity, lookback_days):
+    """Insert forex_hist_data rows for complete sessions that only exist as intraday bars."""
+    now_ny = datetime.now(ZoneInfo("America/New_York"))
+    current_trading_date = (now_ny + timedelta(hours=7)).date()
+    since = datetime.utcnow() - timedelta(days=lookback_days + 1)
+    min_bars = int(ROLLUP_MIN_COVERAGE * 86400 / GRANULARITY_SECONDS[granularity])
+
+    cursor = conn.cursor()
+    cursor.execute(ROLLUP_SQL, (granularity, since, f"oanda_{granularity.lower()}_rollup",
+                                current_trading_date, min_bars))
+    added = cursor.rowcount
+    conn.commit()
+    logger.info(f"Rolled up {added} missing daily bar(s) from {granularity} into {daily_table}")
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load sub-daily OANDA forex candles into forex_intraday_data")
+    parser.add_argument("--granularity", nargs='+', choices=list(GRANULARITY_SECONDS), default=['H1'],
+                        help="Candle granularities to load (default H1)")
+    parser.add_argument("--days", type=int, default=DEFAULT_LOOKBACK_DAYS,
+                        help=f"History to load for pairs without intraday data (default {DEFAULT_LOOKBACK_DAYS})")
+    parser.add_argument("--max-rps", type=float, default=DEFAULT_MAX_RPS,
+                        help=f"OANDA requests-per-second cap (default {DEFAULT_MAX_RPS:g})")
+    parser.add_argument("--no-rollup", action="store_true", help="Skip the daily rollup into forex_hist_data")
+    args = parser.parse_args()
+
+    if not OANDA_API_TOKEN:
+        logger.error("OANDA_API_TOKEN not found in .env file. Exiting.")
+        exit(1)
+
+    try:
+        conn = pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={server};"
+            f"DATABASE={database};"
+            f"Trusted_Connection=yes;"
+        )
+        logger.info("Connected to SQL Server successfully.")
+    except Exception as e:
+        logger.error(f"Connection failed: {e}")
+        exit(1)
+
+    ensure_source_type(conn)
+    ensure_partitions(conn)
+
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT symbol, currency_from, currency_to
+        FROM {source_table}
+        WHERE is_active = 'Y' AND ISNULL(source_type, 'sourced') = 'sourced'
+        ORDER BY symbol
+    """)
+    pairs = [tuple(row) for row in cursor.fetchall()]
+    logger.info(f"Loading {', '.join(args.granularity)} candles for {len(pairs)} pairs")
+
+    for granularity in args.granularity:
+        inserted = load_granularity(conn, pairs, granularity, args.days, args.max_rps)
+        logger.info(f"{granularity}: {inserted} new bars in {intraday_table}")
+
+    if not args.no_rollup:
+        # Coarsest loaded granularity is enough for OHLC and cheapest to aggregate
+        coarsest = max(args.granularity, key=GRANULARITY_SECONDS.get)
+        run_started = server_time(conn)
+        if rollup_daily(conn, coarsest, args.days):
+            fill_daily_changes(conn, since=run_started)
+
+    conn.close()
+    logger.info("Forex intraday load complete!")
+
+
+if __name__ == '__main__':
+    main()
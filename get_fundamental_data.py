@@ -1,5 +1,9 @@
 # This PY script fetches fundamental data for NSE500 and NASDAQ100 stocks
 import yfinance as yf
+try:
+    from yfinance.data import YfData  # shared session/cookie/crumb handling for raw quote-summary calls (private API)
+except ImportError:
+    YfData = None
 import pandas as pd
 import pyodbc
 from datetime import datetime
@@ -11,6 +15,9 @@ import os
 import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import retry_queue
+from latest_snapshot import refresh_snapshot
+from sql_loader import server_time
 
 # ✅ Setup logging (file + console, matching market_context_daily pattern)
 log_dir = "logs"
@@ -32,6 +39,11 @@ logger = logging.getLogger(__name__)
 parser = argparse.ArgumentParser(description="Fetch fundamental data for NSE and/or NASDAQ stocks")
 parser.add_argument('--market', choices=['nse', 'nasdaq', 'all'], default='all',
                     help='Which market to fetch: nse, nasdaq, or all (default: all)')
+parser.add_argument('--fetch-mode', choices=['info', 'lite'], default='info',
+                    help="'info' uses Ticker.info; 'lite' requests only the needed quote-summary modules "
+                         "and computes 52-week/moving-average fields from our hist tables")
+parser.add_argument('--retry-failed', action='store_true',
+                    help='Only re-process tickers queued in etl_retry_queue by earlier failed runs')
 args = parser.parse_args()
 
 # ✅ Log startup info
@@ -40,6 +52,7 @@ logger.info("Fundamental Data ETL started")
 logger.info(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
 logger.info(f"Python: {sys.executable} ({sys.version.split()[0]})")
 logger.info(f"Market: {args.market}")
+logger.info(f"Mode: {'retry-failed' if args.retry_failed else 'full'} | Fetch mode: {args.fetch_mode}")
 logger.info("=" * 60)
 
 # SQL Server Connection Details
@@ -169,6 +182,7 @@ def create_fundamental_tables():
     logger.info("Fundamental tables ready.")
 
 create_fundamental_tables()
+retry_queue.ensure_queue_table(conn)
 
 # ✅ Email notification function
 def send_failure_email(subject, body):
@@ -194,66 +208,155 @@ def send_failure_email(subject, body):
     except Exception as e:
         logger.error(f"Failed to send email notification: {e}")
 
-# ✅ Function to fetch fundamental data
+# ✅ Map a flat yfinance-style info dict to our fundamentals columns
+def build_fundamentals(info):
+    """Build the fundamentals dict from Ticker.info (or the flattened quote-summary modules)."""
+    # Extract fundamental data
+    trailing_pe = info.get('trailingPE')
+    earnings_growth = info.get('earningsGrowth')
+    
+    # ✅ Calculate PEG ratio manually (yfinance pegRatio is unreliable/always 0)
+    # PEG = Trailing P/E ÷ Earnings Growth %
+    # earningsGrowth from yfinance is decimal (0.25 = 25%), so multiply by 100
+    calculated_peg = None
+    if trailing_pe and earnings_growth and earnings_growth != 0:
+        growth_pct = earnings_growth * 100
+        if growth_pct > 0:  # PEG only meaningful with positive growth
+            calculated_peg = round(trailing_pe / growth_pct, 4)
+    
+    fundamentals = {
+        'market_cap': info.get('marketCap'),
+        'enterprise_value': info.get('enterpriseValue'),
+        'trailing_pe': trailing_pe,
+        'forward_pe': info.get('forwardPE'),
+        'price_to_book': info.get('priceToBook'),
+        'price_to_sales': info.get('priceToSalesTrailing12Months'),
+        'peg_ratio': calculated_peg,
+        'trailing_eps': info.get('trailingEps'),
+        'forward_eps': info.get('forwardEps'),
+        'book_value': info.get('bookValue'),
+        'profit_margin': info.get('profitMargins'),
+        'operating_margin': info.get('operatingMargins'),
+        'gross_margin': info.get('grossMargins'),
+        'return_on_equity': info.get('returnOnEquity'),
+        'return_on_assets': info.get('returnOnAssets'),
+        'total_revenue': info.get('totalRevenue'),
+        'revenue_per_share': info.get('revenuePerShare'),
+        'revenue_growth': info.get('revenueGrowth'),
+        'earnings_growth': info.get('earningsGrowth'),
+        'dividend_rate': info.get('dividendRate'),
+        'dividend_yield': info.get('dividendYield'),
+        'payout_ratio': info.get('payoutRatio'),
+        'total_cash': info.get('totalCash'),
+        'total_debt': info.get('totalDebt'),
+        'debt_to_equity': info.get('debtToEquity'),
+        'current_ratio': info.get('currentRatio'),
+        'quick_ratio': info.get('quickRatio'),
+        'free_cashflow': info.get('freeCashflow'),
+        'operating_cashflow': info.get('operatingCashflow'),
+        'beta': info.get('beta'),
+        'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+        'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+        'fifty_day_avg': info.get('fiftyDayAverage'),
+        'two_hundred_day_avg': info.get('twoHundredDayAverage')
+    }
+    
+    return fundamentals
+
+# ✅ Function to fetch fundamental data (full Ticker.info payload)
 def fetch_fundamentals(ticker):
+    """Fetch fundamentals for one ticker. Errors propagate so the caller can queue them for retry."""
+    stock = yf.Ticker(ticker)
+    return build_fundamentals(stock.info)
+
+# ✅ Lightweight fetch: only the quote-summary modules our columns come from.
+# Ticker.info pulls assetProfile (officers, long business summary), quoteType and a
+# second v7 quote request on top of these; we need none of that.
+QUOTE_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/"
+QUOTE_MODULES = "summaryDetail,defaultKeyStatistics,financialData"
+
+def fetch_fundamentals_lite(ticker, price_stats=None):
+    """
+    Fetch fundamentals from the needed quote-summary modules only.
+    Price-derived fields (52-week high/low, 50/200-day averages) are taken from
+    price_stats (computed locally from our hist tables) when available.
+    Errors (including an empty result) propagate so the caller can queue them for retry.
+    YfData is yfinance-internal (tested with the version pinned in requirements.txt); if its
+    interface has changed, fall back to Ticker.info.
+    """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        
-        # Extract fundamental data
-        trailing_pe = info.get('trailingPE')
-        earnings_growth = info.get('earningsGrowth')
-        
-        # ✅ Calculate PEG ratio manually (yfinance pegRatio is unreliable/always 0)
-        # PEG = Trailing P/E ÷ Earnings Growth %
-        # earningsGrowth from yfinance is decimal (0.25 = 25%), so multiply by 100
-        calculated_peg = None
-        if trailing_pe and earnings_growth and earnings_growth != 0:
-            growth_pct = earnings_growth * 100
-            if growth_pct > 0:  # PEG only meaningful with positive growth
-                calculated_peg = round(trailing_pe / growth_pct, 4)
-        
-        fundamentals = {
-            'market_cap': info.get('marketCap'),
-            'enterprise_value': info.get('enterpriseValue'),
-            'trailing_pe': trailing_pe,
-            'forward_pe': info.get('forwardPE'),
-            'price_to_book': info.get('priceToBook'),
-            'price_to_sales': info.get('priceToSalesTrailing12Months'),
-            'peg_ratio': calculated_peg,
-            'trailing_eps': info.get('trailingEps'),
-            'forward_eps': info.get('forwardEps'),
-            'book_value': info.get('bookValue'),
-            'profit_margin': info.get('profitMargins'),
-            'operating_margin': info.get('operatingMargins'),
-            'gross_margin': info.get('grossMargins'),
-            'return_on_equity': info.get('returnOnEquity'),
-            'return_on_assets': info.get('returnOnAssets'),
-            'total_revenue': info.get('totalRevenue'),
-            'revenue_per_share': info.get('revenuePerShare'),
-            'revenue_growth': info.get('revenueGrowth'),
-            'earnings_growth': info.get('earningsGrowth'),
-            'dividend_rate': info.get('dividendRate'),
-            'dividend_yield': info.get('dividendYield'),
-            'payout_ratio': info.get('payoutRatio'),
-            'total_cash': info.get('totalCash'),
-            'total_debt': info.get('totalDebt'),
-            'debt_to_equity': info.get('debtToEquity'),
-            'current_ratio': info.get('currentRatio'),
-            'quick_ratio': info.get('quickRatio'),
-            'free_cashflow': info.get('freeCashflow'),
-            'operating_cashflow': info.get('operatingCashflow'),
-            'beta': info.get('beta'),
-            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
-            'fifty_day_avg': info.get('fiftyDayAverage'),
-            'two_hundred_day_avg': info.get('twoHundredDayAverage')
+        if YfData is None:
+            raise AttributeError("yfinance.data.YfData is not available")
+        data = YfData().get_raw_json(
+            QUOTE_SUMMARY_URL + ticker,
+            params={"modules": QUOTE_MODULES, "formatted": "false", "corsDomain": "finance.yahoo.com"}
+        )
+    except (AttributeError, TypeError) as e:
+        logger.warning(f"{ticker}: raw quote-summary call unavailable ({e}); falling back to Ticker.info")
+        fundamentals = fetch_fundamentals(ticker)
+        return apply_price_stats(fundamentals, price_stats)
+    results = (data.get('quoteSummary') or {}).get('result') or []
+    if not results:
+        raise ValueError(f"quoteSummary returned no result for {ticker}")
+
+    # Flatten modules into one info-style dict (later modules win, same as Ticker.info)
+    info = {}
+    for module in QUOTE_MODULES.split(','):
+        for key, value in (results[0].get(module) or {}).items():
+            info[key] = value.get('raw') if isinstance(value, dict) else value
+
+    return apply_price_stats(build_fundamentals(info), price_stats)
+
+def apply_price_stats(fundamentals, price_stats):
+    """Override price-derived fields with the locally computed price_stats (None values are skipped)."""
+    if price_stats:
+        for key, value in price_stats.items():
+            if value is not None:
+                fundamentals[key] = value
+    return fundamentals
+
+# ✅ Compute price-derived fields locally from the hist table (one set-based query per market)
+def load_price_stats(hist_table):
+    """
+    Return {ticker: {fifty_two_week_high, fifty_two_week_low, fifty_day_avg, two_hundred_day_avg}}
+    from our own daily bars. Equity prices are VARCHAR, so CAST to FLOAT.
+    Averages are only returned when the full window is available; tickers whose last
+    bar is more than a week old are skipped so the quote-summary values are kept.
+    """
+    cursor.execute(f"""
+        WITH recent AS (
+            SELECT
+                ticker,
+                trading_date,
+                TRY_CAST(high_price AS FLOAT) AS high_f,
+                TRY_CAST(low_price AS FLOAT) AS low_f,
+                TRY_CAST(close_price AS FLOAT) AS close_f,
+                ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY trading_date DESC) AS rn
+            FROM {hist_table}
+            WHERE trading_date >= DATEADD(DAY, -400, CAST(GETDATE() AS DATE))
+        )
+        SELECT
+            ticker,
+            MAX(CASE WHEN trading_date > DATEADD(WEEK, -52, CAST(GETDATE() AS DATE)) THEN high_f END),
+            MIN(CASE WHEN trading_date > DATEADD(WEEK, -52, CAST(GETDATE() AS DATE)) THEN low_f END),
+            CASE WHEN COUNT(CASE WHEN rn <= 50 THEN close_f END) = 50
+                 THEN AVG(CASE WHEN rn <= 50 THEN close_f END) END,
+            CASE WHEN COUNT(CASE WHEN rn <= 200 THEN close_f END) = 200
+                 THEN AVG(CASE WHEN rn <= 200 THEN close_f END) END
+        FROM recent
+        GROUP BY ticker
+        HAVING MAX(trading_date) >= DATEADD(DAY, -7, CAST(GETDATE() AS DATE))
+    """)
+    stats = {}
+    for ticker, high_52w, low_52w, avg_50, avg_200 in cursor.fetchall():
+        stats[ticker] = {
+            'fifty_two_week_high': high_52w,
+            'fifty_two_week_low': low_52w,
+            'fifty_day_avg': avg_50,
+            'two_hundred_day_avg': avg_200,
         }
-        
-        return fundamentals
-    except Exception as e:
-        logger.warning(f"Error fetching fundamentals for {ticker}: {e}")
-        return None
+    logger.info(f"Computed local price stats for {len(stats)} tickers from {hist_table}")
+    return stats
 
 # ✅ Batch size for DB inserts (accumulate N tickers before committing)
 BATCH_SIZE = 100
@@ -376,31 +479,46 @@ def insert_fundamentals_batch(batch, target_table):
     logger.info(f"Batch committed: {len(batch)} tickers written to {target_table}")
 
 # ✅ Process a market's tickers with failure tracking (batch DB inserts)
-def process_market(market_label, master_table, target_table):
-    """Fetch fundamentals one ticker at a time, batch-insert to DB every BATCH_SIZE tickers."""
+def process_market(market_label, master_table, target_table, hist_table, retry_only=False):
+    """Fetch fundamentals one ticker at a time, batch-insert to DB every BATCH_SIZE tickers.
+
+    Failed tickers are recorded in the retry queue (with error class and backoff);
+    with retry_only=True only the queued tickers whose backoff has expired are processed.
+    In 'lite' fetch mode the price-derived fields come from hist_table instead of Yahoo.
+    """
+    job_name = f"fundamentals:{target_table}"
     logger.info(f"Fetching {market_label} fundamental data...")
-    cursor.execute(f"SELECT ticker, company_name FROM {master_table}")
+    # process_flag 'N' = retired by reconcile_universe.py
+    cursor.execute(f"SELECT ticker, company_name FROM {master_table} WHERE ISNULL(process_flag, 'Y') <> 'N'")
     tickers = cursor.fetchall()
 
+    if retry_only:
+        due = set(retry_queue.get_due_tickers(conn, job_name))
+        tickers = [(ticker, company_name) for ticker, company_name in tickers if ticker in due]
+        logger.info(f"Retry mode: {len(tickers)} queued {market_label} tickers due for retry")
+
+    price_stats = load_price_stats(hist_table) if args.fetch_mode == 'lite' else {}
+
     total = len(tickers)
     success_count = 0
     failed_tickers = []
+    queue_failures = []  # (ticker, error_class, error_message) for the retry queue
     batch = []  # accumulate (ticker, company_name, fundamentals) tuples
     batch_num = 0
 
     for idx, (ticker, company_name) in enumerate(tickers, 1):
         try:
             logger.info(f"[{idx}/{total}] Fetching fundamentals for {ticker}...")
-            fundamentals = fetch_fundamentals(ticker)
-            if fundamentals is None:
-                failed_tickers.append(ticker)
-                logger.warning(f"{ticker} — no data returned (API returned None)")
+            if args.fetch_mode == 'lite':
+                fundamentals = fetch_fundamentals_lite(ticker, price_stats.get(ticker))
             else:
-                batch.append((ticker, company_name, fundamentals))
-                success_count += 1
-                logger.info(f"{ticker} fundamentals fetched.")
+                fundamentals = fetch_fundamentals(ticker)
+            batch.append((ticker, company_name, fundamentals))
+            success_count += 1
+            logger.info(f"{ticker} fundamentals fetched.")
         except Exception as e:
             failed_tickers.append(ticker)
+            queue_failures.append((ticker, retry_queue.error_class_of(e), e))
             logger.error(f"{ticker} failed with error: {e}")
         
         # Flush batch to DB every BATCH_SIZE tickers
@@ -408,6 +526,7 @@ def process_market(market_label, master_table, target_table):
             batch_num += 1
             logger.info(f"Writing batch {batch_num} ({len(batch)} tickers) to {target_table}...")
             insert_fundamentals_batch(batch, target_table)
+            retry_queue.clear_tickers(conn, job_name, [t for t, _, _ in batch])
             batch = []
         
         time.sleep(1)  # Delay to avoid rate limiting
@@ -417,6 +536,9 @@ def process_market(market_label, master_table, target_table):
         batch_num += 1
         logger.info(f"Writing final batch {batch_num} ({len(batch)} tickers) to {target_table}...")
         insert_fundamentals_batch(batch, target_table)
+        retry_queue.clear_tickers(conn, job_name, [t for t, _, _ in batch])
+
+    retry_queue.record_failures(conn, job_name, queue_failures)
 
     total_batches = batch_num
     logger.info(f"{market_label} Summary: {success_count}/{total} succeeded, {len(failed_tickers)} failed, {total_batches} DB batch commits")
@@ -428,10 +550,11 @@ def process_market(market_label, master_table, target_table):
 # ✅ Run based on --market argument
 run_date = datetime.now().strftime('%Y-%m-%d %H:%M')
 all_failures = {}  # market_label -> (failed_tickers, total, success)
+snapshot_since = server_time(conn)  # fundamentals fetched from here on feed latest_snapshot
 
 if args.market in ('nse', 'all'):
     try:
-        nse_success, nse_failed, nse_total = process_market('NSE 500', 'nse_500', 'nse_500_fundamentals')
+        nse_success, nse_failed, nse_total = process_market('NSE 500', 'nse_500', 'nse_500_fundamentals', 'nse_500_hist_data', args.retry_failed)
         if nse_failed:
             all_failures['NSE 500'] = (nse_failed, nse_total, nse_success)
     except Exception as e:
@@ -440,13 +563,21 @@ if args.market in ('nse', 'all'):
 
 if args.market in ('nasdaq', 'all'):
     try:
-        nasdaq_success, nasdaq_failed, nasdaq_total = process_market('NASDAQ', 'nasdaq_top100', 'nasdaq_100_fundamentals')
+        nasdaq_success, nasdaq_failed, nasdaq_total = process_market('NASDAQ', 'nasdaq_top100', 'nasdaq_100_fundamentals', 'nasdaq_100_hist_data', args.retry_failed)
         if nasdaq_failed:
             all_failures['NASDAQ'] = (nasdaq_failed, nasdaq_total, nasdaq_success)
     except Exception as e:
         logger.error(f"NASDAQ processing crashed: {e}")
         all_failures['NASDAQ'] = ([f'ENTIRE BATCH CRASHED: {e}'], 0, 0)
 
+# ✅ Refresh latest_snapshot for the tickers whose fundamentals were written in this run
+for snapshot_market in (['nse', 'nasdaq'] if args.market == 'all' else [args.market]):
+    try:
+        refresh_snapshot(conn, snapshot_market, changed_since=snapshot_since)
+    except Exception as e:
+        logger.error(f"latest_snapshot refresh failed for {snapshot_market}: {e}")
+        conn.rollback()
+
 # ✅ Send email if there were any failures
 if all_failures:
     subject = f"⚠ Fundamental Data Fetch Failures — {run_date}"
@@ -457,6 +588,7 @@ if all_failures:
         body_lines.append(f"Failed tickers: {', '.join(failed)}")
     body_lines.append(f"\n{'='*50}")
     body_lines.append(f"\nMarkets processed: {args.market}")
+    body_lines.append("Failed tickers are queued in etl_retry_queue — run with --retry-failed to repair them.")
     body_lines.append(f"Script: get_fundamental_data.py")
     send_failure_email(subject, '\n'.join(body_lines))
 else:
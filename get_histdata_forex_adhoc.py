@@ -1,16 +1,28 @@
 # This py script is for adhoc historical data import for Forex pairs
 # Reads forex symbols from dbo.forex_master where process_flag='Y' and fetches specified number of days
 # Uses Polygon.io API for accurate forex data
+# --grouped: one grouped-daily request per date covers every FX pair (cached on disk),
+#            so the request count scales with days instead of pairs x days
 import os
+import json
+import argparse
 import pandas as pd
 import pyodbc
 import requests
 from datetime import datetime, timedelta
 import time
 from dotenv import load_dotenv
+from forex_store import ensure_source_type, fill_daily_changes, upsert_bars
+from symbol_master import get_resolver
 
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Adhoc Polygon.io forex history import for process_flag='Y' pairs")
+parser.add_argument("--grouped", action="store_true",
+                    help="Use the grouped-daily endpoint (one request per date for all pairs) instead of one request per pair")
+parser.add_argument("--days", type=int, default=None, help="Days of history to fetch (default DAYS_TO_FETCH)")
+args = parser.parse_args()
+
 # SQL Server Connection Details
 server = "localhost\\MSSQLSERVER01"
 database = "stockdata_db"
@@ -27,6 +39,11 @@ if not POLYGON_API_KEY:
 DAYS_TO_FETCH = 365  # Number of days of historical data to fetch
 BATCH_SIZE = 50      # Commit after every N records
 API_WAIT_TIME = 1    # Polygon paid tier — no aggressive rate limiting needed
+if args.days:
+    DAYS_TO_FETCH = args.days
+
+# Grouped-daily responses for completed dates never change, so they are cached on disk
+GROUPED_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "polygon_fx_grouped")
 
 # Connect to SQL Server
 try:
@@ -43,14 +60,17 @@ except Exception as e:
     exit()
 
 # Fetch forex symbols with process_flag = 'Y' from master table
+# (derived crosses are computed from their USD legs by forex_crosses.py, never fetched)
 try:
+    ensure_source_type(conn)
     cursor.execute(f"""
         SELECT symbol, currency_from, currency_to, yfinance_symbol 
         FROM {source_table} 
-        WHERE process_flag = 'Y'
+        WHERE process_flag = 'Y' AND ISNULL(source_type, 'sourced') <> 'derived'
         ORDER BY symbol
     """)
     forex_symbols = cursor.fetchall()
+    symbols = get_resolver(conn)   # forex_master symbol -> Polygon ticker (C:EURUSD)
     
     if not forex_symbols:
         print("❌ No forex symbols found with process_flag='Y' in master table.")
@@ -64,16 +84,14 @@ except Exception as e:
     exit()
 
 # Function to fetch forex data from Polygon.io
-def fetch_forex_data_polygon(from_currency, to_currency, api_key, days_back=365):
+def fetch_forex_data_polygon(polygon_symbol, api_key, days_back=365):
     """
     Fetch forex data from Polygon.io API for a historical date range
 
     Parameters:
     -----------
-    from_currency : str
-        Base currency (e.g., 'AUD', 'EUR')
-    to_currency : str
-        Quote currency (e.g., 'USD')
+    polygon_symbol : str
+        Polygon ticker from the symbol master (e.g., 'C:AUDUSD')
     api_key : str
         Your Polygon.io API key
     days_back : int
@@ -83,11 +101,10 @@ def fetch_forex_data_polygon(from_currency, to_currency, api_key, days_back=365)
     --------
     pd.DataFrame with columns: trading_date, open_price, high_price, low_price, close_price, volume
     """
-    symbol = f"C:{from_currency}{to_currency}"
     from_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
     to_date = datetime.now().strftime('%Y-%m-%d')
 
-    url = f"https://api.polygon.io/v2/aggs/ticker/{symbol}/range/1/day/{from_date}/{to_date}"
+    url = f"https://api.polygon.io/v2/aggs/ticker/{polygon_symbol}/range/1/day/{from_date}/{to_date}"
     params = {
         'apiKey': api_key,
         'adjusted': 'true',
@@ -112,7 +129,7 @@ def fetch_forex_data_polygon(from_currency, to_currency, api_key, days_back=365)
                 return pd.DataFrame()
 
             if data.get('resultsCount', 0) == 0:
-                print(f"  ❌ No data returned from Polygon for {from_currency}/{to_currency}")
+                print(f"  ❌ No data returned from Polygon for {polygon_symbol}")
                 return pd.DataFrame()
 
             records = []
@@ -136,9 +153,112 @@ def fetch_forex_data_polygon(from_currency, to_currency, api_key, days_back=365)
             print(f"  ❌ Error fetching data: {e}")
             return pd.DataFrame()
 
-    print(f"  ❌ All retries exhausted for {from_currency}/{to_currency}")
+    print(f"  ❌ All retries exhausted for {polygon_symbol}")
     return pd.DataFrame()
 
+# Function to fetch every FX pair for one date from Polygon.io grouped daily
+def fetch_grouped_daily_polygon(date_str, api_key):
+    """
+    Fetch the grouped daily bars of all FX tickers for one date (one API call),
+    served from the disk cache for completed dates already downloaded.
+
+    Returns:
+    --------
+    dict: {'C:EURUSD': {'o': ..., 'h': ..., 'l': ..., 'c': ..., 'v': ...}, ...}, or None on failure
+    """
+    cache_file = os.path.join(GROUPED_CACHE_DIR, f"{date_str}.json")
+    if os.path.exists(cache_file):
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    url = f"https://api.polygon.io/v2/aggs/grouped/locale/global/market/fx/{date_str}"
+    params = {'apiKey': api_key, 'adjusted': 'true'}
+
+    for attempt in range(3):
+        try:
+            response = requests.get(url, params=params, timeout=30)
+
+            if response.status_code == 429:
+                wait = 60 * (attempt + 1)
+                print(f"  ⚠️  Rate limited (429). Waiting {wait}s before retry {attempt + 1}/3...")
+                time.sleep(wait)
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+
+            if data.get('status') == 'ERROR':
+                print(f"  ❌ Polygon API Error for {date_str}: {data.get('error')}")
+                return None
+
+            bars = {bar['T']: bar for bar in data.get('results') or []}
+            # Only completed dates are cached; today's bars are still forming
+            if bars and date_str < datetime.utcnow().strftime('%Y-%m-%d'):
+                os.makedirs(GROUPED_CACHE_DIR, exist_ok=True)
+                with open(cache_file, 'w', encoding='utf-8') as f:
+                    json.dump(bars, f)
+            return bars
+
+        except requests.exceptions.Timeout:
+            print(f"  ❌ Request timeout for {date_str} (attempt {attempt + 1}/3)")
+        except Exception as e:
+            print(f"  ❌ Error fetching grouped data for {date_str}: {e}")
+            return None
+
+    print(f"  ❌ All retries exhausted for {date_str}")
+    return None
+
+
+def load_grouped(forex_symbols, days_back):
+    """
+    Grouped-daily backfill: one request per date, fanned out locally into
+    forex_hist_data rows for every requested pair and bulk-upserted.
+
+    Returns (loaded_symbols, bars_loaded, inserted, updated, failed_dates).
+    """
+    wanted = {symbols.source_symbol('polygon', symbol, 'fx'): (symbol, c_from, c_to)
+              for symbol, c_from, c_to, _ in forex_symbols}
+    today = datetime.utcnow().date()
+    dates = [today - timedelta(days=n) for n in range(days_back, 0, -1)]
+    # FX is closed all of Saturday (UTC); Sunday (UTC) only holds the first hours of
+    # Monday's session, which would become a partial Sunday trading_date row
+    dates = [d for d in dates if d.weekday() < 5]
+
+    print(f"📦 Grouped mode: {len(dates)} dates x {len(wanted)} pairs (cache: {GROUPED_CACHE_DIR})")
+    bars = []
+    failed_dates = []
+    for n, d in enumerate(dates, 1):
+        date_str = d.strftime('%Y-%m-%d')
+        cached = os.path.exists(os.path.join(GROUPED_CACHE_DIR, f"{date_str}.json"))
+        grouped = fetch_grouped_daily_polygon(date_str, POLYGON_API_KEY)
+        if grouped is None:
+            failed_dates.append(date_str)
+            grouped = {}
+        for ticker, (symbol, c_from, c_to) in wanted.items():
+            bar = grouped.get(ticker)
+            if not bar:
+                continue
+            bars.append({
+                'symbol': symbol,
+                'currency_from': c_from,
+                'currency_to': c_to,
+                'trading_date': d,
+                'open_price': float(bar['o']),
+                'high_price': float(bar['h']),
+                'low_price': float(bar['l']),
+                'close_price': float(bar['c']),
+                'volume': int(bar.get('v', 0)),
+            })
+        if n % 25 == 0 or n == len(dates):
+            print(f"  📅 {n}/{len(dates)} dates fetched ({len(bars)} pair-days so far)")
+        if not cached and n < len(dates):
+            time.sleep(API_WAIT_TIME)
+
+    inserted, updated = upsert_bars(conn, bars, data_source='polygon')
+    loaded_symbols = sorted({bar['symbol'] for bar in bars})
+    return loaded_symbols, len(bars), inserted, updated, failed_dates
+
+
 # Process each forex pair
 total_records = 0
 success_count = 0
@@ -146,14 +266,41 @@ error_count = 0
 update_count = 0
 insert_count = 0
 
-for idx, (symbol, currency_from, currency_to, yfinance_symbol) in enumerate(forex_symbols, 1):
+pending_symbols = forex_symbols
+if args.grouped:
+    try:
+        loaded_symbols, total_records, insert_count, update_count, failed_dates = load_grouped(
+            forex_symbols, DAYS_TO_FETCH)
+        success_count = len(loaded_symbols)
+        if failed_dates:
+            # Keep process_flag 'Y' so the next run retries the gaps (cached dates cost no API call)
+            print(f"⚠️  {len(failed_dates)} date(s) failed: {', '.join(failed_dates)}; "
+                  f"process_flag left at 'Y' so the next run retries them")
+            error_count += len(failed_dates)
+        elif loaded_symbols:
+            placeholders = ', '.join('?' for _ in loaded_symbols)
+            cursor.execute(f"UPDATE {source_table} SET process_flag = 'N' WHERE symbol IN ({placeholders})",
+                           loaded_symbols)
+            conn.commit()
+            print(f"🚩 Reset process_flag to 'N' for {len(loaded_symbols)} symbols")
+        # Pairs the grouped feed does not carry fall back to one aggregates request each
+        loaded = set(loaded_symbols)
+        pending_symbols = [row for row in forex_symbols if row[0] not in loaded]
+        if pending_symbols:
+            print(f"⚠️  {len(pending_symbols)} pair(s) missing from grouped data; falling back to per-pair requests")
+    except Exception as e:
+        print(f"❌ Grouped import failed: {str(e)}")
+        conn.rollback()
+
+for idx, (symbol, currency_from, currency_to, yfinance_symbol) in enumerate(pending_symbols, 1):
     try:
         print(f"\n{'='*70}")
-        print(f"[{idx}/{len(forex_symbols)}] 🔄 Processing {symbol} ({currency_from}/{currency_to})...")
+        print(f"[{idx}/{len(pending_symbols)}] 🔄 Processing {symbol} ({currency_from}/{currency_to})...")
         print(f"{'='*70}")
         
         # Fetch data from Polygon.io
-        hist = fetch_forex_data_polygon(currency_from, currency_to, POLYGON_API_KEY, DAYS_TO_FETCH)
+        hist = fetch_forex_data_polygon(symbols.source_symbol('polygon', symbol, 'fx'), POLYGON_API_KEY,
+                                        DAYS_TO_FETCH)
         
         if hist.empty:
             print(f"  ⚠️  No data found for {symbol}. Skipping...")
@@ -272,7 +419,7 @@ for idx, (symbol, currency_from, currency_to, yfinance_symbol) in enumerate(fore
             print(f"    ⚠️  Could not reset flag: {str(flag_error)}")
         
         # Rate limiting - minimal wait for Polygon.io paid tier
-        if idx < len(forex_symbols):
+        if idx < len(pending_symbols):
             print(f"  ⏳ Waiting {API_WAIT_TIME} second (rate limit)...")
             time.sleep(API_WAIT_TIME)
         
@@ -282,6 +429,13 @@ for idx, (symbol, currency_from, currency_to, yfinance_symbol) in enumerate(fore
         conn.rollback()
         continue
 
+# Post-load stage: recompute previous_close / daily_change(_pct) from the stored prior session
+# (whole table: the per-row UPDATE path above does not stamp last_updated)
+try:
+    print(f"\n🔁 Filling previous_close / daily_change: {fill_daily_changes(conn)} row(s) updated")
+except Exception as e:
+    print(f"⚠️  Could not fill previous_close / daily_change: {str(e)}")
+
 # Close connection
 cursor.close()
 conn.close()
@@ -302,4 +456,5 @@ print("\n💡 TIPS:")
 print("   • Set process_flag='Y' in forex_master for symbols you want to process")
 print("     Example: UPDATE forex_master SET process_flag='Y' WHERE symbol IN ('EURUSD', 'GBPUSD')")
 print("   • Polygon.io fetches the full date range in a single API call per pair")
+print("   • --grouped fetches all pairs per date in one call (cached under cache/polygon_fx_grouped)")
 print("   • Data is reliable with paid Polygon.io membership\n")
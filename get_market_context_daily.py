@@ -11,6 +11,24 @@ Usage:
     python get_market_context_daily.py              # Incremental (fetch missing dates)
     python get_market_context_daily.py --backfill   # Full 2-year historical load
 
+Incremental runs use market_context_state (last two closes per ticker) to compute
+returns/changes, so only the new sessions are downloaded instead of a 7-day lookback.
+
+Every stored (series, trading_date) cell is tracked in market_context_freshness as
+'final' (fetched after that market's close) or 'provisional' (fetched while it was
+still trading, e.g. US indices when the job runs after the India close). Each run
+re-requests only the series with provisional cells or a possibly-new session, so
+partial rows repair themselves on the next run.
+
+Series are driven by the market_context_series registry (seeded from ALL_TICKERS below)
+and stored long in market_context_long (trading_date, series, metric, value). To add a
+new index/ETF, insert a registry row — no DDL needed:
+    INSERT INTO market_context_series (yf_ticker, series, category) VALUES ('SMH', 'smh', 'sector');
+then run once with --backfill to load its history (and to populate the long store initially).
+The generated view market_context_daily_v pivots every registered series into the wide
+shape; the legacy market_context_daily table keeps its original columns for the ML pipelines.
+Rolling regime features are refreshed afterwards by market_context_features.py.
+
 Schedule: Run daily BEFORE ML pipelines (added as step 0 in run_all_data_fetch.bat)
 """
 
@@ -22,7 +40,10 @@ import argparse
 import logging
 import sys
 import os
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from zoneinfo import ZoneInfo
+from sql_loader import bulk_merge, frame_to_rows
+from market_context_features import update_features
 
 # ============================================================
 # Configuration
@@ -31,6 +52,11 @@ from datetime import datetime, timedelta
 server = "localhost\\MSSQLSERVER01"
 database = "stockdata_db"
 target_table = "market_context_daily"
+state_table = "market_context_state"
+registry_table = "market_context_series"
+long_table = "market_context_long"
+freshness_table = "market_context_freshness"
+wide_view = "market_context_daily_v"
 
 # Setup logging
 log_dir = "logs"
@@ -52,6 +78,7 @@ logger = logging.getLogger(__name__)
 GLOBAL_TICKERS = {
     # Volatility indices
     '^VIX': 'vix',
+    '^VIX3M': 'vix3m',      # 3-month VIX (term structure; long store/features only)
     '^INDIAVIX': 'india_vix',
     # Major indices
     '^GSPC': 'sp500',
@@ -84,12 +111,84 @@ INDIA_SECTOR_INDICES = {
     '^CNXFMCG': 'nifty_fmcg',
 }
 
-# All tickers combined
+# All tickers combined (seed for the market_context_series registry)
 ALL_TICKERS = {**GLOBAL_TICKERS, **US_SECTOR_ETFS, **INDIA_SECTOR_INDICES}
 
+# Registry category per seeded series (anything not listed is a 'sector' series)
+SERIES_CATEGORIES = {
+    'vix': 'volatility',
+    'vix3m': 'volatility',
+    'india_vix': 'volatility',
+    'us_10y_yield': 'yield',
+    'sp500': 'index',
+    'nasdaq_comp': 'index',
+    'nifty50': 'index',
+    'dxy': 'index',
+}
+
+# Market each India series trades on (every other series is 'US')
+SERIES_MARKETS = {
+    'india_vix': 'IN',
+    'nifty50': 'IN',
+    **{series: 'IN' for series in INDIA_SECTOR_INDICES.values()},
+}
+
+# Session close per market; a cell fetched after close + FINAL_BUFFER is final
+MARKET_CLOSE = {
+    'US': (ZoneInfo('America/New_York'), time(16, 0)),
+    'IN': (ZoneInfo('Asia/Kolkata'), time(15, 30)),
+}
+FINAL_BUFFER = timedelta(minutes=30)  # Yahoo settles official closes shortly after the bell
+
+# Benchmark per sector series (relative strength / correlation features)
+SERIES_BENCHMARKS = {
+    **{series: 'sp500' for series in US_SECTOR_ETFS.values()},
+    **{series: 'nifty50' for series in INDIA_SECTOR_INDICES.values()},
+}
+
+# Metrics stored per category. Every series keeps its close in the long store, so
+# rolling features can be computed later without re-downloading.
+CATEGORY_METRICS = {
+    'volatility': ['close', 'change_pct'],
+    'yield': ['close', 'change'],
+    'index': ['close', 'return_1d'],
+    'sector': ['close', 'return_1d'],
+}
+
+METRIC_FUNCS = {
+    'close': lambda close: close,
+    'change_pct': lambda close: close.pct_change(fill_method=None) * 100,
+    'return_1d': lambda close: close.pct_change(fill_method=None) * 100,
+    'change': lambda close: close.diff(),
+}
+
 # Backfill period
 BACKFILL_DAYS = 730  # ~2 years
 
+# Column order of market_context_daily (used by the staged MERGE)
+DB_COLUMNS = [
+    'trading_date',
+    # Volatility
+    'vix_close', 'vix_change_pct',
+    'india_vix_close', 'india_vix_change_pct',
+    # Indices
+    'sp500_close', 'sp500_return_1d',
+    'nasdaq_comp_close', 'nasdaq_comp_return_1d',
+    'nifty50_close', 'nifty50_return_1d',
+    # Currency / Rates
+    'dxy_close', 'dxy_return_1d',
+    'us_10y_yield_close', 'us_10y_yield_change',
+    # US Sector ETFs
+    'xlk_return_1d', 'xlf_return_1d', 'xle_return_1d',
+    'xlv_return_1d', 'xli_return_1d', 'xlc_return_1d',
+    'xly_return_1d', 'xlp_return_1d', 'xlb_return_1d',
+    'xlre_return_1d', 'xlu_return_1d',
+    # India Sector Indices
+    'nifty_it_return_1d', 'nifty_bank_return_1d',
+    'nifty_pharma_return_1d', 'nifty_auto_return_1d',
+    'nifty_fmcg_return_1d',
+]
+
 # ============================================================
 # Table DDL
 # ============================================================
@@ -142,6 +241,86 @@ BEGIN
 END
 """
 
+# Per-ticker rolling state: the last two closes are enough to recompute the latest
+# session's return (it may have been fetched while the market was still open) and
+# to compute the next session's return without re-downloading a lookback window.
+CREATE_STATE_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{state_table}')
+BEGIN
+    CREATE TABLE {state_table} (
+        yf_ticker VARCHAR(20) PRIMARY KEY,
+        series VARCHAR(50) NOT NULL,
+        prev_date DATE NULL,
+        prev_close FLOAT NULL,
+        last_date DATE NOT NULL,
+        last_close FLOAT NOT NULL,
+        updated_at DATETIME DEFAULT GETDATE()
+    );
+END
+"""
+
+# Config-driven ticker registry
+CREATE_REGISTRY_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{registry_table}')
+BEGIN
+    CREATE TABLE {registry_table} (
+        yf_ticker VARCHAR(20) PRIMARY KEY,
+        series VARCHAR(50) NOT NULL UNIQUE,
+        category VARCHAR(20) NOT NULL,          -- volatility / yield / index / sector
+        benchmark VARCHAR(50) NULL,             -- series to compare a sector against
+        market VARCHAR(5) NULL,                 -- US / IN (session close for freshness)
+        is_active CHAR(1) NOT NULL DEFAULT 'Y',
+        added_at DATETIME DEFAULT GETDATE()
+    );
+END
+
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS
+               WHERE TABLE_NAME = '{registry_table}' AND COLUMN_NAME = 'benchmark')
+BEGIN
+    ALTER TABLE {registry_table} ADD benchmark VARCHAR(50) NULL;
+END
+
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS
+               WHERE TABLE_NAME = '{registry_table}' AND COLUMN_NAME = 'market')
+BEGIN
+    ALTER TABLE {registry_table} ADD market VARCHAR(5) NULL;
+END
+"""
+
+# Long-format store: one row per (series, metric, trading_date)
+CREATE_LONG_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{long_table}')
+BEGIN
+    CREATE TABLE {long_table} (
+        series VARCHAR(50) NOT NULL,
+        metric VARCHAR(30) NOT NULL,
+        trading_date DATE NOT NULL,
+        value FLOAT NULL,
+        data_fetched_at DATETIME DEFAULT GETDATE(),
+        CONSTRAINT PK_{long_table} PRIMARY KEY CLUSTERED (series, metric, trading_date)
+    );
+
+    CREATE INDEX IX_{long_table}_date ON {long_table} (trading_date) INCLUDE (series, metric, value);
+END
+"""
+
+# Per-cell freshness: which (series, trading_date) closes were taken before the market closed
+CREATE_FRESHNESS_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{freshness_table}')
+BEGIN
+    CREATE TABLE {freshness_table} (
+        series VARCHAR(50) NOT NULL,
+        trading_date DATE NOT NULL,
+        status VARCHAR(12) NOT NULL,            -- final / provisional
+        fetched_at DATETIME DEFAULT GETDATE(),
+        CONSTRAINT PK_{freshness_table} PRIMARY KEY CLUSTERED (series, trading_date)
+    );
+
+    CREATE INDEX IX_{freshness_table}_provisional ON {freshness_table} (series, trading_date)
+        WHERE status = 'provisional';
+END
+"""
+
 # ============================================================
 # Functions
 # ============================================================
@@ -163,11 +342,194 @@ def connect_db():
 
 
 def ensure_table(conn):
-    """Create market_context_daily table if it doesn't exist."""
+    """Create market_context_daily and its state table if they don't exist."""
     cursor = conn.cursor()
     cursor.execute(CREATE_TABLE_SQL)
+    cursor.execute(CREATE_STATE_SQL)
+    cursor.execute(CREATE_REGISTRY_SQL)
+    cursor.execute(CREATE_LONG_SQL)
+    cursor.execute(CREATE_FRESHNESS_SQL)
+    conn.commit()
+    logger.info(f"Tables '{target_table}', '{state_table}', '{registry_table}', '{long_table}' "
+                f"and '{freshness_table}' ready")
+
+
+def default_registry():
+    """Registry built from the ALL_TICKERS config: {yf_ticker: {'series', 'category', 'benchmark', 'market'}}."""
+    return {
+        yf_ticker: {
+            'series': series,
+            'category': SERIES_CATEGORIES.get(series, 'sector'),
+            'benchmark': SERIES_BENCHMARKS.get(series),
+            'market': SERIES_MARKETS.get(series, 'US'),
+        }
+        for yf_ticker, series in ALL_TICKERS.items()
+    }
+
+
+def load_registry(conn):
+    """Seed market_context_series with any configured tickers it lacks and return the active registry."""
+    defaults = default_registry()
+    seed_rows = [(t, v['series'], v['category'], v['benchmark'], v['market']) for t, v in defaults.items()]
+    bulk_merge(conn, registry_table, ['yf_ticker', 'series', 'category', 'benchmark', 'market'], ['yf_ticker'],
+               seed_rows, mode='insert')
+
+    cursor = conn.cursor()
+    # Rows registered before the benchmark/market columns existed pick up the configured values
+    cursor.executemany(
+        f"UPDATE {registry_table} SET benchmark = COALESCE(benchmark, ?), market = COALESCE(market, ?) "
+        f"WHERE yf_ticker = ? AND (benchmark IS NULL OR market IS NULL)",
+        [(v['benchmark'], v['market'], t) for t, v in defaults.items()]
+    )
+    conn.commit()
+
+    cursor.execute(f"SELECT yf_ticker, series, category, benchmark, market FROM {registry_table} WHERE is_active = 'Y'")
+    registry = {}
+    for yf_ticker, series, category, benchmark, market in cursor.fetchall():
+        if category not in CATEGORY_METRICS:
+            logger.warning(f"{yf_ticker} ({series}): unknown category '{category}', skipping")
+            continue
+        if market not in MARKET_CLOSE:
+            market = 'US'
+        registry[yf_ticker] = {'series': series, 'category': category, 'benchmark': benchmark, 'market': market}
+    logger.info(f"Registry: {len(registry)} active series")
+    return registry
+
+
+def wide_columns(registry):
+    """Map each wide column name to its (series, metric) pair."""
+    return {
+        f"{entry['series']}_{metric}": (entry['series'], metric)
+        for entry in registry.values()
+        for metric in CATEGORY_METRICS[entry['category']]
+    }
+
+
+def ensure_wide_view(conn, registry):
+    """(Re)generate market_context_daily_v: the long store pivoted to one column per series metric."""
+    columns = wide_columns(registry)
+    select_cols = ',\n    '.join(
+        f"MAX(CASE WHEN series = '{series}' AND metric = '{metric}' THEN value END) AS {col}"
+        for col, (series, metric) in columns.items()
+    )
+    cursor = conn.cursor()
+    cursor.execute(f"""
+CREATE OR ALTER VIEW {wide_view} AS
+SELECT
+    trading_date,
+    {select_cols}
+FROM {long_table}
+GROUP BY trading_date
+""")
+    conn.commit()
+    logger.info(f"View '{wide_view}' regenerated with {len(columns)} columns")
+
+
+def load_state(conn):
+    """Load per-ticker close state: {yf_ticker: (prev_date, prev_close, last_date, last_close)}."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT yf_ticker, prev_date, prev_close, last_date, last_close FROM {state_table}")
+    return {row[0]: (row[1], row[2], row[3], row[4]) for row in cursor.fetchall()}
+
+
+def save_state(conn, closes, state, registry):
+    """Persist the last two closes per ticker (seeded with the previous state when only one new session arrived)."""
+    rows = []
+    for yf_ticker, close in closes.items():
+        points = [(ts.date(), float(v)) for ts, v in close.items()]
+        if yf_ticker in state and state[yf_ticker][1] is not None:
+            prev_date, prev_close = state[yf_ticker][0], state[yf_ticker][1]
+            points = [(prev_date, prev_close)] + [p for p in points if p[0] > prev_date]
+        if not points:
+            continue
+        last_date, last_close = points[-1]
+        prev_date, prev_close = points[-2] if len(points) > 1 else (None, None)
+        rows.append((yf_ticker, registry[yf_ticker]['series'], prev_date, prev_close, last_date, last_close))
+
+    if not rows:
+        return
+
+    cursor = conn.cursor()
+    cursor.executemany(f"""
+        MERGE {state_table} AS t
+        USING (SELECT ? AS yf_ticker, ? AS series, ? AS prev_date, ? AS prev_close, ? AS last_date, ? AS last_close) AS s
+            ON t.yf_ticker = s.yf_ticker
+        WHEN MATCHED THEN UPDATE SET
+            series = s.series, prev_date = s.prev_date, prev_close = s.prev_close,
+            last_date = s.last_date, last_close = s.last_close, updated_at = GETDATE()
+        WHEN NOT MATCHED THEN
+            INSERT (yf_ticker, series, prev_date, prev_close, last_date, last_close)
+            VALUES (s.yf_ticker, s.series, s.prev_date, s.prev_close, s.last_date, s.last_close);
+    """, rows)
     conn.commit()
-    logger.info(f"Table '{target_table}' ready")
+    logger.info(f"Saved close state for {len(rows)} tickers")
+
+
+def series_metrics(series, category, close):
+    """Derive the stored metrics for one series from its close series: {column: Series}."""
+    return {f'{series}_{metric}': METRIC_FUNCS[metric](close) for metric in CATEGORY_METRICS[category]}
+
+
+def market_now(market, now_utc=None):
+    """Current wall-clock time in the market's timezone."""
+    now_utc = now_utc or datetime.now(ZoneInfo('UTC'))
+    return now_utc.astimezone(MARKET_CLOSE[market][0])
+
+
+def cell_status(trading_date, market, now_utc=None):
+    """'final' once the market's session for trading_date has closed (plus buffer), else 'provisional'."""
+    tz, close_time = MARKET_CLOSE[market]
+    session_close = datetime.combine(trading_date, close_time, tzinfo=tz) + FINAL_BUFFER
+    return 'final' if market_now(market, now_utc) >= session_close else 'provisional'
+
+
+def load_provisional(conn):
+    """Earliest provisional trading_date per series: {series: date}."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT series, MIN(trading_date) FROM {freshness_table}
+        WHERE status = 'provisional'
+        GROUP BY series
+    """)
+    return {series: first_date for series, first_date in cursor.fetchall()}
+
+
+def fetch_plan(registry, state, provisional, now_utc=None):
+    """
+    Decide which tickers need a download and from which date: {yf_ticker: start_date}.
+
+    A ticker is due when it has provisional cells, or when a weekday session after
+    its last stored date has started in its market. Tickers whose provisional cells
+    reach back past the seeded close are re-requested with their own lookback.
+    """
+    plan = {}
+    for yf_ticker, entry in registry.items():
+        last_date = state[yf_ticker][2]
+        first_provisional = provisional.get(entry['series'])
+        today = market_now(entry['market'], now_utc).date()
+        next_session = last_date + timedelta(days=1)
+        while next_session.weekday() >= 5:
+            next_session += timedelta(days=1)
+
+        if first_provisional is not None and first_provisional < last_date:
+            plan[yf_ticker] = first_provisional - timedelta(days=7)
+        elif first_provisional is not None or next_session <= today:
+            plan[yf_ticker] = last_date
+    return plan
+
+
+def record_freshness(conn, closes, registry, now_utc=None):
+    """Mark every downloaded (series, trading_date) close as final or provisional."""
+    rows = []
+    for yf_ticker, close in closes.items():
+        entry = registry[yf_ticker]
+        for ts in close.index:
+            rows.append((entry['series'], ts.date(), cell_status(ts.date(), entry['market'], now_utc)))
+    bulk_merge(conn, freshness_table, ['series', 'trading_date', 'status'], ['series', 'trading_date'],
+               rows, extra_set={'fetched_at': 'GETDATE()'})
+    provisional = sum(1 for r in rows if r[2] == 'provisional')
+    if provisional:
+        logger.info(f"{provisional} cell(s) stored as provisional; the next run will re-request them")
 
 
 def get_last_date(conn):
@@ -178,9 +540,17 @@ def get_last_date(conn):
     return result
 
 
-def download_data(start_date, end_date):
-    """Batch-download all tickers from yfinance."""
-    all_yf_tickers = list(ALL_TICKERS.keys())
+def download_data(start_date, end_date, state=None, registry=None):
+    """
+    Batch-download all registry tickers from yfinance.
+
+    When state is given, each ticker's series is seeded with its stored previous
+    close so returns/changes are computed for the new sessions only.
+    Returns (result DataFrame, {yf_ticker: close Series}) — the closes feed save_state().
+    """
+    state = state or {}
+    registry = registry or default_registry()
+    all_yf_tickers = list(registry.keys())
     ticker_str = ' '.join(all_yf_tickers)
 
     logger.info(f"Downloading {len(all_yf_tickers)} tickers from {start_date} to {end_date}")
@@ -198,17 +568,19 @@ def download_data(start_date, end_date):
         )
     except Exception as e:
         logger.error(f"yfinance download failed: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
 
     if raw.empty:
         logger.warning("No data returned from yfinance")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
 
     # Build a clean DataFrame with one row per trading date
     result = pd.DataFrame(index=raw.index)
     result.index.name = 'trading_date'
+    closes = {}
 
-    for yf_ticker, col_prefix in ALL_TICKERS.items():
+    for yf_ticker, entry in registry.items():
+        col_prefix = entry['series']
         try:
             # Handle multi-ticker download column structure
             if isinstance(raw.columns, pd.MultiIndex):
@@ -226,24 +598,17 @@ def download_data(start_date, end_date):
                 logger.warning(f"{yf_ticker} ({col_prefix}): no 'Close' column, skipping")
                 continue
 
-            close = ticker_data[close_col].astype(float)
-
-            # For volatility indices and yield: store close + daily change
-            if col_prefix in ('vix', 'india_vix'):
-                result[f'{col_prefix}_close'] = close
-                result[f'{col_prefix}_change_pct'] = close.pct_change(fill_method=None) * 100
+            # Per-ticker sessions only, so another market's holiday doesn't blank the next return
+            close = ticker_data[close_col].astype(float).dropna()
+            closes[yf_ticker] = close
 
-            elif col_prefix == 'us_10y_yield':
-                result[f'{col_prefix}_close'] = close
-                result[f'{col_prefix}_change'] = close.diff()
+            prev_date, prev_close = state.get(yf_ticker, (None, None, None, None))[:2]
+            if prev_close is not None:
+                seed_ts = pd.Timestamp(prev_date)
+                close = pd.concat([pd.Series([prev_close], index=[seed_ts]), close[close.index > seed_ts]])
 
-            elif col_prefix in ('sp500', 'nasdaq_comp', 'nifty50', 'dxy'):
-                result[f'{col_prefix}_close'] = close
-                result[f'{col_prefix}_return_1d'] = close.pct_change(fill_method=None) * 100
-
-            else:
-                # Sector ETFs and India sector indices — just 1-day return
-                result[f'{col_prefix}_return_1d'] = close.pct_change(fill_method=None) * 100
+            for col, values in series_metrics(col_prefix, entry['category'], close).items():
+                result[col] = values.reindex(result.index)
 
         except Exception as e:
             print(f"  ⚠️  {yf_ticker} ({col_prefix}): Error processing — {e}")
@@ -253,101 +618,40 @@ def download_data(start_date, end_date):
     result = result.dropna(how='all', subset=data_cols if data_cols else None)
 
     logger.info(f"Downloaded {len(result)} trading days of market context data")
-    return result
+    return result, closes
 
 
 def insert_data(conn, df):
-    """Insert new rows and update existing rows with NULL columns."""
+    """
+    Upsert the downloaded frame into market_context_daily with one staged MERGE.
+    Existing rows only take non-NULL values (COALESCE), so a partial download
+    (e.g. India indices not yet closed) never blanks previously stored columns.
+    """
     if df.empty:
         logger.warning("No data to insert")
         return
 
-    cursor = conn.cursor()
+    frame = df.reindex(columns=DB_COLUMNS[1:])
+    frame.insert(0, 'trading_date', [idx.date() if hasattr(idx, 'date') else idx for idx in df.index])
+    rows = frame_to_rows(frame, DB_COLUMNS)
 
-    # Get existing dates and their NULL columns
-    cursor.execute(f"SELECT trading_date FROM {target_table}")
-    existing_dates = set(row[0] for row in cursor.fetchall())
-
-    # Column order must match INSERT statement
-    db_columns = [
-        'trading_date',
-        # Volatility
-        'vix_close', 'vix_change_pct',
-        'india_vix_close', 'india_vix_change_pct',
-        # Indices
-        'sp500_close', 'sp500_return_1d',
-        'nasdaq_comp_close', 'nasdaq_comp_return_1d',
-        'nifty50_close', 'nifty50_return_1d',
-        # Currency / Rates
-        'dxy_close', 'dxy_return_1d',
-        'us_10y_yield_close', 'us_10y_yield_change',
-        # US Sector ETFs
-        'xlk_return_1d', 'xlf_return_1d', 'xle_return_1d',
-        'xlv_return_1d', 'xli_return_1d', 'xlc_return_1d',
-        'xly_return_1d', 'xlp_return_1d', 'xlb_return_1d',
-        'xlre_return_1d', 'xlu_return_1d',
-        # India Sector Indices
-        'nifty_it_return_1d', 'nifty_bank_return_1d',
-        'nifty_pharma_return_1d', 'nifty_auto_return_1d',
-        'nifty_fmcg_return_1d',
-    ]
+    inserted, updated = bulk_merge(conn, target_table, DB_COLUMNS, ['trading_date'], rows, mode='coalesce')
+    logger.info(f"Inserted {inserted} new rows, updated {updated} existing rows, skipped {len(rows) - inserted - updated} unchanged")
 
-    placeholders = ', '.join(['?' for _ in db_columns])
-    col_names = ', '.join(db_columns)
-    insert_sql = f"INSERT INTO {target_table} ({col_names}) VALUES ({placeholders})"
-
-    inserted = 0
-    updated = 0
-    skipped = 0
-
-    for idx, row in df.iterrows():
-        trading_date = idx.date() if hasattr(idx, 'date') else idx
-
-        if trading_date in existing_dates:
-            # Row exists - check if we should update NULL columns
-            # Build UPDATE statement for non-NULL values we have
-            updates = []
-            values = []
-            
-            for col in db_columns[1:]:  # Skip trading_date
-                val = row.get(col, None)
-                if val is not None and pd.notna(val):
-                    updates.append(f"{col} = ?")
-                    values.append(float(val))
-            
-            if updates:
-                # Update existing row with new non-NULL values
-                update_sql = f"UPDATE {target_table} SET {', '.join(updates)} WHERE trading_date = ?"
-                values.append(trading_date)
-                try:
-                    cursor.execute(update_sql, values)
-                    if cursor.rowcount > 0:
-                        updated += 1
-                        logger.info(f"  Updated {trading_date} with {len(updates)} columns")
-                    else:
-                        skipped += 1
-                except Exception as e:
-                    logger.error(f"Error updating {trading_date}: {e}")
-            else:
-                skipped += 1
-        else:
-            # New row - insert it
-            values = [trading_date]
-            for col in db_columns[1:]:  # Skip trading_date
-                val = row.get(col, None)
-                if val is not None and pd.notna(val):
-                    values.append(float(val))
-                else:
-                    values.append(None)
 
-            try:
-                cursor.execute(insert_sql, values)
-                inserted += 1
-            except Exception as e:
-                logger.error(f"Error inserting {trading_date}: {e}")
+def insert_long(conn, df, registry):
+    """Upsert every non-NULL (trading_date, series, metric) cell into market_context_long."""
+    if df.empty:
+        return
 
-    conn.commit()
-    logger.info(f"Inserted {inserted} new rows, updated {updated} existing rows, skipped {skipped} unchanged")
+    columns = {c: sm for c, sm in wide_columns(registry).items() if c in df.columns}
+    cells = df[list(columns)].stack().dropna() if columns else pd.Series(dtype=float)
+    rows = [
+        (columns[col][0], columns[col][1], idx.date() if hasattr(idx, 'date') else idx, float(value))
+        for (idx, col), value in cells.items()
+    ]
+    bulk_merge(conn, long_table, ['series', 'metric', 'trading_date', 'value'],
+               ['series', 'metric', 'trading_date'], rows, extra_set={'data_fetched_at': 'GETDATE()'})
 
 
 # ============================================================
@@ -368,18 +672,39 @@ def main():
 
     conn = connect_db()
     ensure_table(conn)
+    registry = load_registry(conn)
+    ensure_wide_view(conn, registry)
 
+    state = {}
     if args.backfill:
         start_date = datetime.today() - timedelta(days=BACKFILL_DAYS)
         logger.info(f"Backfill mode: loading {BACKFILL_DAYS} days from {start_date.date()}")
     else:
         last_date = get_last_date(conn)
-        if last_date:
-            # Convert date to datetime for consistency
-            # IMPORTANT: Go back 7 days to ensure we have enough previous data for pct_change()
-            # This accounts for weekends, holidays, and data gaps
+        state = load_state(conn)
+        if last_date and all(t in state for t in registry):
+            # Only series with provisional cells or a new session are re-requested, from
+            # their last stored session; returns are seeded from the stored previous close.
+            # A series that stopped updating is capped at the old 7-day window.
+            plan = fetch_plan(registry, state, load_provisional(conn))
+            if not plan:
+                logger.info("All series are final and current. Nothing to fetch")
+                conn.close()
+                return
+            for yf_ticker, ticker_start in plan.items():
+                if ticker_start < state[yf_ticker][2]:
+                    state.pop(yf_ticker)  # re-fetching past the seed: recompute from the download
+            registry = {t: registry[t] for t in plan}
+            oldest = max(min(plan.values()), last_date - timedelta(days=7))
+            start_date = datetime.combine(oldest, datetime.min.time())
+            logger.info(f"Incremental mode: last date in DB = {last_date}, fetching {len(plan)} series "
+                        f"from {start_date.date()} (seeded from {state_table})")
+        elif last_date:
+            # No (complete) state yet: go back 7 days so pct_change() has a previous close.
+            # This run seeds market_context_state for the next one.
+            state = {}
             start_date = datetime.combine(last_date, datetime.min.time()) - timedelta(days=7)
-            logger.info(f"Incremental mode: last date in DB = {last_date}, fetching from {start_date.date()} (7-day lookback for pct_change)")
+            logger.info(f"Incremental mode: last date in DB = {last_date}, fetching from {start_date.date()} (7-day lookback, seeding state)")
         else:
             start_date = datetime.today() - timedelta(days=BACKFILL_DAYS)
             logger.info(f"First run: no data found, backfilling {BACKFILL_DAYS} days")
@@ -391,8 +716,14 @@ def main():
         conn.close()
         return
 
-    df = download_data(start_date, end_date)
+    df, closes = download_data(start_date, end_date, state, registry)
     insert_data(conn, df)
+    insert_long(conn, df, registry)
+    save_state(conn, closes, state, registry)
+    record_freshness(conn, closes, registry)
+
+    # Multi-horizon regime features (market_context_features / market_context_features_v)
+    update_features(conn, full=args.backfill)
 
     # Summary
     cursor = conn.cursor()
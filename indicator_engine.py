@@ -0,0 +1,487 @@
+"""
+Technical Indicator Engine
+==========================
+Materializes the indicators of create_forex_views.sql (and the NSE/NASDAQ equivalents)
+into one table per market, keyed by (symbol, trading_date), so signal queries are plain
+indexed reads instead of nested window-function views over the full history.
+
+    fx      forex_hist_data        -> forex_indicators
+    nasdaq  nasdaq_100_hist_data   -> nasdaq_100_indicators
+    nse     nse_500_hist_data      -> nse_500_indicators
+
+Indicators (computed with NumPy across all symbols of a chunk at once):
+    sma_20/50/100/200   simple moving averages of close
+    ema_20/50/100/200   true exponential averages (alpha = 2 / (span + 1))
+    rsi_14              Wilder RSI (average gain / loss smoothed with alpha = 1/14)
+    macd, macd_signal, macd_hist   EMA12 - EMA26, EMA9 of MACD, difference
+    bb_upper, bb_lower  SMA20 +/- 2 sample standard deviations
+    atr_14              14-bar mean of the true range max(H-L, |H-Cprev|, |L-Cprev|)
+A value stays NULL until the symbol has enough bars for its window (span for EMAs).
+
+Bars are laid out position-aligned: row t of every matrix is each symbol's t-th bar,
+so rolling windows and EMA recursions run over bars, never over calendar gaps.
+
+Recursive indicators (EMAs, Wilder average gain/loss, MACD signal) keep their last value
+per symbol in indicator_state, so each new bar costs one constant-time step:
+    ema_t = ema_{t-1} + alpha * (close_t - ema_{t-1})
+Window indicators (SMA, Bollinger, ATR) only need the last WINDOW_DAYS of bars.
+
+Incremental updates (default): only symbols whose price table moved past their state's
+last_date are processed; their recent window is reloaded, the recursive values are stepped
+forward from the stored state, and only the new rows are written. Symbols without state
+(new listings, or tables built before the state store) are seeded by the vectorized path
+over their full history, which also writes their state.
+
+Bars back-filled or revised at or before last_date (load_price_range.py, the grouped adhoc
+forex import, the intraday rollup, close revisions) would never be revisited, so each run
+also checks every state against its price history: a bar count up to last_date other than
+bar_count, a stored close at last_date other than last_close, or (forex) a bar whose
+last_updated is newer than the state marks the symbol as drifted, and it is reseeded.
+
+Usage:
+    python indicator_engine.py                          # Incremental, all markets
+    python indicator_engine.py --market fx nse          # Selected markets
+    python indicator_engine.py --market nasdaq --full   # Recompute the whole history
+"""
+
+import argparse
+import logging
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pyodbc
+
+from latest_snapshot import MARKETS as SNAPSHOT_MARKETS, refresh_snapshot
+from signal_generator import refresh_signals
+from sql_loader import bulk_merge, frame_to_rows, server_time
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+MARKETS = {
+    'fx': {'source_table': 'forex_hist_data', 'symbol_column': 'symbol',
+           'indicator_table': 'forex_indicators', 'numeric_prices': True, 'updated_column': 'last_updated'},
+    'nasdaq': {'source_table': 'nasdaq_100_hist_data', 'symbol_column': 'ticker',
+               'indicator_table': 'nasdaq_100_indicators', 'numeric_prices': False, 'updated_column': None},
+    'nse': {'source_table': 'nse_500_hist_data', 'symbol_column': 'ticker',
+            'indicator_table': 'nse_500_indicators', 'numeric_prices': False, 'updated_column': None},
+}
+
+SMA_WINDOWS = (20, 50, 100, 200)
+EMA_SPANS = (20, 50, 100, 200)
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BB_WINDOW, BB_WIDTH = 20, 2
+ATR_WINDOW = 14
+
+INDICATOR_COLUMNS = (
+    ['close_price']
+    + [f'sma_{w}' for w in SMA_WINDOWS]
+    + [f'ema_{s}' for s in EMA_SPANS]
+    + ['rsi_14', 'macd', 'macd_signal', 'macd_hist', 'bb_upper', 'bb_lower', 'atr_14']
+)
+
+# Calendar days of history reloaded before a symbol's last state date: covers the
+# 200-bar SMA window (the recursive indicators resume from indicator_state)
+WINDOW_DAYS = 400
+# Symbols per load/compute/merge batch (bounds matrix size and staging rows)
+SYMBOL_CHUNK = 100
+
+state_table = "indicator_state"
+# Unmasked recursive values after a symbol's last processed bar
+EMA_STATE = {f'ema_{span}': span for span in sorted({MACD_FAST, MACD_SLOW} | set(EMA_SPANS))}
+STATE_COLUMNS = (['last_date', 'bar_count', 'last_close'] + list(EMA_STATE)
+                 + ['avg_gain', 'avg_loss', 'macd_signal'])
+
+
+def ensure_indicator_table(conn, market):
+    table = MARKETS[market]['indicator_table']
+    value_columns = ',\n        '.join(f'{c} FLOAT NULL' for c in INDICATOR_COLUMNS)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table}')
+    BEGIN
+        CREATE TABLE {table} (
+            symbol VARCHAR(50) NOT NULL,
+            trading_date DATE NOT NULL,
+            {value_columns},
+            updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+            CONSTRAINT PK_{table} PRIMARY KEY CLUSTERED (symbol, trading_date)
+        );
+        CREATE NONCLUSTERED INDEX IX_{table}_date ON {table} (trading_date)
+            INCLUDE (close_price, rsi_14, macd, macd_signal, bb_upper, bb_lower, atr_14);
+    END
+    """)
+    conn.commit()
+
+
+def ensure_state_table(conn):
+    value_columns = ',\n        '.join(f'{c} FLOAT NULL' for c in STATE_COLUMNS[2:])
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{state_table}')
+    BEGIN
+        CREATE TABLE {state_table} (
+            market VARCHAR(10) NOT NULL,
+            symbol VARCHAR(50) NOT NULL,
+            last_date DATE NOT NULL,                -- Last bar folded into the state
+            bar_count INT NOT NULL,                 -- Bars processed so far (warm-up masking)
+            {value_columns},
+            updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+            CONSTRAINT PK_{state_table} PRIMARY KEY CLUSTERED (market, symbol)
+        );
+    END
+    """)
+    conn.commit()
+
+
+def load_states(conn, market):
+    """indicator_state rows for `market` as a DataFrame indexed by symbol."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT symbol, {', '.join(STATE_COLUMNS)} FROM {state_table} WHERE market = ?", market)
+    states = pd.DataFrame.from_records([tuple(row) for row in cursor.fetchall()],
+                                       columns=['symbol'] + STATE_COLUMNS)
+    for column in STATE_COLUMNS[2:]:
+        states[column] = states[column].astype(float)
+    return states.set_index('symbol')
+
+
+def save_states(conn, market, states):
+    states = states.reset_index()
+    states.insert(0, 'market', market)
+    columns = ['market', 'symbol'] + STATE_COLUMNS
+    bulk_merge(conn, state_table, columns, ['market', 'symbol'], frame_to_rows(states, columns),
+               extra_set={'updated_at': 'GETDATE()'})
+
+
+def watermarks(conn, table, symbol_column='symbol'):
+    """Last trading_date per symbol in `table`: {symbol: date}."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {symbol_column}, MAX(trading_date) FROM {table} GROUP BY {symbol_column}")
+    return {symbol: last_date for symbol, last_date in cursor.fetchall()}
+
+
+def drifted_symbols(conn, market):
+    """
+    Symbols whose price history up to their state's last_date no longer matches the state
+    (bars back-filled, deleted or revised after the state was written). One GROUP BY.
+    """
+    config = MARKETS[market]
+    sym = config['symbol_column']
+    close = 'CAST(p.close_price AS FLOAT)' if config['numeric_prices'] else 'TRY_CAST(p.close_price AS FLOAT)'
+    updated = config['updated_column']
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH history AS (
+            SELECT p.{sym} AS symbol,
+                   COUNT(*) AS bars_to_date,
+                   MAX(CASE WHEN p.trading_date = s.last_date THEN {close} END) AS close_at_last
+                   {f', MAX(p.{updated}) AS last_updated' if updated else ''}
+            FROM {config['source_table']} AS p
+            JOIN {state_table} AS s ON s.market = ? AND s.symbol = p.{sym} AND p.trading_date <= s.last_date
+            WHERE {close} IS NOT NULL
+            GROUP BY p.{sym}
+        )
+        SELECT h.symbol
+        FROM history AS h
+        JOIN {state_table} AS s ON s.market = ? AND s.symbol = h.symbol
+        WHERE h.bars_to_date <> s.bar_count
+           OR h.close_at_last IS NULL
+           OR ABS(h.close_at_last - s.last_close) > 1e-9 * ABS(s.last_close)
+           {'OR h.last_updated > s.updated_at' if updated else ''}
+    """, market, market)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def load_bars(conn, market, symbols, since=None):
+    """High/low/close bars for `symbols` (optionally from `since`), sorted by symbol and date."""
+    config = MARKETS[market]
+    sym = config['symbol_column']
+    if config['numeric_prices']:
+        high, low, close = 'high_price', 'low_price', 'close_price'
+    else:  # equity prices are stored as VARCHAR
+        high, low, close = ('TRY_CAST(high_price AS FLOAT)', 'TRY_CAST(low_price AS FLOAT)',
+                            'TRY_CAST(close_price AS FLOAT)')
+    query = f"""
+        SELECT {sym} AS symbol, trading_date, {high} AS high, {low} AS low, {close} AS close
+        FROM {config['source_table']}
+        WHERE {sym} IN ({', '.join('?' for _ in symbols)}) AND {close} IS NOT NULL
+    """
+    params = list(symbols)
+    if since is not None:
+        query += " AND trading_date >= ?"
+        params.append(since)
+    cursor = conn.cursor()
+    cursor.execute(query + f" ORDER BY {sym}, trading_date", params)
+    bars = pd.DataFrame.from_records(cursor.fetchall(), columns=['symbol', 'trading_date', 'high', 'low', 'close'])
+    for column in ('high', 'low', 'close'):
+        bars[column] = bars[column].astype(float)
+    return bars
+
+
+# --------------------------------------------------------------------------
+# Position-aligned NumPy kernels: x is (bars x symbols), NaN past each symbol's last bar
+# --------------------------------------------------------------------------
+
+def rolling_mean(x, window):
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    cs = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    out[window - 1:] = (cs[window:] - cs[:-window]) / window
+    return out
+
+
+def rolling_std(x, window):
+    """Sample standard deviation (ddof=1, like T-SQL STDEV) over `window` bars."""
+    out = np.full_like(x, np.nan)
+    if len(x) < window:
+        return out
+    centered = x - x[0]  # shift by the first bar to keep the sum-of-squares well conditioned
+    s1 = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(centered, axis=0)])
+    s2 = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(centered ** 2, axis=0)])
+    w1 = s1[window:] - s1[:-window]
+    w2 = s2[window:] - s2[:-window]
+    out[window - 1:] = np.sqrt(np.maximum(w2 - w1 ** 2 / window, 0.0) / (window - 1))
+    return out
+
+
+def ema(x, alpha, prev=None):
+    """
+    Exponential average along bars, one vector step per bar. Each column continues from
+    `prev` (its value before row 0) or, where `prev` is None/NaN, is seeded with its first bar.
+    """
+    out = np.full_like(x, np.nan)
+    if len(x) == 0:
+        return out
+    first = x[0] if prev is None else np.where(np.isnan(prev), x[0], prev + alpha * (x[0] - prev))
+    out[0] = first
+    for t in range(1, len(x)):
+        out[t] = out[t - 1] + alpha * (x[t] - out[t - 1])
+    return out
+
+
+def window_matrices(high, low, close):
+    """SMA, Bollinger and ATR matrices: depend only on the trailing window of bars."""
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    out = {f'sma_{window}': rolling_mean(close, window) for window in SMA_WINDOWS}
+
+    middle = rolling_mean(close, BB_WINDOW)
+    std = rolling_std(close, BB_WINDOW)
+    out['bb_upper'] = middle + BB_WIDTH * std
+    out['bb_lower'] = middle - BB_WIDTH * std
+
+    with np.errstate(invalid='ignore'):
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    out['atr_14'] = rolling_mean(true_range, ATR_WINDOW)
+    return out
+
+
+def recursive_matrices(close, state=None):
+    """
+    Unmasked EMA / Wilder / MACD-signal recursions over `close`, continuing from `state`
+    (arrays per STATE_COLUMNS, one value per column) or seeded from row 0 when state is None.
+    """
+    def prev(column):
+        return None if state is None else state[column]
+
+    out = {column: ema(close, 2.0 / (span + 1), prev(column)) for column, span in EMA_STATE.items()}
+
+    last_close = np.full(close.shape[1], np.nan) if state is None else state['last_close']
+    prev_close = np.vstack([last_close[None, :], close[:-1]])
+    change = close - prev_close
+    gain = np.where(change > 0, change, 0.0)
+    loss = np.where(change < 0, -change, 0.0)
+    if state is None:
+        # No change exists for the first bar: Wilder averages start at the second bar
+        out['avg_gain'] = np.vstack([np.full((1, close.shape[1]), np.nan), ema(gain[1:], 1.0 / RSI_PERIOD)])
+        out['avg_loss'] = np.vstack([np.full((1, close.shape[1]), np.nan), ema(loss[1:], 1.0 / RSI_PERIOD)])
+    else:
+        out['avg_gain'] = ema(gain, 1.0 / RSI_PERIOD, state['avg_gain'])
+        out['avg_loss'] = ema(loss, 1.0 / RSI_PERIOD, state['avg_loss'])
+
+    out['macd'] = out[f'ema_{MACD_FAST}'] - out[f'ema_{MACD_SLOW}']
+    out['macd_signal'] = ema(out['macd'], 2.0 / (MACD_SIGNAL + 1), prev('macd_signal'))
+    return out
+
+
+def recursive_indicators(close, bar_index, state=None):
+    """Masked EMA / RSI / MACD output columns plus the raw recursions (for the next state)."""
+    raw = recursive_matrices(close, state)
+
+    def masked(values, bars_needed):
+        return np.where(bar_index >= bars_needed - 1, values, np.nan)
+
+    out = {f'ema_{span}': masked(raw[f'ema_{span}'], span) for span in EMA_SPANS}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(raw['avg_loss'] == 0, 100.0, 100.0 - 100.0 / (1.0 + raw['avg_gain'] / raw['avg_loss']))
+    out['rsi_14'] = masked(np.where(np.isnan(raw['avg_gain']), np.nan, rsi), RSI_PERIOD + 1)
+    out['macd'] = masked(raw['macd'], MACD_SLOW)
+    out['macd_signal'] = masked(raw['macd_signal'], MACD_SLOW + MACD_SIGNAL - 1)
+    out['macd_hist'] = out['macd'] - out['macd_signal']
+    return out, raw
+
+
+def compute_indicators(bars, states=None):
+    """
+    Indicator rows for `bars` (symbol, trading_date, high, low, close; sorted by symbol, date).
+
+    states=None: every bar is output and the recursions are seeded from each symbol's first bar
+                 (the vectorized backfill path).
+    states     : DataFrame (STATE_COLUMNS, indexed by symbol) for every symbol in `bars`; only
+                 bars after each state's last_date are output and the recursions resume from it.
+                 Earlier bars only feed the window indicators.
+
+    Returns (rows, new_states): rows has symbol, trading_date and INDICATOR_COLUMNS; new_states
+    is indexed by symbol with STATE_COLUMNS after each symbol's last output bar.
+    """
+    if bars.empty:
+        return (pd.DataFrame(columns=['symbol', 'trading_date'] + INDICATOR_COLUMNS),
+                pd.DataFrame(columns=STATE_COLUMNS))
+    symbol_codes, symbols = pd.factorize(bars['symbol'])
+    position = bars.groupby('symbol', sort=False).cumcount().to_numpy()
+
+    def matrix(values, rows, cols, shape):
+        m = np.full(shape, np.nan)
+        m[rows, cols] = values
+        return m
+
+    shape = (position.max() + 1, len(symbols))
+    close = bars['close'].to_numpy()
+    windows = window_matrices(matrix(bars['high'].to_numpy(), position, symbol_codes, shape),
+                              matrix(bars['low'].to_numpy(), position, symbol_codes, shape),
+                              matrix(close, position, symbol_codes, shape))
+
+    # Output bars, position-aligned from each symbol's first output bar
+    if states is None:
+        is_output = np.ones(len(bars), dtype=bool)
+        bar_offset = np.zeros(len(symbols))
+        state = None
+    else:
+        is_output = (bars['trading_date'] > bars['symbol'].map(states['last_date'])).to_numpy()
+        aligned = states.reindex(symbols)
+        bar_offset = aligned['bar_count'].to_numpy(dtype=float)
+        state = {column: aligned[column].to_numpy(dtype=float) for column in STATE_COLUMNS[2:]}
+    out_codes = symbol_codes[is_output]
+    out_position = bars[is_output].groupby('symbol', sort=False).cumcount().to_numpy()
+    out_counts = np.bincount(out_codes, minlength=len(symbols))
+    out_shape = (max(out_counts.max(), 1), len(symbols))
+    bar_index = bar_offset[None, :] + np.arange(out_shape[0])[:, None]
+    recursive, raw = recursive_indicators(matrix(close[is_output], out_position, out_codes, out_shape),
+                                          bar_index, state)
+
+    result = bars.loc[is_output, ['symbol', 'trading_date']].copy()
+    result['close_price'] = close[is_output]
+    for column in INDICATOR_COLUMNS[1:]:
+        if column in windows:
+            result[column] = windows[column][position[is_output], out_codes]
+        else:
+            result[column] = recursive[column][out_position, out_codes]
+
+    # State after each symbol's last output bar (symbols without output keep their old state)
+    has_output = out_counts > 0
+    last_row = out_counts[has_output] - 1
+    cols = np.flatnonzero(has_output)
+    new_states = pd.DataFrame(index=pd.Index(symbols[has_output], name='symbol'))
+    new_states['last_date'] = result.groupby('symbol', sort=False)['trading_date'].last().reindex(new_states.index)
+    new_states['bar_count'] = (bar_offset[has_output] + out_counts[has_output]).astype(int)
+    new_states['last_close'] = result.groupby('symbol', sort=False)['close_price'].last().reindex(new_states.index)
+    for column in STATE_COLUMNS[3:]:
+        new_states[column] = raw[column][last_row, cols]
+    return result, new_states
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def update_indicators(conn, market, full=False):
+    """
+    Bring `market`'s indicator table and indicator_state up to date with its price table,
+    then regenerate the signals of the sessions written in this run and, for equity
+    markets, the latest_snapshot rows of the tickers it touched.
+    full=True reseeds every symbol over its whole history. Returns rows written.
+    """
+    config = MARKETS[market]
+    table = config['indicator_table']
+    ensure_indicator_table(conn, market)
+    ensure_state_table(conn)
+    started = server_time(conn)
+
+    price_marks = watermarks(conn, config['source_table'], config['symbol_column'])
+    states = load_states(conn, market)
+    if full:
+        states = states.iloc[0:0]
+    # Drifted symbols are reseeded over their full history like new ones
+    drifted = set() if full else drifted_symbols(conn, market)
+    if drifted:
+        logger.info(f"{table}: {len(drifted)} symbol(s) with back-filled or revised bars: {sorted(drifted)[:20]}")
+    new_symbols = sorted(s for s in price_marks if s not in states.index or s in drifted)
+    behind = sorted(s for s, last in price_marks.items()
+                    if s in states.index and s not in drifted and last > states.at[s, 'last_date'])
+    logger.info(f"{table}: {len(new_symbols)} symbol(s) to seed, {len(behind)} to extend")
+
+    written = 0
+    batches = [(batch, None) for batch in chunks(new_symbols, SYMBOL_CHUNK)]
+    batches += [(batch, states.loc[batch]) for batch in chunks(behind, SYMBOL_CHUNK)]
+    for batch, batch_states in batches:
+        since = None if batch_states is None else batch_states['last_date'].min() - timedelta(days=WINDOW_DAYS)
+        result, new_states = compute_indicators(load_bars(conn, market, batch, since), batch_states)
+        rows = frame_to_rows(result, ['symbol', 'trading_date'] + INDICATOR_COLUMNS)
+        bulk_merge(conn, table, ['symbol', 'trading_date'] + INDICATOR_COLUMNS, ['symbol', 'trading_date'],
+                   rows, extra_set={'updated_at': 'GETDATE()'})
+        # State last: if the run dies in between, the next run rewrites the same rows
+        save_states(conn, market, new_states)
+        written += len(rows)
+    if drifted:
+        # A reseed can leave the state values unchanged (e.g. only a high/low was revised),
+        # which bulk_merge would not stamp; stamp it so the same revision is not found again
+        cursor = conn.cursor()
+        for batch in chunks(sorted(drifted), SYMBOL_CHUNK):
+            cursor.execute(f"UPDATE {state_table} SET updated_at = GETDATE() "
+                           f"WHERE market = ? AND symbol IN ({', '.join('?' for _ in batch)})", market, *batch)
+        conn.commit()
+    logger.info(f"{table}: {written} indicator row(s) written")
+    refresh_signals(conn, market, changed_since=None if full else started)
+    if market in SNAPSHOT_MARKETS:
+        refresh_snapshot(conn, market, changed_since=None if full else started)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Materialize technical indicators per market')
+    parser.add_argument('--market', nargs='+', choices=sorted(MARKETS), default=sorted(MARKETS),
+                        help='Markets to update (default: all)')
+    parser.add_argument('--full', action='store_true', help='Recompute the full history')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "indicator_engine.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        for market in args.market:
+            update_indicators(conn, market, full=args.full)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Latest Snapshot Table for Screening
+===================================
+One row per (market, ticker) with the latest close, the key indicators, the latest
+fundamentals and the sector/industry from the master table, so screens like
+
+    SELECT ticker FROM latest_snapshot
+    WHERE market = 'nse' AND sector = 'Technology' AND rsi_14 < 30 AND close_price > sma_200
+
+read ~4,000 narrow rows (or a filtered index) instead of windowing the hist tables.
+
+    market   master          indicators              fundamentals
+    nse      nse_500         nse_500_indicators      nse_500_fundamentals
+    nasdaq   nasdaq_top100   nasdaq_100_indicators   nasdaq_100_fundamentals
+
+Maintained by the ETL with one set-based MERGE per market:
+    - indicator_engine.update_indicators refreshes the tickers whose indicator rows it wrote
+    - get_fundamental_data.py refreshes the tickers fetched in its run
+Rows only change (and bump updated_at) when a value actually changed, so updated_at is the
+"changed since" marker for screener.py. A full refresh also removes tickers that left the
+master table or were retired (process_flag 'N').
+
+Usage:
+    python latest_snapshot.py                  # Full refresh, both markets
+    python latest_snapshot.py --market nse
+"""
+
+import argparse
+import logging
+import os
+
+import pyodbc
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+snapshot_table = "latest_snapshot"
+MARKETS = {
+    'nse': {'master_table': 'nse_500', 'indicator_table': 'nse_500_indicators',
+            'fundamentals_table': 'nse_500_fundamentals', 'hist_table': 'nse_500_hist_data'},
+    'nasdaq': {'master_table': 'nasdaq_top100', 'indicator_table': 'nasdaq_100_indicators',
+               'fundamentals_table': 'nasdaq_100_fundamentals', 'hist_table': 'nasdaq_100_hist_data'},
+}
+
+INDICATOR_COLUMNS = ['close_price', 'sma_20', 'sma_50', 'sma_200', 'ema_20', 'ema_50', 'rsi_14',
+                     'macd', 'macd_signal', 'macd_hist', 'bb_upper', 'bb_lower', 'atr_14']
+FUNDAMENTAL_COLUMNS = ['market_cap', 'trailing_pe', 'forward_pe', 'price_to_book', 'peg_ratio',
+                       'profit_margin', 'return_on_equity', 'revenue_growth', 'earnings_growth',
+                       'dividend_yield', 'debt_to_equity', 'beta', 'fifty_two_week_high', 'fifty_two_week_low']
+# Every column the MERGE maintains, in table order (keys first)
+SNAPSHOT_COLUMNS = (['market', 'ticker', 'company', 'sector', 'industry', 'trading_date']
+                    + INDICATOR_COLUMNS[:1] + ['prev_close', 'daily_change_pct', 'volume']
+                    + INDICATOR_COLUMNS[1:] + ['fundamentals_date'] + FUNDAMENTAL_COLUMNS)
+
+CREATE_SNAPSHOT_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{snapshot_table}')
+BEGIN
+    CREATE TABLE {snapshot_table} (
+        market VARCHAR(10) NOT NULL,
+        ticker VARCHAR(50) NOT NULL,
+        company VARCHAR(255) NULL,
+        sector VARCHAR(100) NULL,
+        industry VARCHAR(150) NULL,
+        trading_date DATE NULL,                 -- Session of the price / indicator columns
+        close_price FLOAT NULL,
+        prev_close FLOAT NULL,
+        daily_change_pct FLOAT NULL,
+        volume BIGINT NULL,
+        {', '.join(f'{c} FLOAT NULL' for c in INDICATOR_COLUMNS[1:])},
+        fundamentals_date DATE NULL,            -- fetch_date of the fundamentals columns
+        market_cap BIGINT NULL,
+        {', '.join(f'{c} FLOAT NULL' for c in FUNDAMENTAL_COLUMNS[1:])},
+        updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_{snapshot_table} PRIMARY KEY CLUSTERED (market, ticker)
+    );
+    -- Sector screens, and the common oversold / overbought / trend predicates
+    CREATE NONCLUSTERED INDEX IX_{snapshot_table}_sector ON {snapshot_table} (market, sector)
+        INCLUDE (close_price, sma_50, sma_200, rsi_14, market_cap, trailing_pe);
+    CREATE NONCLUSTERED INDEX IX_{snapshot_table}_oversold ON {snapshot_table} (market, rsi_14)
+        INCLUDE (close_price, sma_200, sector) WHERE rsi_14 < 30;
+    CREATE NONCLUSTERED INDEX IX_{snapshot_table}_overbought ON {snapshot_table} (market, rsi_14)
+        INCLUDE (close_price, sma_200, sector) WHERE rsi_14 > 70;
+    CREATE NONCLUSTERED INDEX IX_{snapshot_table}_market_cap ON {snapshot_table} (market, market_cap)
+        INCLUDE (close_price, rsi_14, sector, trailing_pe);
+    CREATE NONCLUSTERED INDEX IX_{snapshot_table}_updated ON {snapshot_table} (updated_at);
+END
+"""
+
+
+def ensure_snapshot_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(CREATE_SNAPSHOT_SQL)
+    conn.commit()
+
+
+def snapshot_merge_sql(market, incremental):
+    """
+    MERGE of the market's current state into latest_snapshot. Latest indicator row and
+    fundamentals per ticker are TOP 1 seeks on their (ticker, date) primary keys.
+    incremental=True limits the source to tickers with indicator rows written at/after the
+    first parameter or fundamentals fetched on/after its date; otherwise stale tickers are deleted.
+    """
+    config = MARKETS[market]
+    ind, fund = config['indicator_table'], config['fundamentals_table']
+    scope = f"""
+        AND m.ticker IN (
+            SELECT symbol FROM {ind} WHERE updated_at >= ?
+            UNION
+            SELECT ticker FROM {fund} WHERE fetch_date >= CAST(? AS DATE)
+        )""" if incremental else ""
+    value_columns = [c for c in SNAPSHOT_COLUMNS if c not in ('market', 'ticker')]
+    change_check = (f"EXISTS (SELECT {', '.join(f's.{c}' for c in value_columns)} "
+                    f"EXCEPT SELECT {', '.join(f't.{c}' for c in value_columns)})")
+    delete_stale = (f"WHEN NOT MATCHED BY SOURCE AND t.market = '{market}' THEN\n    DELETE\n"
+                    if not incremental else "")
+    return f"""
+WITH snapshot_source AS (
+    SELECT
+        '{market}' AS market,
+        m.ticker,
+        m.company_name AS company,
+        m.sector,
+        m.industry,
+        i.trading_date,
+        i.close_price,
+        p.close_price AS prev_close,
+        (i.close_price - p.close_price) / NULLIF(p.close_price, 0) * 100 AS daily_change_pct,
+        v.volume,
+        {', '.join(f'i.{c}' for c in INDICATOR_COLUMNS[1:])},
+        f.fetch_date AS fundamentals_date,
+        {', '.join(f'f.{c}' for c in FUNDAMENTAL_COLUMNS)}
+    FROM {config['master_table']} AS m
+    OUTER APPLY (
+        SELECT TOP 1 trading_date, {', '.join(INDICATOR_COLUMNS)}
+        FROM {ind} WHERE symbol = m.ticker ORDER BY trading_date DESC
+    ) AS i
+    OUTER APPLY (
+        SELECT TOP 1 close_price FROM {ind}
+        WHERE symbol = m.ticker AND trading_date < i.trading_date ORDER BY trading_date DESC
+    ) AS p
+    OUTER APPLY (
+        SELECT TOP 1 TRY_CAST(TRY_CAST(volume AS FLOAT) AS BIGINT) AS volume FROM {config['hist_table']}
+        WHERE ticker = m.ticker AND trading_date = i.trading_date
+    ) AS v
+    OUTER APPLY (
+        SELECT TOP 1 fetch_date, {', '.join(FUNDAMENTAL_COLUMNS)}
+        FROM {fund} WHERE ticker = m.ticker ORDER BY fetch_date DESC
+    ) AS f
+    WHERE m.ticker IS NOT NULL AND ISNULL(m.process_flag, 'Y') <> 'N'{scope}
+)
+MERGE {snapshot_table} AS t
+USING snapshot_source AS s
+    ON t.market = s.market AND t.ticker = s.ticker
+WHEN MATCHED AND {change_check} THEN
+    UPDATE SET {', '.join(f'{c} = s.{c}' for c in value_columns)}, updated_at = GETDATE()
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT ({', '.join(SNAPSHOT_COLUMNS)}, updated_at)
+    VALUES ({', '.join(f's.{c}' for c in SNAPSHOT_COLUMNS)}, GETDATE())
+{delete_stale}OUTPUT $action;
+"""
+
+
+def refresh_snapshot(conn, market, changed_since=None):
+    """
+    Refresh `market`'s latest_snapshot rows. changed_since (SQL Server clock) limits the
+    refresh to tickers whose indicators or fundamentals were written since then; None
+    refreshes every master ticker. Returns (inserted, updated, deleted).
+    """
+    ensure_snapshot_table(conn)
+    cursor = conn.cursor()
+    if changed_since is None:
+        cursor.execute(snapshot_merge_sql(market, incremental=False))
+    else:
+        cursor.execute(snapshot_merge_sql(market, incremental=True), changed_since, changed_since)
+    actions = [row[0] for row in cursor.fetchall()]
+    conn.commit()
+    counts = actions.count('INSERT'), actions.count('UPDATE'), actions.count('DELETE')
+    logger.info(f"{snapshot_table} ({market}): {counts[0]} inserted, {counts[1]} updated, {counts[2]} deleted")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the latest_snapshot screening table')
+    parser.add_argument('--market', nargs='+', choices=sorted(MARKETS), default=sorted(MARKETS),
+                        help='Markets to refresh (default: all)')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "latest_snapshot.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        for market in args.market:
+            refresh_snapshot(conn, market)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
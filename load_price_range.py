@@ -0,0 +1,239 @@
+"""
+Batched Price Range Loader
+==========================
+Loads daily bars for a date range and a whole symbol set in one threaded
+yf.download call, then writes them with a single staged MERGE per table
+(sql_loader.bulk_merge) instead of a SELECT/UPDATE/INSERT round trip per row.
+
+Markets:
+    fx      forex_master (active, sourced pairs)  -> forex_hist_data (data_source 'yfinance',
+                                                     then previous_close / daily_change refresh)
+    nasdaq  nasdaq_top100                         -> nasdaq_100_hist_data
+    nse     nse_500                               -> nse_500_hist_data
+
+Equity prices are stored as strings, matching the VARCHAR columns the daily loaders write.
+
+Usage:
+    python load_price_range.py --market fx --start 2025-01-01 --end 2025-12-31
+    python load_price_range.py --market fx --start 2025-12-05 --end 2025-12-07 --symbols EURUSD GBPUSD
+    python load_price_range.py --market nse --start 2026-03-02 --end 2026-03-06 --symbols RELIANCE.NS
+    python load_price_range.py --market nasdaq --start 2026-03-02 --end 2026-03-06 --insert-only
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pyodbc
+import yfinance as yf
+
+from forex_store import fill_daily_changes, is_weekday, upsert_bars
+from sql_loader import bulk_merge, server_time
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+MARKETS = {
+    'fx': {'source_table': 'forex_master', 'target_table': 'forex_hist_data'},
+    'nasdaq': {'source_table': 'nasdaq_top100', 'target_table': 'nasdaq_100_hist_data'},
+    'nse': {'source_table': 'nse_500', 'target_table': 'nse_500_hist_data'},
+}
+
+EQUITY_COLUMNS = [
+    'ticker', 'trading_date', 'open_price', 'high_price', 'low_price', 'close_price',
+    'volume', 'dividend', 'stocksplit', 'company',
+]
+
+
+def load_symbols(conn, market, symbols=None):
+    """
+    Symbol set for a market, optionally restricted to `symbols` (bound as parameters).
+
+    fx     -> list of (symbol, currency_from, currency_to, yfinance_symbol)
+    equity -> list of (ticker, company_name)
+    """
+    source_table = MARKETS[market]['source_table']
+    if market == 'fx':
+        query = f"""
+            SELECT symbol, currency_from, currency_to, yfinance_symbol
+            FROM {source_table}
+            WHERE is_active = 'Y' AND ISNULL(source_type, 'sourced') = 'sourced'
+        """
+        key = 'symbol'
+    else:
+        # Tickers retired by reconcile_universe.py (process_flag 'N') are no longer loaded
+        query = f"SELECT ticker, company_name FROM {source_table} WHERE ISNULL(process_flag, 'Y') <> 'N'"
+        key = 'ticker'
+    params = []
+    if symbols:
+        query += f" AND {key} IN ({', '.join('?' for _ in symbols)})"
+        params = list(symbols)
+    cursor = conn.cursor()
+    cursor.execute(query + f" ORDER BY {key}", params)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def download_range(yf_symbols, start_date, end_date):
+    """
+    One threaded yf.download for all symbols over [start_date, end_date] (inclusive).
+
+    Returns {yf_symbol: DataFrame indexed by trading date} for symbols with data.
+    """
+    data = yf.download(
+        yf_symbols,
+        start=start_date.strftime('%Y-%m-%d'),
+        end=(end_date + timedelta(days=1)).strftime('%Y-%m-%d'),  # yfinance end is exclusive
+        interval='1d',
+        group_by='ticker',
+        auto_adjust=True,
+        actions=True,
+        threads=True,
+        progress=False,
+    )
+    if data is None or data.empty:
+        return {}
+
+    frames = {}
+    for yf_symbol in yf_symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if yf_symbol not in data.columns.get_level_values(0):
+                continue
+            frame = data[yf_symbol]
+        else:
+            frame = data  # single symbol without a ticker level
+        frame = frame.dropna(subset=['Close'])
+        if frame.empty:
+            continue
+        index = pd.DatetimeIndex(frame.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        frames[yf_symbol] = frame.set_axis(index.date)
+    return frames
+
+
+def as_text(value, integer=False):
+    """Equity tables store prices as VARCHAR; keep the str() form the adhoc loaders write."""
+    if pd.isna(value):
+        return None
+    return str(int(value)) if integer else str(float(value))
+
+
+def fx_bars(pairs, frames):
+    """forex_store bars for every downloaded pair (weekday trading dates only, as the daily loader)."""
+    bars = []
+    for symbol, c_from, c_to, yf_symbol in pairs:
+        frame = frames.get(yf_symbol)
+        if frame is None:
+            continue
+        for trading_date, row in frame.iterrows():
+            if not is_weekday(trading_date):
+                continue
+            bars.append({
+                'symbol': symbol, 'currency_from': c_from, 'currency_to': c_to,
+                'trading_date': trading_date,
+                'open_price': row['Open'], 'high_price': row['High'],
+                'low_price': row['Low'], 'close_price': row['Close'],
+                'volume': int(row['Volume']) if pd.notna(row['Volume']) else 0,
+            })
+    return bars
+
+
+def equity_rows(tickers, frames):
+    """Rows in EQUITY_COLUMNS order for every downloaded ticker."""
+    rows = []
+    for ticker, company in tickers:
+        frame = frames.get(ticker)
+        if frame is None:
+            continue
+        for trading_date, row in frame.iterrows():
+            rows.append((
+                ticker, trading_date,
+                as_text(row['Open']), as_text(row['High']), as_text(row['Low']), as_text(row['Close']),
+                as_text(row['Volume'], integer=True),
+                as_text(row.get('Dividends', 0.0)), as_text(row.get('Stock Splits', 0.0)),
+                company,
+            ))
+    return rows
+
+
+def load_range(conn, market, start_date, end_date, symbols=None, overwrite=True):
+    """
+    Download and upsert one market's daily bars for [start_date, end_date].
+
+    overwrite=False only inserts missing (symbol, trading_date) rows.
+    Returns (inserted, updated, missing_symbols).
+    """
+    universe = load_symbols(conn, market, symbols)
+    if not universe:
+        logger.warning("No %s symbols matched %s", market, symbols or 'the master table')
+        return 0, 0, []
+
+    if market == 'fx':
+        yf_symbols = [pair[3] for pair in universe]
+    else:
+        yf_symbols = [ticker for ticker, _ in universe]
+    logger.info("Downloading %d %s symbol(s) from %s to %s", len(yf_symbols), market, start_date, end_date)
+    frames = download_range(yf_symbols, start_date, end_date)
+    missing = [s for s in yf_symbols if s not in frames]
+    if missing:
+        logger.warning("No data for %d symbol(s): %s", len(missing), ', '.join(missing))
+
+    if market == 'fx':
+        run_started = server_time(conn)
+        inserted, updated = upsert_bars(conn, fx_bars(universe, frames), data_source='yfinance',
+                                        mode='overwrite' if overwrite else 'insert')
+        fill_daily_changes(conn, since=run_started)
+    else:
+        rows = equity_rows(universe, frames)
+        inserted, updated = bulk_merge(conn, MARKETS[market]['target_table'], EQUITY_COLUMNS,
+                                       ['ticker', 'trading_date'], rows,
+                                       mode='overwrite' if overwrite else 'insert')
+    return inserted, updated, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load daily bars for a date range in one batched download')
+    parser.add_argument('--market', required=True, choices=sorted(MARKETS), help='Market to load')
+    parser.add_argument('--start', required=True, help='First trading date (YYYY-MM-DD)')
+    parser.add_argument('--end', required=True, help='Last trading date, inclusive (YYYY-MM-DD)')
+    parser.add_argument('--symbols', nargs='+', metavar='SYMBOL',
+                        help='Restrict to these master symbols/tickers (default: whole market)')
+    parser.add_argument('--insert-only', action='store_true', help='Skip rows that already exist')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "load_price_range.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    start_date = datetime.strptime(args.start, '%Y-%m-%d').date()
+    end_date = datetime.strptime(args.end, '%Y-%m-%d').date()
+    if start_date > end_date:
+        parser.error('--start must not be after --end')
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        inserted, updated, missing = load_range(conn, args.market, start_date, end_date,
+                                                symbols=args.symbols, overwrite=not args.insert_only)
+    finally:
+        conn.close()
+    logger.info("%s %s..%s: %d inserted, %d updated, %d symbol(s) without data",
+                args.market, start_date, end_date, inserted, updated, len(missing))
+
+
+if __name__ == '__main__':
+    main()
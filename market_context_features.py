@@ -0,0 +1,279 @@
+"""
+Market Context Regime Features
+==============================
+Vectorized multi-horizon features computed from the closes in market_context_long,
+for every registered series at once (one DataFrame op per feature, no per-ticker loops):
+
+    ret_5d / ret_20d / ret_60d     - % return over 5/20/60 sessions
+    rvol_20d / rvol_60d            - annualized realized volatility (% , log returns)
+    pct_rank_252d                  - 1-year percentile rank of the level (volatility series)
+    term_ratio                     - VIX / VIX3M (>1 = inverted term structure)
+    rel_strength_20d               - 20-session % change of sector / benchmark ratio
+    corr_60d                       - 60-session correlation of sector vs benchmark returns
+
+Sector benchmarks come from market_context_series.benchmark (sp500 for US ETFs,
+nifty50 for India sector indices). Results are stored long in market_context_features
+(series, feature, trading_date, value) and pivoted by the view market_context_features_v,
+so the NASDAQ/NSE/Forex pipelines read them instead of recomputing rolling windows.
+
+Incremental: only the last RECOMPUTE_DAYS before the newest stored feature date are
+rewritten (closes loaded with a WARMUP_DAYS window); unchanged values are not touched.
+
+Usage:
+    python market_context_features.py           # Incremental (also run by get_market_context_daily.py)
+    python market_context_features.py --full    # Recompute all history (e.g. after backfilling a new series)
+"""
+
+import pandas as pd
+import numpy as np
+import pyodbc
+import argparse
+import logging
+import os
+from datetime import timedelta
+from sql_loader import bulk_merge, frame_to_rows
+
+# ============================================================
+# Configuration
+# ============================================================
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+registry_table = "market_context_series"
+long_table = "market_context_long"
+features_table = "market_context_features"
+features_view = "market_context_features_v"
+
+logger = logging.getLogger(__name__)
+
+RETURN_HORIZONS = (5, 20, 60)
+VOL_WINDOWS = (20, 60)
+PCT_RANK_WINDOW = 252
+REL_STRENGTH_WINDOW = 20
+CORR_WINDOW = 60
+ANNUALIZATION = 252
+
+# Volatility series -> longer-dated series for the term-structure ratio
+TERM_PAIRS = {'vix': 'vix3m'}
+
+# Sessions a close is carried over the other market's holidays, so US and India
+# series share one date axis for the cross-series features (rel_strength, corr).
+# Per-series features are computed on each series' own sessions; all features are
+# only emitted on a series' own sessions.
+HOLIDAY_FILL_LIMIT = 5
+
+# Calendar days of closes loaded before the rewrite window (> PCT_RANK_WINDOW sessions)
+WARMUP_DAYS = 400
+# Trailing days recomputed on each run (latest sessions may have been provisional)
+RECOMPUTE_DAYS = 7
+
+FEATURE_COLUMNS = ['series', 'feature', 'trading_date', 'value']
+
+CREATE_FEATURES_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{features_table}')
+BEGIN
+    CREATE TABLE {features_table} (
+        series VARCHAR(50) NOT NULL,
+        feature VARCHAR(30) NOT NULL,
+        trading_date DATE NOT NULL,
+        value FLOAT NULL,
+        computed_at DATETIME DEFAULT GETDATE(),
+        CONSTRAINT PK_{features_table} PRIMARY KEY CLUSTERED (series, feature, trading_date)
+    );
+
+    CREATE INDEX IX_{features_table}_date ON {features_table} (trading_date) INCLUDE (series, feature, value);
+END
+"""
+
+# ============================================================
+# Functions
+# ============================================================
+
+def ensure_features_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(CREATE_FEATURES_SQL)
+    conn.commit()
+
+
+def read_registry(conn):
+    """Active series from the registry: {series: (category, benchmark)}."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT series, category, benchmark FROM {registry_table} WHERE is_active = 'Y'")
+    return {series: (category, benchmark) for series, category, benchmark in cursor.fetchall()}
+
+
+def load_closes(conn, start_date=None):
+    """Closes from the long store as a wide frame (trading_date x series)."""
+    sql = f"SELECT trading_date, series, value FROM {long_table} WHERE metric = 'close'"
+    params = []
+    if start_date is not None:
+        sql += " AND trading_date >= ?"
+        params.append(start_date)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    df = pd.DataFrame.from_records(cursor.fetchall(), columns=['trading_date', 'series', 'value'])
+    if df.empty:
+        return pd.DataFrame()
+    closes = df.pivot(index='trading_date', columns='series', values='value')
+    closes.index = pd.to_datetime(closes.index)
+    return closes.sort_index().astype(float)
+
+
+def on_own_sessions(closes, func):
+    """Apply func to each series' own traded closes (no holiday fill), realigned to the union date axis."""
+    return pd.DataFrame({s: func(closes[s].dropna()) for s in closes.columns}, index=closes.index)
+
+
+def log_returns(close):
+    return np.log(close.where(close > 0)).diff()
+
+
+def compute_features(closes, registry):
+    """
+    Compute every feature over the whole closes frame. Returns a long DataFrame
+    (series, feature, trading_date, value) restricted to each series' trading sessions.
+    """
+    closes = closes[[s for s in closes.columns if s in registry]]
+    traded = closes.notna()
+    aligned = closes.ffill(limit=HOLIDAY_FILL_LIMIT)
+    log_ret = log_returns(aligned)
+
+    # Returns, volatility and ranks count sessions of the series itself, so another
+    # market's holiday neither shortens the horizon nor adds a zero return
+    features = {}
+    for h in RETURN_HORIZONS:
+        features[f'ret_{h}d'] = on_own_sessions(closes, lambda c, h=h: c.pct_change(h, fill_method=None) * 100)
+    for w in VOL_WINDOWS:
+        features[f'rvol_{w}d'] = on_own_sessions(
+            closes, lambda c, w=w: log_returns(c).rolling(w, min_periods=w).std() * np.sqrt(ANNUALIZATION) * 100
+        )
+
+    vol_series = [s for s in closes.columns if registry[s][0] == 'volatility']
+    if vol_series:
+        features[f'pct_rank_{PCT_RANK_WINDOW}d'] = on_own_sessions(
+            closes[vol_series], lambda c: c.rolling(PCT_RANK_WINDOW, min_periods=PCT_RANK_WINDOW).rank(pct=True)
+        )
+
+    term = {s: aligned[s] / aligned[long_s] for s, long_s in TERM_PAIRS.items()
+            if s in aligned.columns and long_s in aligned.columns}
+    if term:
+        features['term_ratio'] = pd.DataFrame(term)
+
+    # Sector vs benchmark: benchmark columns re-labelled with the sector names so the
+    # frame ops line up column-by-column
+    pairs = {s: b for s, (_, b) in registry.items()
+             if b and s in aligned.columns and b in aligned.columns}
+    if pairs:
+        sectors = list(pairs)
+        bench_close = aligned[list(pairs.values())].set_axis(sectors, axis=1)
+        bench_ret = log_ret[list(pairs.values())].set_axis(sectors, axis=1)
+        ratio = aligned[sectors] / bench_close
+        features[f'rel_strength_{REL_STRENGTH_WINDOW}d'] = ratio.pct_change(REL_STRENGTH_WINDOW, fill_method=None) * 100
+        features[f'corr_{CORR_WINDOW}d'] = (
+            log_ret[sectors].rolling(CORR_WINDOW, min_periods=CORR_WINDOW).corr(bench_ret)
+        )
+
+    parts = []
+    for name, frame in features.items():
+        frame = frame.replace([np.inf, -np.inf], np.nan).where(traded[frame.columns])
+        cells = frame.stack().dropna()
+        if cells.empty:
+            continue
+        parts.append(pd.DataFrame({
+            'series': cells.index.get_level_values(1),
+            'feature': name,
+            'trading_date': cells.index.get_level_values(0).date,
+            'value': cells.values,
+        }))
+    if not parts:
+        return pd.DataFrame(columns=FEATURE_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def ensure_features_view(conn):
+    """(Re)generate market_context_features_v: one <series>_<feature> column per stored pair."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT DISTINCT series, feature FROM {features_table} ORDER BY series, feature")
+    pairs = cursor.fetchall()
+    if not pairs:
+        return
+    select_cols = ',\n    '.join(
+        f"MAX(CASE WHEN series = '{series}' AND feature = '{feature}' THEN value END) AS {series}_{feature}"
+        for series, feature in pairs
+    )
+    cursor.execute(f"""
+CREATE OR ALTER VIEW {features_view} AS
+SELECT
+    trading_date,
+    {select_cols}
+FROM {features_table}
+GROUP BY trading_date
+""")
+    conn.commit()
+    logger.info(f"View '{features_view}' regenerated with {len(pairs)} columns")
+
+
+def update_features(conn, full=False, since=None):
+    """
+    Recompute and upsert regime features (incremental unless full=True).
+    since: also rewrite features from this date (closes corrected before the usual window).
+    """
+    ensure_features_table(conn)
+    registry = read_registry(conn)
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT MAX(trading_date) FROM {features_table}")
+    last_date = cursor.fetchone()[0]
+
+    if full or last_date is None:
+        write_from = None
+        closes = load_closes(conn)
+        logger.info("Features: full recompute")
+    else:
+        write_from = last_date - timedelta(days=RECOMPUTE_DAYS)
+        if since is not None:
+            write_from = min(write_from, since)
+        closes = load_closes(conn, write_from - timedelta(days=WARMUP_DAYS))
+        logger.info(f"Features: incremental from {write_from} (last feature date {last_date})")
+
+    if closes.empty:
+        logger.warning(f"No closes in {long_table}; skipping features")
+        return
+
+    features = compute_features(closes, registry)
+    if write_from is not None:
+        features = features[features['trading_date'] >= write_from]
+
+    bulk_merge(conn, features_table, FEATURE_COLUMNS, ['series', 'feature', 'trading_date'],
+               frame_to_rows(features, FEATURE_COLUMNS), extra_set={'computed_at': 'GETDATE()'})
+    ensure_features_view(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute market context regime features')
+    parser.add_argument('--full', action='store_true', help='Recompute features for all stored history')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "market_context_features.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    update_features(conn, full=args.full)
+    conn.close()
+    logger.info("Market context features complete!")
+
+
+if __name__ == '__main__':
+    main()
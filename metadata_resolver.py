@@ -0,0 +1,193 @@
+"""
+Ticker metadata resolver
+========================
+Resolves company_name / sector / industry / sub_industry for many tickers at once:
+
+    - yfinance `.info` calls run on a thread pool, all drawing from one thread-safe
+      token bucket (YF_MAX_RPS requests/second), instead of serially with fixed sleeps
+    - results are cached on disk (JSON, keyed by ticker) for TTL days; tickers yfinance has
+      no name for are cached for a day so reruns don't hammer dead symbols
+    - rate-limit errors back off and retry; failed fetches are returned separately and not cached
+    - the cache is saved every `progress_every` completions and on exit (also on errors / Ctrl-C)
+
+add_missing_tickers.py and fix_tbd_names.py resolve through it and write the results
+with one bulk MERGE per table (sql_loader.bulk_merge).
+
+Usage:
+    from metadata_resolver import resolve_metadata
+    metadata, failures = resolve_metadata(['AAPL', 'RELIANCE.NS'])
+    metadata['AAPL']   # {'company_name': 'Apple Inc.', 'sector': ..., 'industry': ..., 'sub_industry': ...} or None
+    failures           # {ticker: 'error text'} for fetches that raised (not in metadata)
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+CACHE_PATH = os.getenv("TICKER_METADATA_CACHE", os.path.join("cache", "ticker_metadata.json"))
+CACHE_TTL_DAYS = 30
+MISS_TTL_DAYS = 1          # tickers yfinance returned no name for
+DEFAULT_MAX_RPS = float(os.getenv("YF_MAX_RPS", "5"))
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 3
+BACKOFF_SECONDS = 5.0      # 5s, 10s between attempts after a rate-limit error
+
+
+class RateLimiter:
+    """Thread-safe token bucket: at most `rate` acquisitions per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# One bucket per process, shared by every resolver call
+yf_limiter = RateLimiter(DEFAULT_MAX_RPS)
+
+
+class MetadataCache:
+    """{ticker: {'fetched_at': iso, 'metadata': {...} | None}} persisted as JSON."""
+
+    def __init__(self, path=CACHE_PATH, ttl_days=CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl = timedelta(days=ttl_days)
+        self.miss_ttl = timedelta(days=min(MISS_TTL_DAYS, ttl_days))
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable metadata cache {path}: {e}")
+
+    def get(self, ticker):
+        """(hit, metadata) - hit is False when the ticker is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(ticker)
+        if not entry:
+            return False, None
+        age = datetime.now() - datetime.fromisoformat(entry['fetched_at'])
+        if age > (self.ttl if entry['metadata'] else self.miss_ttl):
+            return False, None
+        return True, entry['metadata']
+
+    def put(self, ticker, metadata):
+        with self._lock:
+            self._entries[ticker] = {'fetched_at': datetime.now().isoformat(timespec='seconds'),
+                                     'metadata': metadata}
+
+    def save(self):
+        with self._lock:
+            snapshot = dict(self._entries)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)  # never leave a half-written cache behind
+
+
+def is_rate_limited(exc):
+    text = f"{type(exc).__name__} {exc}".lower()
+    return 'ratelimit' in text or 'too many requests' in text or '429' in text
+
+
+def fetch_metadata(ticker, limiter=None):
+    """yfinance .info -> metadata dict, or None when yfinance has no name for the ticker. Raises on fetch errors."""
+    limiter = limiter or yf_limiter
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.acquire()
+        try:
+            info = yf.Ticker(ticker).info
+            break
+        except Exception as e:
+            if is_rate_limited(e) and attempt < MAX_ATTEMPTS:
+                wait = BACKOFF_SECONDS * 2 ** (attempt - 1)
+                logger.warning(f"{ticker}: rate limited, retry {attempt}/{MAX_ATTEMPTS - 1} in {wait:.0f}s")
+                time.sleep(wait)
+                continue
+            raise
+
+    name = info.get('longName') or info.get('shortName')
+    if not name:
+        return None
+    return {
+        'company_name': name,
+        'sector': info.get('sector') or None,
+        'industry': info.get('industry') or None,
+        'sub_industry': info.get('industryDisp') or info.get('industry') or None,
+    }
+
+
+def resolve_metadata(tickers, max_workers=DEFAULT_WORKERS, cache=None, refresh=False, progress_every=100):
+    """
+    Metadata for `tickers`: cached entries within their TTL are reused (unless refresh=True),
+    the rest are fetched concurrently under the shared rate limit.
+
+    Returns (metadata, failures): metadata is {ticker: dict, or None when yfinance has no name},
+    failures is {ticker: error text} for fetches that raised. The cache is saved every
+    `progress_every` completions and once more on the way out, so an interrupted run keeps
+    what it fetched.
+    """
+    cache = cache or MetadataCache()
+    results = {}
+    failures = {}
+    pending = []
+    for ticker in dict.fromkeys(tickers):
+        hit, metadata = (False, None) if refresh else cache.get(ticker)
+        if hit:
+            results[ticker] = metadata
+        else:
+            pending.append(ticker)
+    logger.info(f"Metadata: {len(results)} cached, {len(pending)} to fetch "
+                f"({max_workers} workers, {yf_limiter.rate:g} req/s)")
+
+    if pending:
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(fetch_metadata, ticker): ticker for ticker in pending}
+            for done, future in enumerate(as_completed(futures), start=1):
+                ticker = futures[future]
+                try:
+                    results[ticker] = future.result()
+                    cache.put(ticker, results[ticker])
+                except Exception as e:
+                    logger.warning(f"{ticker}: metadata fetch failed: {e}")
+                    failures[ticker] = f"{type(e).__name__}: {e}"
+                if progress_every and done % progress_every == 0:
+                    logger.info(f"Metadata: {done}/{len(pending)} fetched "
+                                f"({time.monotonic() - started:.0f}s)")
+                    cache.save()
+        finally:
+            # On Ctrl-C / errors: drop the queued fetches, keep everything fetched so far
+            executor.shutdown(wait=False, cancel_futures=True)
+            cache.save()
+    if failures:
+        logger.warning(f"Metadata: {len(failures)} fetch(es) failed")
+    return results, failures
@@ -0,0 +1,125 @@
+"""
+Asynchronous OANDA v20 candle client
+====================================
+Fetches candles for many instruments concurrently (aiohttp) under a token-bucket
+requests-per-second cap, instead of one blocking request per pair with a fixed sleep.
+Retries are per request: 429 honours Retry-After, timeouts / 5xx back off exponentially,
+401 / 404 fail fast.
+
+Usage:
+    from oanda_async import fetch_candles_many
+    results = fetch_candles_many(
+        {'EURUSD': ('EUR_USD', {'granularity': 'D', 'from': ..., 'to': ...})},
+        api_token, base_url, max_rps=100,
+    )
+    results['EURUSD']  # parsed JSON response, or None on failure
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# OANDA documents 120 req/s per token; stay below it by default
+DEFAULT_MAX_RPS = float(os.getenv("OANDA_MAX_RPS", "100"))
+MAX_CONNECTIONS = 20
+REQUEST_TIMEOUT = 30
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 1.0   # 1s, 2s, 4s between attempts
+
+
+class AsyncRateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursting up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def fetch_candles(session, limiter, base_url, instrument, params, label=None):
+    """GET /v3/instruments/{instrument}/candles with per-request retries. Returns JSON or None."""
+    label = label or instrument
+    url = f"{base_url}/v3/instruments/{instrument}/candles"
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await limiter.acquire()
+        try:
+            async with session.get(url, params=params) as response:
+                if response.status == 401:
+                    logger.error(f"OANDA 401 Unauthorized for {label} — check OANDA_API_TOKEN in .env")
+                    return None
+                if response.status == 404:
+                    logger.warning(f"OANDA 404 — instrument {instrument} not found or not supported on this account")
+                    return None
+                if response.status == 429 or response.status >= 500:
+                    retry_after = response.headers.get('Retry-After')
+                    wait = float(retry_after) if retry_after else BACKOFF_SECONDS * 2 ** (attempt - 1)
+                    logger.warning(f"OANDA {response.status} for {label}. Waiting {wait:.1f}s "
+                                   f"before retry {attempt}/{MAX_ATTEMPTS}...")
+                    await asyncio.sleep(wait)
+                    continue
+                response.raise_for_status()
+                return await response.json()
+        except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+            wait = BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning(f"Request failed for {label} ({type(e).__name__}, attempt {attempt}/{MAX_ATTEMPTS}); "
+                           f"retrying in {wait:.1f}s")
+            await asyncio.sleep(wait)
+        except Exception as e:
+            logger.error(f"Error fetching data for {label}: {e}")
+            return None
+
+    logger.error(f"All retries exhausted for {label}")
+    return None
+
+
+async def _fetch_all(jobs, api_token, base_url, max_rps):
+    limiter = AsyncRateLimiter(max_rps)
+    headers = {
+        'Authorization': f'Bearer {api_token}',
+        'Accept-Datetime-Format': 'RFC3339',
+    }
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout, connector=connector) as session:
+        keys = list(jobs)
+        responses = await asyncio.gather(*(
+            fetch_candles(session, limiter, base_url, jobs[key][0], jobs[key][1], label=key)
+            for key in keys
+        ))
+    return dict(zip(keys, responses))
+
+
+def fetch_candles_many(jobs, api_token, base_url, max_rps=DEFAULT_MAX_RPS):
+    """
+    Fetch candles for every job concurrently.
+
+    jobs : {key: (instrument, params)}
+    Returns {key: JSON dict or None}.
+    """
+    if not jobs:
+        return {}
+    started = time.monotonic()
+    results = asyncio.run(_fetch_all(jobs, api_token, base_url, max_rps))
+    ok = sum(1 for r in results.values() if r is not None)
+    logger.info(f"OANDA: {ok}/{len(jobs)} requests succeeded in {time.monotonic() - started:.2f}s "
+                f"(cap {max_rps:g} req/s)")
+    return results
@@ -0,0 +1,87 @@
+"""
+Local stand-in for the OANDA v20 pricing stream
+===============================================
+Serves /v3/accounts/<account>/pricing/stream with the same newline-delimited JSON
+format as OANDA (PRICE messages with bids/asks, HEARTBEAT every 5s), driven by a
+random walk per instrument. Used to test forex_price_stream.py without credentials.
+
+Usage:
+    python oanda_stream_standin.py --port 8765 --ticks-per-second 20
+    python forex_price_stream.py --stream-url http://127.0.0.1:8765 --pairs EURUSD USDJPY --dry-run
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+HEARTBEAT_SECONDS = 5
+START_PRICES = {'USD_JPY': 150.0, 'EUR_JPY': 163.0, 'GBP_JPY': 190.0}
+
+
+def stream_time():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f000Z')
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    ticks_per_second = 10
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if not url.path.endswith('/pricing/stream'):
+            self.send_error(404, 'Not found')
+            return
+        instruments = (parse_qs(url.query).get('instruments') or ['EUR_USD'])[0].split(',')
+        prices = {i: START_PRICES.get(i, 1.1) for i in instruments}
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.end_headers()
+
+        last_heartbeat = time.time()
+        try:
+            while True:
+                instrument = random.choice(instruments)
+                prices[instrument] *= 1 + random.gauss(0, 0.0001)
+                spread = prices[instrument] * 0.00005
+                message = {
+                    'type': 'PRICE',
+                    'instrument': instrument,
+                    'time': stream_time(),
+                    'tradeable': True,
+                    'bids': [{'price': f"{prices[instrument] - spread / 2:.5f}", 'liquidity': 1000000}],
+                    'asks': [{'price': f"{prices[instrument] + spread / 2:.5f}", 'liquidity': 1000000}],
+                }
+                self.wfile.write((json.dumps(message) + '\n').encode())
+                if time.time() - last_heartbeat >= HEARTBEAT_SECONDS:
+                    self.wfile.write((json.dumps({'type': 'HEARTBEAT', 'time': stream_time()}) + '\n').encode())
+                    last_heartbeat = time.time()
+                self.wfile.flush()
+                time.sleep(1 / self.ticks_per_second)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client disconnected
+
+    def log_message(self, format, *args):
+        print(f"[standin] {self.address_string()} {format % args}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in OANDA pricing stream server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--ticks-per-second', type=float, default=10)
+    args = parser.parse_args()
+
+    StreamHandler.ticks_per_second = args.ticks_per_second
+    httpd = ThreadingHTTPServer(('127.0.0.1', args.port), StreamHandler)
+    print(f"Stand-in pricing stream on http://127.0.0.1:{args.port} (Ctrl+C to stop)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,447 @@
+"""
+Universe Reconciliation
+=======================
+Keeps nasdaq_top100 / nse_500 in line with the scraped constituent lists, set-based:
+
+    1. stage    every source list goes into universe_staging (market, source, ticker, company_name):
+                  member lists  the constituent lists that define the universe (capped by rank /
+                                index membership), used for adds
+                  listings      full exchange listings, not capped by rank, used for removals
+    2. compute  with temp tables against the master table
+                  adds     member-listed tickers not in the master table
+                  removes  active master tickers in no member list and no full listing
+                  renames  a remove and an add with the same (normalized) company name,
+                           each unique on its side
+    3. apply    adds      -> inserted with yfinance metadata (metadata_resolver), process_flag='Y'
+                renames   -> new ticker inserted with the old row's name/sector/industry,
+                             old ticker retired at once
+                removes   -> universe_status.missed_runs + 1; after --retire-after consecutive
+                             misses process_flag flips to 'N', which the daily jobs skip
+                tickers that show up again reset their misses (and are reactivated if this
+                script retired them); every change is logged to universe_changes
+
+Source symbols are translated to the master tables' yfinance tickers through symbol_master,
+which is re-synced after each applied run. A ticker slipping out of the top 2000 or out of an
+index is still in its exchange listing, so only delisted tickers count misses. Misses and
+renames are not applied in a run where a listing returned nothing, reported a failed
+sub-fetch (an exchange of the screener) or staged over MAX_LISTING_DROP fewer symbols than the
+previous run (the renames' new tickers are added as plain adds), so an outage of one scraper
+cannot retire its half of the universe.
+
+    market   master          member lists                                     full listings
+    nasdaq   nasdaq_top100   nasdaq.com screener (top 2000), Wikipedia         nasdaq.com screener (all rows)
+                             S&P 500, Wikipedia Russell 1000
+    nse      nse_500         NSE index / all-equity APIs                       NSE EQUITY_L.csv
+
+Usage:
+    python reconcile_universe.py                           # both markets
+    python reconcile_universe.py --market nse --dry-run    # stage + report, change nothing
+    python reconcile_universe.py --retire-after 5
+"""
+
+import argparse
+import logging
+import os
+from io import StringIO
+
+import pandas as pd
+import pyodbc
+import requests
+
+from add_missing_tickers import fetch_nasdaq_screener, fetch_nasdaq_top2000, fetch_nse_equity_list, fetch_nse_top2000
+from metadata_resolver import resolve_metadata
+from sql_loader import bulk_merge
+from symbol_master import get_resolver, sync_symbol_master
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+staging_table = "universe_staging"
+status_table = "universe_status"
+changes_table = "universe_changes"
+RETIRE_AFTER = 3
+MAX_LISTING_DROP = 0.10    # a listing this much smaller than last run's is treated as a partial fetch
+MASTER_COLUMNS = ['ticker', 'company_name', 'process_flag', 'sector', 'industry', 'sub_industry']
+
+WIKI_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+# Company name -> comparison key (case, punctuation, spacing and legal suffixes ignored)
+NAME_KEY_SQL = ("UPPER(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE({col}, '.', ''), ',', ''), ' ', ''), "
+                "'Limited', 'Ltd'), 'Incorporated', 'Inc'), 'Corporation', 'Corp'), '&', 'and'))")
+
+CREATE_TABLES_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{staging_table}')
+    CREATE TABLE {staging_table} (
+        market VARCHAR(10) NOT NULL,
+        source VARCHAR(30) NOT NULL,
+        ticker VARCHAR(50) NOT NULL,
+        company_name VARCHAR(255) NULL,
+        staged_at DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_{staging_table} PRIMARY KEY CLUSTERED (market, ticker, source)
+    );
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{status_table}')
+    CREATE TABLE {status_table} (
+        market VARCHAR(10) NOT NULL,
+        ticker VARCHAR(50) NOT NULL,
+        missed_runs INT NOT NULL,                -- consecutive runs no source listed the ticker
+        first_missed DATETIME NOT NULL,
+        last_missed DATETIME NOT NULL,
+        retired_at DATETIME NULL,                -- set when this script flipped process_flag to 'N'
+        CONSTRAINT PK_{status_table} PRIMARY KEY CLUSTERED (market, ticker)
+    );
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{changes_table}')
+BEGIN
+    CREATE TABLE {changes_table} (
+        change_id INT IDENTITY(1,1) PRIMARY KEY,
+        market VARCHAR(10) NOT NULL,
+        change_type VARCHAR(12) NOT NULL,        -- add / rename / retire / reactivate
+        ticker VARCHAR(50) NOT NULL,
+        related_ticker VARCHAR(50) NULL,         -- rename: the new ticker
+        changed_at DATETIME NOT NULL DEFAULT GETDATE()
+    );
+    CREATE NONCLUSTERED INDEX IX_{changes_table}_ticker ON {changes_table} (market, ticker);
+END
+"""
+
+
+# ─── Sources ──────────────────────────────────────────────────────────
+def fetch_wikipedia_symbols(url, name_column, min_rows):
+    """{symbol: company} from the first Wikipedia table with a Symbol column and >= min_rows rows."""
+    resp = requests.get(url, headers=WIKI_HEADERS, timeout=15)
+    resp.raise_for_status()
+    for table in pd.read_html(StringIO(resp.text)):
+        if 'Symbol' in table.columns and len(table) >= min_rows:
+            names = table[name_column] if name_column in table.columns else pd.Series(None, index=table.index)
+            return {str(sym).strip(): (None if pd.isna(name) else str(name).strip())
+                    for sym, name in zip(table['Symbol'], names)
+                    if str(sym).strip() and str(sym) != 'nan' and len(str(sym).strip()) <= 10}
+    raise ValueError(f"No symbol table with {min_rows}+ rows at {url}")
+
+
+def with_names(fetch):
+    """Adapt add_missing_tickers' scrapers to ({symbol: company}, [failed sub-fetches])."""
+    def source():
+        names, errors = {}, []
+        return {ticker: names.get(ticker) for ticker in fetch(names, errors)}, errors
+    return source
+
+
+def complete(fetch):
+    """Adapt a single-request fetch (raises on failure) to ({symbol: company}, [])."""
+    return lambda: (fetch(), [])
+
+
+def nasdaq_listing(names, errors):
+    return {symbol for symbol, _ in fetch_nasdaq_screener(names, errors)}
+
+
+def nse_listing(names, errors):
+    return fetch_nse_equity_list(names)
+
+
+MARKETS = {
+    'nasdaq': {
+        'master_table': 'nasdaq_top100',
+        # source: (fetch, symbol format of the source - see symbol_master.py)
+        'sources': {
+            'nasdaq_screener': (with_names(fetch_nasdaq_top2000), 'nasdaq_screener'),
+            'wikipedia_sp500': (complete(lambda: fetch_wikipedia_symbols(
+                "https://en.wikipedia.org/wiki/List_of_S%26P_500_companies", 'Security', 400)), 'canonical'),
+            'wikipedia_russell1000': (complete(lambda: fetch_wikipedia_symbols(
+                "https://en.wikipedia.org/wiki/Russell_1000_Index", 'Company', 500)), 'canonical'),
+        },
+        # Full listings (not capped by rank): a ticker only counts a miss when these lack it too
+        'listings': {
+            'nasdaq_listing': (with_names(nasdaq_listing), 'nasdaq_screener'),
+        },
+    },
+    'nse': {
+        'master_table': 'nse_500',
+        'sources': {
+            'nse_indices': (with_names(fetch_nse_top2000), 'yfinance'),
+        },
+        'listings': {
+            'nse_equity_list': (with_names(nse_listing), 'yfinance'),
+        },
+    },
+}
+
+
+# ─── Stage ────────────────────────────────────────────────────────────
+def ensure_tables(conn):
+    cursor = conn.cursor()
+    cursor.execute(CREATE_TABLES_SQL)
+    conn.commit()
+
+
+def stage_sources(conn, market):
+    """
+    Replace market's staged lists (member lists and full listings) with fresh scrapes,
+    translated to the master tables' yfinance symbols through the symbol master.
+    Returns {source: (symbols staged, symbols staged by the previous run or None, [errors])}.
+    """
+    symbols = get_resolver(conn)
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT source, COUNT(*) FROM {staging_table} WHERE market = ? GROUP BY source", market)
+    previous = dict(cursor.fetchall())
+    cursor.execute(f"DELETE FROM {staging_table} WHERE market = ?", market)
+    conn.commit()
+
+    report = {}
+    config = MARKETS[market]
+    for source, (fetch, symbol_format) in {**config['sources'], **config['listings']}.items():
+        try:
+            listed, errors = fetch()
+        except Exception as e:
+            logger.error(f"{market}/{source}: fetch failed: {e}")
+            listed, errors = {}, [str(e)]
+        if listed and errors:
+            logger.warning(f"{market}/{source}: {len(errors)} failed sub-fetch(es): {errors[:5]}")
+        tickers = {}
+        for symbol, name in listed.items():
+            tickers.setdefault(symbols.translate(symbol, symbol_format, 'yfinance', market), name)
+        rows = [(market, source, ticker, name) for ticker, name in tickers.items()]
+        bulk_merge(conn, staging_table, ['market', 'source', 'ticker', 'company_name'],
+                   ['market', 'ticker', 'source'], rows, mode='insert')
+        report[source] = (len(rows), previous.get(source), errors)
+        logger.info(f"{market}/{source}: {len(rows)} symbols staged (previous run: {previous.get(source, '-')})")
+    return report
+
+
+def listing_problems(market, report):
+    """Reasons the full listings can't be trusted for miss counting this run (empty if they can)."""
+    problems = []
+    for source in MARKETS[market]['listings']:
+        count, previous, errors = report[source]
+        if not count:
+            problems.append(f"{source} returned no symbols")
+        elif errors:
+            problems.append(f"{source} had {len(errors)} failed sub-fetch(es)")
+        elif previous and count < previous * (1 - MAX_LISTING_DROP):
+            problems.append(f"{source} dropped from {previous} to {count} symbols")
+    return problems
+
+
+# ─── Compute ──────────────────────────────────────────────────────────
+def compute_changes(conn, market):
+    """
+    Build #staged (member lists), #listed (member lists and full listings), #added, #removed and
+    #renames for `market` (session temp tables, used by apply_changes). Returns (adds, removes,
+    renames) as lists for reporting.
+    """
+    master = MARKETS[market]['master_table']
+    members = list(MARKETS[market]['sources'])
+    cursor = conn.cursor()
+    for temp in ('#staged', '#listed', '#added', '#removed', '#renames'):
+        cursor.execute(f"IF OBJECT_ID('tempdb..{temp}') IS NOT NULL DROP TABLE {temp}")
+
+    cursor.execute(f"""
+        SELECT ticker, MAX(company_name) AS company_name
+        INTO #staged FROM {staging_table}
+        WHERE market = ? AND source IN ({', '.join('?' for _ in members)})
+        GROUP BY ticker
+    """, market, *members)
+    cursor.execute("ALTER TABLE #staged ADD PRIMARY KEY (ticker)")
+    cursor.execute(f"SELECT DISTINCT ticker INTO #listed FROM {staging_table} WHERE market = ?", market)
+    cursor.execute("ALTER TABLE #listed ADD PRIMARY KEY (ticker)")
+    cursor.execute(f"""
+        SELECT s.ticker, s.company_name INTO #added
+        FROM #staged AS s
+        WHERE NOT EXISTS (SELECT 1 FROM {master} AS m WHERE m.ticker = s.ticker)
+    """)
+    cursor.execute(f"""
+        SELECT m.ticker, m.company_name INTO #removed
+        FROM {master} AS m
+        WHERE ISNULL(m.process_flag, 'Y') <> 'N'
+          AND NOT EXISTS (SELECT 1 FROM #listed AS s WHERE s.ticker = m.ticker)
+    """)
+    cursor.execute(f"""
+        WITH a AS (
+            SELECT ticker, {NAME_KEY_SQL.format(col='company_name')} AS name_key FROM #added
+            WHERE company_name IS NOT NULL
+        ), r AS (
+            SELECT ticker, {NAME_KEY_SQL.format(col='company_name')} AS name_key FROM #removed
+            WHERE company_name IS NOT NULL AND company_name <> 'TBD'
+        ), a1 AS (
+            SELECT ticker, name_key, COUNT(*) OVER (PARTITION BY name_key) AS n FROM a
+        ), r1 AS (
+            SELECT ticker, name_key, COUNT(*) OVER (PARTITION BY name_key) AS n FROM r
+        )
+        SELECT r1.ticker AS old_ticker, a1.ticker AS new_ticker INTO #renames
+        FROM r1 JOIN a1 ON a1.name_key = r1.name_key
+        WHERE r1.n = 1 AND a1.n = 1
+    """)
+
+    cursor.execute("SELECT old_ticker, new_ticker FROM #renames ORDER BY old_ticker")
+    renames = [tuple(r) for r in cursor.fetchall()]
+    cursor.execute("SELECT ticker FROM #added WHERE ticker NOT IN (SELECT new_ticker FROM #renames) ORDER BY ticker")
+    adds = [r[0] for r in cursor.fetchall()]
+    cursor.execute("SELECT ticker FROM #removed WHERE ticker NOT IN (SELECT old_ticker FROM #renames) ORDER BY ticker")
+    removes = [r[0] for r in cursor.fetchall()]
+    return adds, removes, renames
+
+
+# ─── Apply ────────────────────────────────────────────────────────────
+def flip_flags(cursor, market, master, flag, change_type):
+    """Set process_flag for the tickers in #flip and log them. Returns the number flipped."""
+    cursor.execute(f"UPDATE m SET process_flag = ? FROM {master} AS m JOIN #flip AS f ON f.ticker = m.ticker", flag)
+    flipped = cursor.rowcount
+    cursor.execute(f"INSERT INTO {changes_table} (market, change_type, ticker) SELECT ?, ?, ticker FROM #flip",
+                   market, change_type)
+    return flipped
+
+
+def apply_changes(conn, market, adds, count_misses, retire_after=RETIRE_AFTER):
+    """
+    Apply the changes computed by compute_changes. Returns {change_type: count}.
+    count_misses=False (full listings incomplete this run) also skips renames: the old ticker
+    may only be missing because of the outage. Pass the renames' new tickers in `adds` then.
+    """
+    master = MARKETS[market]['master_table']
+    cursor = conn.cursor()
+    result = {}
+
+    # Adds: only tickers yfinance knows (the daily jobs could not load the others anyway)
+    metadata, failures = resolve_metadata(adds) if adds else ({}, {})
+    rows = [(t, m['company_name'], 'Y', m['sector'], m['industry'], m['sub_industry'])
+            for t, m in metadata.items() if m]
+    result['add'], _ = bulk_merge(conn, master, MASTER_COLUMNS, ['ticker'], rows, mode='insert',
+                                  extra_set={'last_updated': 'GETDATE()'})
+    if rows:
+        cursor.executemany(f"INSERT INTO {changes_table} (market, change_type, ticker) VALUES (?, 'add', ?)",
+                           [(market, r[0]) for r in rows])
+    skipped = len(adds) - len(rows) - len(failures)
+    if skipped:
+        logger.info(f"{market}: {skipped} new symbol(s) skipped (no yfinance data)")
+    if failures:
+        logger.warning(f"{market}: {len(failures)} new symbol(s) not added, metadata fetch failed "
+                       f"(retried next run): {sorted(failures)[:20]}")
+
+    # Renames: carry the old row's descriptive columns over, retire the old ticker now.
+    # The old ticker is only known to be gone when the full listings are trustworthy.
+    if count_misses:
+        cursor.execute(f"""
+            INSERT INTO {master} (ticker, company_name, process_flag, sector, industry, sub_industry, last_updated)
+            SELECT r.new_ticker, m.company_name, 'Y', m.sector, m.industry, m.sub_industry, GETDATE()
+            FROM #renames AS r JOIN {master} AS m ON m.ticker = r.old_ticker
+        """)
+        result['rename'] = cursor.rowcount
+        cursor.execute(f"UPDATE m SET process_flag = 'N' FROM {master} AS m "
+                       f"JOIN #renames AS r ON r.old_ticker = m.ticker")
+        cursor.execute(f"""
+            INSERT INTO {changes_table} (market, change_type, ticker, related_ticker)
+            SELECT ?, 'rename', old_ticker, new_ticker FROM #renames
+        """, market)
+        cursor.execute(f"""
+            MERGE {status_table} AS t
+            USING #renames AS s ON t.market = ? AND t.ticker = s.old_ticker
+            WHEN MATCHED THEN UPDATE SET retired_at = GETDATE()
+            WHEN NOT MATCHED THEN INSERT (market, ticker, missed_runs, first_missed, last_missed, retired_at)
+                VALUES (?, s.old_ticker, 0, GETDATE(), GETDATE(), GETDATE());
+        """, market, market)
+    else:
+        result['rename'] = 0
+
+    # Listed again: reactivate what this script retired, reset the miss counters
+    cursor.execute("IF OBJECT_ID('tempdb..#flip') IS NOT NULL DROP TABLE #flip")
+    cursor.execute(f"""
+        SELECT m.ticker INTO #flip
+        FROM {master} AS m
+        JOIN {status_table} AS u ON u.market = ? AND u.ticker = m.ticker AND u.retired_at IS NOT NULL
+        JOIN #listed AS s ON s.ticker = m.ticker
+    """, market)
+    result['reactivate'] = flip_flags(cursor, market, master, 'Y', 'reactivate')
+    cursor.execute(f"DELETE u FROM {status_table} AS u JOIN #listed AS s ON s.ticker = u.ticker WHERE u.market = ?",
+                   market)
+
+    # Misses and retirements
+    result['retire'] = 0
+    if count_misses:
+        cursor.execute(f"""
+            MERGE {status_table} AS t
+            USING (SELECT ticker FROM #removed WHERE ticker NOT IN (SELECT old_ticker FROM #renames)) AS s
+                ON t.market = ? AND t.ticker = s.ticker
+            WHEN MATCHED AND t.retired_at IS NULL THEN
+                UPDATE SET missed_runs = t.missed_runs + 1, last_missed = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (market, ticker, missed_runs, first_missed, last_missed) VALUES (?, s.ticker, 1, GETDATE(), GETDATE());
+        """, market, market)
+        cursor.execute("DROP TABLE #flip")
+        cursor.execute(f"""
+            SELECT m.ticker INTO #flip
+            FROM {master} AS m
+            JOIN {status_table} AS u ON u.market = ? AND u.ticker = m.ticker
+            WHERE u.retired_at IS NULL AND u.missed_runs >= ? AND ISNULL(m.process_flag, 'Y') <> 'N'
+        """, market, retire_after)
+        result['retire'] = flip_flags(cursor, market, master, 'N', 'retire')
+        cursor.execute(f"""
+            UPDATE u SET retired_at = GETDATE()
+            FROM {status_table} AS u JOIN #flip AS f ON f.ticker = u.ticker WHERE u.market = ?
+        """, market)
+    cursor.execute("DROP TABLE #flip")
+    conn.commit()
+    return result
+
+
+def reconcile(conn, market, dry_run=False, retire_after=RETIRE_AFTER):
+    """Stage, compute and (unless dry_run) apply `market`'s universe changes."""
+    ensure_tables(conn)
+    staged = stage_sources(conn, market)
+    adds, removes, renames = compute_changes(conn, market)
+    logger.info(f"{market}: {len(adds)} to add, {len(removes)} unlisted, {len(renames)} renamed")
+    for old, new in renames:
+        logger.info(f"{market}: rename {old} -> {new}")
+
+    if dry_run:
+        logger.info(f"{market}: dry run, nothing applied. Adds: {adds[:20]} Unlisted: {removes[:20]}")
+        return None
+    problems = listing_problems(market, staged)
+    if problems:
+        logger.warning(f"{market}: {'; '.join(problems)}; misses and renames not applied this run")
+        # New tickers of the skipped renames are still member-listed: add them as plain adds
+        adds = adds + [new for _, new in renames]
+    result = apply_changes(conn, market, adds, count_misses=not problems, retire_after=retire_after)
+    sync_symbol_master(conn, market)
+    logger.info(f"{market}: applied {result}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconcile master ticker tables with the scraped constituent lists')
+    parser.add_argument('--market', nargs='+', choices=sorted(MARKETS), default=sorted(MARKETS),
+                        help='Markets to reconcile (default: all)')
+    parser.add_argument('--retire-after', type=int, default=RETIRE_AFTER,
+                        help=f'Consecutive unlisted runs before process_flag flips to N (default: {RETIRE_AFTER})')
+    parser.add_argument('--dry-run', action='store_true', help='Stage and report only')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "reconcile_universe.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        for market in args.market:
+            reconcile(conn, market, dry_run=args.dry_run, retire_after=args.retire_after)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
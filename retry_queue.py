@@ -0,0 +1,118 @@
+"""
+Failed-Ticker Retry Queue
+=========================
+Durable record of tickers that failed in an ETL run, stored in SQL Server so the
+next run can repair just those tickers instead of re-processing the whole universe.
+
+Each failure is keyed by (job_name, ticker) and keeps the error class, the number
+of attempts and an exponential backoff (next_retry_at). A successful re-run of the
+ticker removes it from the queue.
+
+Used by:
+    get_fundamental_data.py --retry-failed
+    get_data_nasdaq100prev1day.py --retry-failed
+    get_data_nse500_prev1day.py --retry-failed
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+queue_table = "etl_retry_queue"
+
+# Backoff: 15 min, 30 min, 1h, 2h ... capped at 24h. After MAX_ATTEMPTS the entry
+# stays in the table for inspection but is no longer picked up by --retry-failed.
+BACKOFF_BASE_MINUTES = 15
+BACKOFF_MAX_MINUTES = 24 * 60
+MAX_ATTEMPTS = 8
+
+CREATE_QUEUE_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{queue_table}')
+BEGIN
+    CREATE TABLE {queue_table} (
+        job_name VARCHAR(100) NOT NULL,
+        ticker VARCHAR(50) NOT NULL,
+        error_class VARCHAR(100) NULL,
+        error_message VARCHAR(1000) NULL,
+        attempts INT NOT NULL DEFAULT 1,
+        first_failed_at DATETIME NOT NULL DEFAULT GETDATE(),
+        last_failed_at DATETIME NOT NULL DEFAULT GETDATE(),
+        next_retry_at DATETIME NOT NULL,
+        PRIMARY KEY (job_name, ticker)
+    );
+
+    CREATE INDEX IX_{queue_table}_due ON {queue_table} (job_name, next_retry_at);
+END
+"""
+
+# attempts is the post-increment value, so the first failure waits BACKOFF_BASE_MINUTES
+RECORD_FAILURE_SQL = f"""
+MERGE {queue_table} AS t
+USING (SELECT ? AS job_name, ? AS ticker, ? AS error_class, ? AS error_message) AS s
+    ON t.job_name = s.job_name AND t.ticker = s.ticker
+WHEN MATCHED THEN UPDATE SET
+    error_class = s.error_class,
+    error_message = s.error_message,
+    attempts = t.attempts + 1,
+    last_failed_at = GETDATE(),
+    next_retry_at = DATEADD(MINUTE,
+        CASE WHEN t.attempts >= 7 THEN {BACKOFF_MAX_MINUTES}
+             ELSE {BACKOFF_BASE_MINUTES} * POWER(2, t.attempts) END, GETDATE())
+WHEN NOT MATCHED THEN
+    INSERT (job_name, ticker, error_class, error_message, attempts, next_retry_at)
+    VALUES (s.job_name, s.ticker, s.error_class, s.error_message, 1,
+            DATEADD(MINUTE, {BACKOFF_BASE_MINUTES}, GETDATE()));
+"""
+
+
+def ensure_queue_table(conn):
+    """Create the retry queue table if it doesn't exist."""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_QUEUE_SQL)
+    conn.commit()
+
+
+def record_failures(conn, job_name, failures):
+    """
+    Upsert failed tickers into the queue with backoff.
+
+    failures : list of (ticker, error_class, error_message) tuples
+    """
+    if not failures:
+        return
+    cursor = conn.cursor()
+    params = [
+        (job_name, ticker, error_class, str(error_message)[:1000] if error_message else None)
+        for ticker, error_class, error_message in failures
+    ]
+    cursor.executemany(RECORD_FAILURE_SQL, params)
+    conn.commit()
+    logger.info(f"Retry queue: recorded {len(failures)} failed tickers for {job_name}")
+
+
+def clear_tickers(conn, job_name, tickers):
+    """Remove tickers that succeeded from the queue."""
+    if not tickers:
+        return
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"DELETE FROM {queue_table} WHERE job_name = ? AND ticker = ?",
+        [(job_name, ticker) for ticker in tickers]
+    )
+    conn.commit()
+
+
+def get_due_tickers(conn, job_name):
+    """Return tickers whose backoff has expired and which still have attempts left."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT ticker FROM {queue_table}
+        WHERE job_name = ? AND next_retry_at <= GETDATE() AND attempts < ?
+        ORDER BY next_retry_at
+    """, job_name, MAX_ATTEMPTS)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def error_class_of(exc):
+    """Short error class label stored in the queue (e.g. 'HTTPError', 'KeyError')."""
+    return type(exc).__name__
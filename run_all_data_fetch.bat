@@ -23,6 +23,10 @@ echo.
 echo [3/4] Fetching fundamental data...
 python get_fundamental_data.py
 
+echo.
+echo [4/4] Updating technical indicators (new bars only)...
+python indicator_engine.py
+
 if %ERRORLEVEL% EQU 0 (
     echo.
     echo ========================================
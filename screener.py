@@ -0,0 +1,353 @@
+"""
+Screener
+========
+Screens the latest_snapshot universe with predicate expressions, e.g.
+
+    rsi_14 < 30 and close_price > sma_200 and sector == 'Technology'
+    market_cap > 1e11 and trailing_pe < 25 and vix_pct_rank_252d > 0.8
+    sector in ('Technology', 'Healthcare') and not (rsi_14 > 70)
+
+Expressions are parsed with `ast` (only comparisons, and/or/not, + - * /, `in` lists, abs(),
+isnull()/notnull() are allowed, so nothing is ever eval'd) and compiled into functions
+that evaluate as vectorized NumPy masks over an in-memory columnar copy of the snapshot.
+
+Names resolve to
+    - latest_snapshot columns (one value per ticker)
+    - market context scalars: <series>_close from market_context_long and
+      <series>_<feature> from market_context_features (latest value), e.g. vix_close,
+      nifty_it_ret_20d, sp500_rvol_20d
+
+Screener.refresh() reloads only snapshot rows whose updated_at moved since the last load
+(a full reload when tickers were added or removed), so a long-running process stays
+current after each ETL run for the cost of the changed rows.
+
+Usage (Python):
+    from screener import Screener
+    screener = Screener(conn)
+    screener.screen("rsi_14 < 30 and close_price > sma_200", market='nse', rank_by='market_cap', limit=20)
+    screener.refresh()                                   # after the next ETL run
+
+Usage (CLI):
+    python screener.py "rsi_14 < 30 and close_price > sma_200" --market nse --rank-by market_cap --limit 20
+    python screener.py "sector == 'Technology'" --rank-by rsi_14 --ascending --columns ticker company rsi_14
+    python screener.py --list-fields
+"""
+
+import argparse
+import ast
+import operator
+
+import numpy as np
+import pandas as pd
+import pyodbc
+
+from latest_snapshot import ensure_snapshot_table, snapshot_table
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+TEXT_COLUMNS = {'market', 'ticker', 'company', 'sector', 'industry'}
+DATE_COLUMNS = {'trading_date', 'fundamentals_date', 'updated_at'}
+DEFAULT_OUTPUT = ['market', 'ticker', 'company', 'sector', 'close_price', 'daily_change_pct',
+                  'rsi_14', 'sma_200', 'market_cap', 'trailing_pe']
+
+# Latest value per market context series within 14 days; the tables are optional
+# (fresh database or equity-only deployment), so each part is used only if its table exists
+CONTEXT_PARTS = {
+    'market_context_features': """
+    SELECT series, feature AS name, value,
+           ROW_NUMBER() OVER (PARTITION BY series, feature ORDER BY trading_date DESC) AS rn
+    FROM market_context_features
+    WHERE trading_date >= DATEADD(DAY, -14, CAST(GETDATE() AS DATE))""",
+    'market_context_long': """
+    SELECT series, metric AS name, value,
+           ROW_NUMBER() OVER (PARTITION BY series, metric ORDER BY trading_date DESC) AS rn
+    FROM market_context_long
+    WHERE metric = 'close' AND trading_date >= DATEADD(DAY, -14, CAST(GETDATE() AS DATE))""",
+}
+CONTEXT_SQL = """
+SELECT series + '_' + name, value FROM ({parts}
+) AS latest
+WHERE rn = 1 AND value IS NOT NULL
+"""
+
+
+class ScreenError(ValueError):
+    """Invalid screen expression (syntax, unknown name or unsupported construct)."""
+
+
+# --------------------------------------------------------------------------
+# Expression compiler: ast -> closure over {column: ndarray}
+# --------------------------------------------------------------------------
+
+COMPARE_OPS = {ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+               ast.Eq: operator.eq, ast.NotEq: operator.ne}
+ARITHMETIC_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                  ast.Div: operator.truediv}
+FUNCTIONS = {
+    'abs': np.abs,
+    'isnull': lambda x: pd.isna(x),
+    'notnull': lambda x: ~pd.isna(x),
+}
+
+
+def compile_expression(expression, columns, context):
+    """
+    Compile `expression` into fn(arrays) -> ndarray (or scalar), where `arrays` maps every
+    name in `columns` to an equally long ndarray and `context` holds scalar values.
+    """
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ScreenError(f"Invalid expression {expression!r}: {e.msg}") from None
+    return _compile(tree.body, set(columns), context)
+
+
+def _constant_list(node):
+    if not isinstance(node, (ast.List, ast.Tuple, ast.Set)) or \
+            not all(isinstance(e, ast.Constant) for e in node.elts):
+        raise ScreenError("'in' needs a literal list, e.g. sector in ('Technology', 'Energy')")
+    return [e.value for e in node.elts]
+
+
+def _dates(a, b):
+    """Let date columns compare against 'YYYY-MM-DD' literals."""
+    if isinstance(b, str) and getattr(a, 'dtype', None) is not None and a.dtype.kind == 'M':
+        return a, np.datetime64(b)
+    if isinstance(a, str) and getattr(b, 'dtype', None) is not None and b.dtype.kind == 'M':
+        return np.datetime64(a), b
+    return a, b
+
+
+def _compile(node, columns, context):
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, (int, float, str, bool)):
+            raise ScreenError(f"Unsupported constant {node.value!r}")
+        value = node.value
+        return lambda arrays: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        if name in columns:
+            return lambda arrays: arrays[name]
+        if name in context:
+            value = context[name]
+            return lambda arrays: value
+        raise ScreenError(f"Unknown field {name!r} (see --list-fields)")
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v, columns, context) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def boolean(arrays):
+            mask = parts[0](arrays)
+            for part in parts[1:]:
+                mask = combine(mask, part(arrays))
+            return mask
+        return boolean
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand, columns, context)
+        if isinstance(node.op, ast.Not):
+            return lambda arrays: np.logical_not(operand(arrays))
+        if isinstance(node.op, ast.USub):
+            return lambda arrays: -operand(arrays)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        raise ScreenError(f"Unsupported operator {type(node.op).__name__}")
+
+    if isinstance(node, ast.BinOp):
+        if type(node.op) not in ARITHMETIC_OPS:
+            raise ScreenError(f"Unsupported operator {type(node.op).__name__}")
+        op = ARITHMETIC_OPS[type(node.op)]
+        left, right = _compile(node.left, columns, context), _compile(node.right, columns, context)
+
+        def arithmetic(arrays):
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return op(left(arrays), right(arrays))
+        return arithmetic
+
+    if isinstance(node, ast.Compare):
+        terms = [_compile(node.left, columns, context)]
+        steps = []
+        for op_node, comparator in zip(node.ops, node.comparators):
+            if isinstance(op_node, (ast.In, ast.NotIn)):
+                values = _constant_list(comparator)
+                negate = isinstance(op_node, ast.NotIn)
+                steps.append(lambda a, _, values=values, negate=negate: np.isin(a, values) != negate)
+                terms.append(None)
+            elif type(op_node) in COMPARE_OPS:
+                op = COMPARE_OPS[type(op_node)]
+                steps.append(lambda a, b, op=op: op(*_dates(a, b)))
+                terms.append(_compile(comparator, columns, context))
+            else:
+                raise ScreenError(f"Unsupported comparison {type(op_node).__name__}")
+
+        def compare(arrays):
+            # Chained comparisons: a < b < c  ->  (a < b) & (b < c)
+            mask = True
+            left = terms[0](arrays)
+            for step, term in zip(steps, terms[1:]):
+                right = term(arrays) if term is not None else None
+                with np.errstate(invalid='ignore'):
+                    mask = np.logical_and(mask, step(left, right))
+                left = right
+            return mask
+        return compare
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords \
+                or len(node.args) != 1:
+            raise ScreenError(f"Only {', '.join(sorted(FUNCTIONS))}(x) calls are supported")
+        fn = FUNCTIONS[node.func.id]
+        argument = _compile(node.args[0], columns, context)
+        return lambda arrays: fn(argument(arrays))
+
+    raise ScreenError(f"Unsupported syntax: {type(node).__name__}")
+
+
+# --------------------------------------------------------------------------
+# In-memory columnar snapshot
+# --------------------------------------------------------------------------
+
+def columnar(frame):
+    """column -> ndarray: object for text, datetime64 for dates, float (NaN for NULL) otherwise."""
+    arrays = {}
+    for column in frame.columns:
+        if column in TEXT_COLUMNS:
+            arrays[column] = frame[column].to_numpy(dtype=object)
+        elif column in DATE_COLUMNS:
+            arrays[column] = pd.to_datetime(frame[column]).to_numpy()
+        else:
+            arrays[column] = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=float)
+    return arrays
+
+
+class Screener:
+    """Columnar copy of latest_snapshot (+ market context scalars) with compiled screens."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.frame = None           # DataFrame indexed by (market, ticker)
+        self.arrays = {}            # column -> ndarray, see columnar()
+        self.context = {}           # market context scalars
+        self.loaded_through = None  # MAX(updated_at) at the last refresh
+        ensure_snapshot_table(conn)
+        self.refresh()
+
+    def _query(self, where='', params=()):
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT * FROM {snapshot_table}{where}", list(params))
+        names = [d[0] for d in cursor.description]
+        return pd.DataFrame.from_records([tuple(r) for r in cursor.fetchall()], columns=names)
+
+    def refresh(self):
+        """Reload changed snapshot rows (full reload if tickers were added/removed). Returns rows reloaded."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"SELECT COUNT(*), MAX(updated_at) FROM {snapshot_table}")
+        count, latest = cursor.fetchone()
+
+        if self.frame is None or count != len(self.frame):
+            changed = self._query()
+            self.frame = changed.set_index(['market', 'ticker'], drop=False)
+        elif latest is not None and latest > self.loaded_through:
+            changed = self._query(" WHERE updated_at > ?", [self.loaded_through])
+            changed = changed.set_index(['market', 'ticker'], drop=False)
+            self.frame = pd.concat([self.frame.drop(changed.index, errors='ignore'), changed])
+            if len(self.frame) != count:  # a ticker was swapped for another in between loads
+                self.frame = self._query().set_index(['market', 'ticker'], drop=False)
+        else:
+            changed = self.frame.iloc[0:0]
+        self.loaded_through = latest
+        self.arrays = columnar(self.frame)
+
+        self.context = {}
+        parts = []
+        for table, part in CONTEXT_PARTS.items():
+            cursor.execute("SELECT OBJECT_ID(?)", f"dbo.{table}")
+            if cursor.fetchone()[0] is not None:
+                parts.append(part)
+        if parts:
+            cursor.execute(CONTEXT_SQL.format(parts='\n    UNION ALL'.join(parts)))
+            self.context = {name: float(value) for name, value in cursor.fetchall()}
+        return len(changed)
+
+    def fields(self):
+        return {'columns': list(self.arrays), 'context': dict(sorted(self.context.items()))}
+
+    def _evaluate(self, expression):
+        try:
+            return compile_expression(expression, self.arrays, self.context)(self.arrays)
+        except (TypeError, ValueError) as e:
+            if isinstance(e, ScreenError):
+                raise
+            raise ScreenError(f"Cannot evaluate {expression!r}: {e}") from None
+
+    def mask(self, expression):
+        """Boolean mask over the snapshot rows for `expression`."""
+        result = self._evaluate(expression)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (len(self.frame),))
+
+    def screen(self, where=None, market=None, rank_by=None, ascending=False, limit=None, columns=None):
+        """
+        Rows matching `where` (all rows if None), optionally limited to `market`, ranked by the
+        `rank_by` expression (descending unless ascending=True; NULLs last).
+        """
+        selected = self.mask(where).copy() if where else np.ones(len(self.frame), dtype=bool)
+        if market:
+            selected &= self.arrays['market'] == market
+        result = self.frame[selected]
+        if rank_by:
+            score = self._evaluate(rank_by)
+            try:
+                score = np.broadcast_to(np.asarray(score, dtype=float), (len(self.frame),))[selected]
+            except (TypeError, ValueError):
+                raise ScreenError(f"Ranking expression {rank_by!r} is not numeric") from None
+            order = np.argsort(np.where(np.isnan(score), np.inf, score if ascending else -score), kind='stable')
+            result = result.iloc[order].assign(score=score[order])
+        if limit:
+            result = result.head(limit)
+        output = [c for c in (columns or DEFAULT_OUTPUT) if c in result.columns]
+        if rank_by and 'score' not in output:
+            output.append('score')
+        return result[output].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Screen latest_snapshot with predicate expressions')
+    parser.add_argument('where', nargs='?', help="Predicate, e.g. \"rsi_14 < 30 and close_price > sma_200\"")
+    parser.add_argument('--market', choices=['nse', 'nasdaq'], help='Restrict to one market')
+    parser.add_argument('--rank-by', help='Ranking expression (default order: descending), e.g. market_cap')
+    parser.add_argument('--ascending', action='store_true', help='Rank ascending')
+    parser.add_argument('--limit', type=int, default=25, help='Rows to show (default: 25)')
+    parser.add_argument('--columns', nargs='+', help='Output columns')
+    parser.add_argument('--list-fields', action='store_true', help='List snapshot columns and context scalars')
+    args = parser.parse_args()
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        screener = Screener(conn)
+        if args.list_fields:
+            fields = screener.fields()
+            print("📋 Snapshot columns:", ', '.join(fields['columns']))
+            print("🌐 Market context:")
+            for name, value in fields['context'].items():
+                print(f"   {name} = {value:.4f}")
+            return
+        try:
+            result = screener.screen(args.where, market=args.market, rank_by=args.rank_by,
+                                     ascending=args.ascending, limit=args.limit, columns=args.columns)
+        except ScreenError as e:
+            parser.error(str(e))
+        print(f"🔎 {len(result)} match(es) for: {args.where or 'all'}")
+        if not result.empty:
+            print(result.to_string(index=False))
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
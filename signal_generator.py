@@ -0,0 +1,256 @@
+"""
+Materialized Trading Signals
+============================
+Replaces the stacked signal views of create_forex_views.sql (forex_rsi_signals,
+forex_macd_signals, forex_bb_signals, forex_sma_signals, forex_atr_spikes) and their
+NSE/NASDAQ equivalents with one narrow table, generated from the indicator tables
+written by indicator_engine.py:
+
+    signals (market, symbol, trading_date, signal_type, value)
+
+Only sessions that fire a signal are stored. The clustered key leads with trading_date,
+so "today's signals across the universe" is a single range seek.
+
+signal_type          rule                                            value
+rsi_oversold         rsi_14 < 30                                     rsi_14
+rsi_overbought       rsi_14 > 70                                     rsi_14
+macd_bullish_cross   MACD crosses above its signal line              macd_hist
+macd_bearish_cross   MACD crosses below its signal line              macd_hist
+bb_above_upper       close above the upper Bollinger band            %B (close - lower) / (upper - lower)
+bb_below_lower       close below the lower Bollinger band            %B
+sma_golden_cross     SMA20 crosses above SMA50                       sma_20 - sma_50
+sma_death_cross      SMA20 crosses below SMA50                       sma_20 - sma_50
+atr_spike            atr_14 > 1.5 x its 21-session average           atr_14 / average
+
+Incremental refresh: indicator rows written or changed since a point in time (their
+updated_at) define, per symbol, the first session to regenerate; signals from that session
+on are replaced. indicator_engine.update_indicators calls this after every run.
+
+Usage:
+    python signal_generator.py                         # Full rebuild, all markets
+    python signal_generator.py --market fx --since 2026-10-01
+    SELECT * FROM signals WHERE trading_date = '2026-10-16' ORDER BY market, signal_type;
+"""
+
+import argparse
+import logging
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pyodbc
+
+from sql_loader import frame_to_rows
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+signals_table = "signals"
+INDICATOR_TABLES = {
+    'fx': 'forex_indicators',
+    'nasdaq': 'nasdaq_100_indicators',
+    'nse': 'nse_500_indicators',
+}
+SIGNAL_COLUMNS = ['market', 'symbol', 'trading_date', 'signal_type', 'value']
+SOURCE_COLUMNS = ['close_price', 'sma_20', 'sma_50', 'rsi_14', 'macd', 'macd_signal', 'macd_hist',
+                  'bb_upper', 'bb_lower', 'atr_14']
+
+RSI_OVERSOLD, RSI_OVERBOUGHT = 30, 70
+ATR_SPIKE_WINDOW, ATR_SPIKE_FACTOR = 21, 1.5
+# Calendar days of indicator rows loaded before the first regenerated session
+# (previous session for crossovers, 21 sessions for the ATR average)
+CONTEXT_DAYS = 45
+SYMBOL_CHUNK = 200
+
+
+def ensure_signals_table(conn):
+    cursor = conn.cursor()
+    cursor.execute(f"""
+    IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{signals_table}')
+    BEGIN
+        CREATE TABLE {signals_table} (
+            market VARCHAR(10) NOT NULL,
+            symbol VARCHAR(50) NOT NULL,
+            trading_date DATE NOT NULL,
+            signal_type VARCHAR(30) NOT NULL,
+            value FLOAT NULL,
+            created_at DATETIME NOT NULL DEFAULT GETDATE(),
+            CONSTRAINT PK_{signals_table} PRIMARY KEY CLUSTERED (trading_date, market, signal_type, symbol)
+        );
+        CREATE NONCLUSTERED INDEX IX_{signals_table}_symbol ON {signals_table} (market, symbol, trading_date)
+            INCLUDE (signal_type, value);
+    END
+    """)
+    conn.commit()
+
+
+def changed_sessions(conn, market, changed_since):
+    """First session per symbol whose indicator row was written at/after `changed_since`."""
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT symbol, MIN(trading_date) FROM {INDICATOR_TABLES[market]}
+        WHERE updated_at >= ? GROUP BY symbol
+    """, changed_since)
+    return {symbol: first_date for symbol, first_date in cursor.fetchall()}
+
+
+def load_indicator_rows(conn, market, symbols, since=None):
+    query = f"""
+        SELECT symbol, trading_date, {', '.join(SOURCE_COLUMNS)}
+        FROM {INDICATOR_TABLES[market]}
+        WHERE symbol IN ({', '.join('?' for _ in symbols)})
+    """
+    params = list(symbols)
+    if since is not None:
+        query += " AND trading_date >= ?"
+        params.append(since)
+    cursor = conn.cursor()
+    cursor.execute(query + " ORDER BY symbol, trading_date", params)
+    rows = pd.DataFrame.from_records([tuple(r) for r in cursor.fetchall()],
+                                     columns=['symbol', 'trading_date'] + SOURCE_COLUMNS)
+    for column in SOURCE_COLUMNS:
+        rows[column] = rows[column].astype(float)
+    return rows
+
+
+def detect_signals(rows):
+    """Signals for indicator `rows` sorted by symbol, trading_date: (symbol, trading_date, signal_type, value)."""
+    by_symbol = rows.groupby('symbol', sort=False)
+    prev_macd = by_symbol['macd'].shift()
+    prev_macd_signal = by_symbol['macd_signal'].shift()
+    prev_fast = by_symbol['sma_20'].shift()
+    prev_slow = by_symbol['sma_50'].shift()
+    atr_average = (by_symbol['atr_14'].rolling(ATR_SPIKE_WINDOW).mean()
+                   .reset_index(level=0, drop=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_b = (rows['close_price'] - rows['bb_lower']) / (rows['bb_upper'] - rows['bb_lower'])
+    sma_spread = rows['sma_20'] - rows['sma_50']
+
+    rules = [
+        ('rsi_oversold', rows['rsi_14'] < RSI_OVERSOLD, rows['rsi_14']),
+        ('rsi_overbought', rows['rsi_14'] > RSI_OVERBOUGHT, rows['rsi_14']),
+        ('macd_bullish_cross', (prev_macd < prev_macd_signal) & (rows['macd'] > rows['macd_signal']),
+         rows['macd_hist']),
+        ('macd_bearish_cross', (prev_macd > prev_macd_signal) & (rows['macd'] < rows['macd_signal']),
+         rows['macd_hist']),
+        ('bb_above_upper', rows['close_price'] > rows['bb_upper'], percent_b),
+        ('bb_below_lower', rows['close_price'] < rows['bb_lower'], percent_b),
+        ('sma_golden_cross', (prev_fast < prev_slow) & (rows['sma_20'] > rows['sma_50']), sma_spread),
+        ('sma_death_cross', (prev_fast > prev_slow) & (rows['sma_20'] < rows['sma_50']), sma_spread),
+        ('atr_spike', rows['atr_14'] > ATR_SPIKE_FACTOR * atr_average, rows['atr_14'] / atr_average),
+    ]
+    fired = [
+        rows.loc[mask, ['symbol', 'trading_date']].assign(signal_type=signal_type, value=value[mask])
+        for signal_type, mask, value in rules if mask.any()
+    ]
+    if not fired:
+        return pd.DataFrame(columns=['symbol', 'trading_date', 'signal_type', 'value'])
+    return pd.concat(fired, ignore_index=True)
+
+
+def replace_signals(conn, market, first_dates, signals):
+    """
+    Delete `market` signals from each symbol's first regenerated session on and insert `signals`
+    in one transaction: both are staged in temp tables first, so a failure (or the process
+    dying) before the commit leaves the old signals in place.
+    """
+    rows = frame_to_rows(signals.assign(market=market), SIGNAL_COLUMNS)
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+    try:
+        cursor.execute("IF OBJECT_ID('tempdb..#signal_scope') IS NOT NULL DROP TABLE #signal_scope")
+        cursor.execute("CREATE TABLE #signal_scope (symbol VARCHAR(50) NOT NULL PRIMARY KEY, from_date DATE NOT NULL)")
+        cursor.executemany("INSERT INTO #signal_scope (symbol, from_date) VALUES (?, ?)", list(first_dates.items()))
+        cursor.execute("IF OBJECT_ID('tempdb..#signal_stage') IS NOT NULL DROP TABLE #signal_stage")
+        cursor.execute(f"SELECT TOP 0 {', '.join(SIGNAL_COLUMNS)} INTO #signal_stage FROM {signals_table}")
+        if rows:
+            cursor.executemany(f"INSERT INTO #signal_stage ({', '.join(SIGNAL_COLUMNS)}) "
+                               f"VALUES ({', '.join('?' for _ in SIGNAL_COLUMNS)})", rows)
+
+        cursor.execute(f"""
+            DELETE s FROM {signals_table} AS s
+            JOIN #signal_scope AS sc ON sc.symbol = s.symbol AND s.trading_date >= sc.from_date
+            WHERE s.market = ?
+        """, market)
+        deleted = cursor.rowcount
+        cursor.execute(f"INSERT INTO {signals_table} ({', '.join(SIGNAL_COLUMNS)}) "
+                       f"SELECT {', '.join(SIGNAL_COLUMNS)} FROM #signal_stage")
+        inserted = cursor.rowcount
+        cursor.execute("DROP TABLE #signal_scope")
+        cursor.execute("DROP TABLE #signal_stage")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return deleted, inserted
+
+
+def refresh_signals(conn, market, changed_since=None):
+    """
+    Regenerate `market` signals for indicator rows written at/after `changed_since`
+    (a datetime on the SQL Server clock), or for the whole history when it is None.
+    Returns the number of signals stored.
+    """
+    ensure_signals_table(conn)
+    if changed_since is None:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT symbol, MIN(trading_date) FROM {INDICATOR_TABLES[market]} GROUP BY symbol")
+        first_dates = {symbol: first_date for symbol, first_date in cursor.fetchall()}
+    else:
+        first_dates = changed_sessions(conn, market, changed_since)
+    if not first_dates:
+        logger.info(f"{signals_table}: no {market} indicator rows to regenerate")
+        return 0
+
+    symbols = sorted(first_dates)
+    stored = 0
+    for i in range(0, len(symbols), SYMBOL_CHUNK):
+        batch = symbols[i:i + SYMBOL_CHUNK]
+        batch_first = {s: first_dates[s] for s in batch}
+        since = None if changed_since is None else min(batch_first.values()) - timedelta(days=CONTEXT_DAYS)
+        rows = load_indicator_rows(conn, market, batch, since)
+        signals = detect_signals(rows)
+        signals = signals[signals['trading_date'] >= signals['symbol'].map(batch_first)]
+        deleted, inserted = replace_signals(conn, market, batch_first, signals)
+        stored += inserted
+        logger.info(f"{signals_table}: {market} {len(batch)} symbol(s), {deleted} replaced, {inserted} stored")
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the signals table from the indicator tables')
+    parser.add_argument('--market', nargs='+', choices=sorted(INDICATOR_TABLES), default=sorted(INDICATOR_TABLES),
+                        help='Markets to refresh (default: all)')
+    parser.add_argument('--since', help='Only regenerate indicator rows written on/after this date (YYYY-MM-DD); '
+                                        'default: full rebuild')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "signal_generator.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    changed_since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        for market in args.market:
+            refresh_signals(conn, market, changed_since)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
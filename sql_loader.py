@@ -0,0 +1,107 @@
+"""
+Generic SQL Server bulk loader
+==============================
+Stages rows into a session temp table (fast_executemany) and applies them to the
+target table with a single MERGE, instead of a SELECT/UPDATE/INSERT round trip per row.
+
+Modes:
+    'overwrite' - matched rows take the staged values (NULLs included)
+    'coalesce'  - matched rows only take staged values that are non-NULL
+                  (COALESCE(source, target)), so partial downloads never blank data
+    'insert'    - only rows whose key is missing are inserted; matched rows are left alone
+
+Usage:
+    from sql_loader import bulk_merge
+    inserted, updated = bulk_merge(conn, 'market_context_daily', columns, ['trading_date'], rows, mode='coalesce')
+"""
+
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+
+def to_db_value(value):
+    """Convert pandas/numpy scalars to plain Python values pyodbc can bind (NaN/inf -> None)."""
+    if value is None:
+        return None
+    if hasattr(value, 'to_pydatetime'):
+        return None if value != value else value.to_pydatetime()  # pandas Timestamp (NaT -> None)
+    if hasattr(value, 'item') and not isinstance(value, (str, bytes)):
+        value = value.item()  # numpy scalar -> Python scalar
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    return value
+
+
+def server_time(conn):
+    """SQL Server's GETDATE(), the clock GETDATE()-stamped columns (updated_at) are written with."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT GETDATE()")
+    return cursor.fetchone()[0]
+
+
+def frame_to_rows(df, columns):
+    """Turn a DataFrame into a list of tuples in `columns` order, ready for executemany."""
+    return [tuple(to_db_value(v) for v in row) for row in df[columns].itertuples(index=False, name=None)]
+
+
+def bulk_merge(conn, target_table, columns, key_columns, rows, mode='overwrite', extra_set=None):
+    """
+    Stage `rows` (list of tuples in `columns` order) and MERGE them into target_table.
+
+    extra_set : optional dict {column: sql_expression} applied on both UPDATE and INSERT
+                (e.g. {'created_date': 'GETDATE()'}); the columns must not be in `columns`.
+
+    Returns (inserted, updated) counts. Commits on success.
+    """
+    if not rows:
+        return 0, 0
+
+    extra_set = extra_set or {}
+    stage = f"#stage_{target_table.replace('.', '_')}"
+    col_list = ', '.join(columns)
+    value_cols = [c for c in columns if c not in key_columns]
+
+    cursor = conn.cursor()
+    cursor.fast_executemany = True
+
+    # Clone column types from the target so the staged values convert exactly like a direct insert
+    cursor.execute(f"IF OBJECT_ID('tempdb..{stage}') IS NOT NULL DROP TABLE {stage}")
+    cursor.execute(f"SELECT TOP 0 {col_list} INTO {stage} FROM {target_table}")
+    cursor.executemany(f"INSERT INTO {stage} ({col_list}) VALUES ({', '.join('?' for _ in columns)})", rows)
+
+    on_clause = ' AND '.join(f"t.{k} = s.{k}" for k in key_columns)
+    if mode == 'coalesce':
+        new_values = [f"COALESCE(s.{c}, t.{c})" for c in value_cols]
+    else:
+        new_values = [f"s.{c}" for c in value_cols]
+
+    merge_sql = f"MERGE {target_table} AS t\nUSING {stage} AS s\n    ON {on_clause}\n"
+    if mode != 'insert' and value_cols:
+        # NULL-safe change detection: only touch rows whose values would actually change
+        current_values = ', '.join(f"t.{c}" for c in value_cols)
+        set_list = [f"{c} = {v}" for c, v in zip(value_cols, new_values)]
+        set_list += [f"{c} = {expr}" for c, expr in extra_set.items()]
+        merge_sql += (
+            f"WHEN MATCHED AND EXISTS (SELECT {', '.join(new_values)} EXCEPT SELECT {current_values}) THEN\n"
+            f"    UPDATE SET {', '.join(set_list)}\n"
+        )
+    insert_cols = columns + list(extra_set.keys())
+    insert_vals = [f"s.{c}" for c in columns] + list(extra_set.values())
+    merge_sql += (
+        f"WHEN NOT MATCHED BY TARGET THEN\n"
+        f"    INSERT ({', '.join(insert_cols)}) VALUES ({', '.join(insert_vals)})\n"
+        f"OUTPUT $action;"
+    )
+
+    cursor.execute(merge_sql)
+    actions = [row[0] for row in cursor.fetchall()]
+    cursor.execute(f"DROP TABLE {stage}")
+    conn.commit()
+
+    inserted = actions.count('INSERT')
+    updated = actions.count('UPDATE')
+    logger.info(f"{target_table}: staged {len(rows)} rows -> {inserted} inserted, {updated} updated, "
+                f"{len(rows) - inserted - updated} unchanged")
+    return inserted, updated
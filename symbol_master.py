@@ -0,0 +1,291 @@
+"""
+Symbol Master
+=============
+One canonical identity per instrument and its symbol in every source's format:
+
+    symbol_master (symbol_id, market, canonical_symbol, name, is_active)
+    symbol_map    (market, source, source_symbol) -> symbol_id      PK, source -> canonical
+                  (symbol_id, source)             -> source_symbol  unique index, canonical -> source
+
+    market   canonical   yfinance      nse_api    nasdaq_screener   oanda     polygon
+    nse      RELIANCE    RELIANCE.NS   RELIANCE   -                 -         -
+    nasdaq   BRK.B       BRK-B         -          BRK/B             -         BRK.B
+    fx       EURUSD      EURUSD=X      -          -                 EUR_USD   C:EURUSD
+
+Source symbols are only unique within a market (a source can list the same string on two
+exchanges), so the map is keyed on market like the resolver. It is synced from the master
+tables (nasdaq_top100, nse_500, forex_master); their tickers are the yfinance symbols.
+Loaders get provider tickers from an in-process SymbolResolver (plain dict lookups, O(1)
+each); the derivation rules below are its fallback for symbols the map does not cover yet.
+The NSE scrapers in add_missing_tickers.py still emit yfinance (.NS) tickers, which
+reconcile_universe.py stages as 'yfinance'-format symbols.
+
+Usage:
+    from symbol_master import get_resolver
+    symbols = get_resolver(conn)
+    symbols.translate('RELIANCE', 'nse_api', 'yfinance', market='nse')   # 'RELIANCE.NS'
+    symbols.canonical('yfinance', 'BRK-B', market='nasdaq')               # 'BRK.B'
+    symbols.source_symbol('oanda', 'EURUSD', market='fx')                 # 'EUR_USD'
+
+    python symbol_master.py            # sync all markets from the master tables
+    python symbol_master.py --market nse
+"""
+
+import argparse
+import logging
+import os
+
+import pyodbc
+
+from sql_loader import bulk_merge
+
+server = "localhost\\MSSQLSERVER01"
+database = "stockdata_db"
+
+logger = logging.getLogger(__name__)
+
+master_table = "symbol_master"
+map_table = "symbol_map"
+SOURCES = ('yfinance', 'nse_api', 'nasdaq_screener', 'oanda', 'polygon')
+MARKET_SOURCES = {
+    'nse': ('yfinance', 'nse_api'),
+    'nasdaq': ('yfinance', 'nasdaq_screener', 'polygon'),
+    'fx': ('yfinance', 'oanda', 'polygon'),
+}
+# Master table query per market: (source-format yfinance symbol, canonical or None, name, active)
+MASTER_QUERIES = {
+    'nse': "SELECT ticker, NULL, company_name, CASE WHEN ISNULL(process_flag, 'Y') <> 'N' THEN 'Y' ELSE 'N' END "
+           "FROM nse_500",
+    'nasdaq': "SELECT ticker, NULL, company_name, CASE WHEN ISNULL(process_flag, 'Y') <> 'N' THEN 'Y' ELSE 'N' END "
+              "FROM nasdaq_top100",
+    'fx': "SELECT yfinance_symbol, symbol, currency_from + '/' + currency_to, ISNULL(is_active, 'Y') "
+          "FROM forex_master",
+}
+
+CREATE_TABLES_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{master_table}')
+    CREATE TABLE {master_table} (
+        symbol_id INT IDENTITY(1,1) NOT NULL,
+        market VARCHAR(10) NOT NULL,
+        canonical_symbol VARCHAR(50) NOT NULL,
+        name NVARCHAR(255) NULL,
+        is_active CHAR(1) NOT NULL DEFAULT 'Y',
+        updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_{master_table} PRIMARY KEY CLUSTERED (symbol_id),
+        CONSTRAINT UQ_{master_table}_canonical UNIQUE (market, canonical_symbol)
+    );
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{map_table}')
+BEGIN
+    CREATE TABLE {map_table} (
+        market VARCHAR(10) NOT NULL,
+        source VARCHAR(20) NOT NULL,
+        source_symbol VARCHAR(50) NOT NULL,
+        symbol_id INT NOT NULL REFERENCES {master_table} (symbol_id),
+        updated_at DATETIME NOT NULL DEFAULT GETDATE(),
+        CONSTRAINT PK_{map_table} PRIMARY KEY CLUSTERED (market, source, source_symbol)
+    );
+    CREATE UNIQUE NONCLUSTERED INDEX IX_{map_table}_symbol ON {map_table} (symbol_id, source)
+        INCLUDE (source_symbol);
+END
+"""
+
+# Maps created before the market column: backfill it from symbol_master and rekey the PK
+ADD_MAP_MARKET_SQL = f"""
+IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS
+               WHERE TABLE_NAME = '{map_table}' AND COLUMN_NAME = 'market')
+BEGIN
+    ALTER TABLE {map_table} ADD market VARCHAR(10) NULL;
+    EXEC('UPDATE s SET market = m.market FROM {map_table} AS s
+          JOIN {master_table} AS m ON m.symbol_id = s.symbol_id');
+    EXEC('ALTER TABLE {map_table} ALTER COLUMN market VARCHAR(10) NOT NULL');
+    ALTER TABLE {map_table} DROP CONSTRAINT PK_{map_table};
+    EXEC('ALTER TABLE {map_table} ADD CONSTRAINT PK_{map_table}
+          PRIMARY KEY CLUSTERED (market, source, source_symbol)');
+END
+"""
+
+
+# ─── Derivation rules (resolver fallback) ────────────────────────────
+def derive_canonical(market, source, symbol):
+    """Canonical symbol for a `source`-format symbol, by format rules."""
+    symbol = symbol.strip().upper()
+    if market == 'nse':
+        return symbol[:-3] if symbol.endswith('.NS') else symbol
+    if market == 'nasdaq':
+        if source == 'yfinance':
+            return symbol.replace('-', '.')
+        if source == 'nasdaq_screener':
+            return symbol.replace('/', '.')
+        return symbol
+    if market == 'fx':
+        if source == 'yfinance':
+            return symbol[:-2] if symbol.endswith('=X') else symbol
+        if source == 'oanda':
+            return symbol.replace('_', '')
+        if source == 'polygon':
+            return symbol[2:] if symbol.startswith('C:') else symbol
+        return symbol
+    raise ValueError(f"Unknown market {market!r}")
+
+
+def derive_source_symbol(market, source, canonical):
+    """`source`-format symbol for a canonical symbol, by format rules (None if the source doesn't list the market)."""
+    if source not in MARKET_SOURCES[market]:
+        return None
+    if market == 'nse':
+        return f"{canonical}.NS" if source == 'yfinance' else canonical
+    if market == 'nasdaq':
+        return {'yfinance': canonical.replace('.', '-'), 'nasdaq_screener': canonical.replace('.', '/'),
+                'polygon': canonical}[source]
+    return {'yfinance': f"{canonical}=X", 'oanda': f"{canonical[:3]}_{canonical[3:]}",
+            'polygon': f"C:{canonical}"}[source]
+
+
+# ─── Sync ─────────────────────────────────────────────────────────────
+def ensure_tables(conn):
+    cursor = conn.cursor()
+    cursor.execute(CREATE_TABLES_SQL)
+    cursor.execute(ADD_MAP_MARKET_SQL)
+    conn.commit()
+
+
+def sync_symbol_master(conn, market):
+    """
+    Upsert `market`'s master-table symbols into symbol_master / symbol_map.
+    Returns the duplicate master tickers skipped (several tickers with one canonical symbol).
+    """
+    global _resolver
+    ensure_tables(conn)
+    cursor = conn.cursor()
+    cursor.execute(MASTER_QUERIES[market])
+
+    instruments = {}   # canonical -> (yfinance_symbol, name, active)
+    duplicates = []
+    for yf_symbol, canonical, name, active in cursor.fetchall():
+        if not yf_symbol and not canonical:
+            continue
+        canonical = (canonical or derive_canonical(market, 'yfinance', yf_symbol)).strip().upper()
+        yf_symbol = (yf_symbol or derive_source_symbol(market, 'yfinance', canonical)).strip()
+        if canonical in instruments:
+            # Keep the ticker in the standard yfinance format (e.g. RELIANCE.NS over RELIANCE)
+            kept = instruments[canonical][0]
+            if kept != derive_source_symbol(market, 'yfinance', canonical):
+                instruments[canonical], yf_symbol = (yf_symbol, name, active), kept
+            duplicates.append(yf_symbol)
+            continue
+        instruments[canonical] = (yf_symbol, name, active)
+
+    rows = [(market, canonical, name, active) for canonical, (_, name, active) in instruments.items()]
+    bulk_merge(conn, master_table, ['market', 'canonical_symbol', 'name', 'is_active'],
+               ['market', 'canonical_symbol'], rows, mode='coalesce', extra_set={'updated_at': 'GETDATE()'})
+
+    cursor.execute(f"SELECT canonical_symbol, symbol_id FROM {master_table} WHERE market = ?", market)
+    ids = dict(cursor.fetchall())
+    map_rows = []
+    for canonical, (yf_symbol, _, _) in instruments.items():
+        for source in MARKET_SOURCES[market]:
+            symbol = yf_symbol if source == 'yfinance' else derive_source_symbol(market, source, canonical)
+            map_rows.append((ids[canonical], market, source, symbol))
+    bulk_merge(conn, map_table, ['symbol_id', 'market', 'source', 'source_symbol'], ['symbol_id', 'source'],
+               map_rows, extra_set={'updated_at': 'GETDATE()'})
+
+    if duplicates:
+        logger.warning(f"{master_table} ({market}): {len(duplicates)} duplicate ticker(s) skipped: {duplicates[:20]}")
+    _resolver = None  # next get_resolver() call reloads
+    return duplicates
+
+
+# ─── Resolver ─────────────────────────────────────────────────────────
+class SymbolResolver:
+    """In-memory copy of symbol_master + symbol_map with dict lookups in both directions."""
+
+    def __init__(self, conn):
+        ensure_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT m.symbol_id, m.market, m.canonical_symbol, m.is_active, s.source, s.source_symbol
+            FROM {master_table} AS m
+            LEFT JOIN {map_table} AS s ON s.symbol_id = m.symbol_id AND s.market = m.market
+        """)
+        self.by_canonical = {}    # (market, canonical) -> symbol_id
+        self.by_source = {}       # (market, source, source_symbol) -> symbol_id
+        self.to_source = {}       # (symbol_id, source) -> source_symbol
+        self.instruments = {}     # symbol_id -> (market, canonical, is_active)
+        for symbol_id, market, canonical, active, source, source_symbol in cursor.fetchall():
+            self.by_canonical[(market, canonical)] = symbol_id
+            self.instruments[symbol_id] = (market, canonical, active)
+            if source:
+                self.by_source[(market, source, source_symbol)] = symbol_id
+                self.to_source[(symbol_id, source)] = source_symbol
+
+    def symbol_id(self, source, symbol, market):
+        """symbol_id for a source-format symbol (source 'canonical' for canonical symbols), or None."""
+        if source == 'canonical':
+            return self.by_canonical.get((market, symbol))
+        return self.by_source.get((market, source, symbol))
+
+    def canonical(self, source, symbol, market):
+        """Canonical symbol; unmapped symbols fall back to the derivation rules."""
+        symbol_id = self.symbol_id(source, symbol, market)
+        if symbol_id is not None:
+            return self.instruments[symbol_id][1]
+        return symbol if source == 'canonical' else derive_canonical(market, source, symbol)
+
+    def source_symbol(self, source, canonical, market):
+        """`source`-format symbol for a canonical symbol; unmapped ones fall back to the derivation rules."""
+        symbol_id = self.by_canonical.get((market, canonical))
+        if symbol_id is not None and (symbol_id, source) in self.to_source:
+            return self.to_source[(symbol_id, source)]
+        return derive_source_symbol(market, source, canonical)
+
+    def translate(self, symbol, from_source, to_source, market):
+        """Symbol in `from_source` format -> `to_source` format ('canonical' allowed on either side)."""
+        canonical = self.canonical(from_source, symbol, market)
+        return canonical if to_source == 'canonical' else self.source_symbol(to_source, canonical, market)
+
+    def is_known(self, source, symbol, market):
+        return self.symbol_id(source, symbol, market) is not None
+
+
+_resolver = None
+
+
+def get_resolver(conn, reload=False):
+    """Process-wide SymbolResolver, loaded on first use (and after sync_symbol_master)."""
+    global _resolver
+    if _resolver is None or reload:
+        _resolver = SymbolResolver(conn)
+    return _resolver
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync symbol_master / symbol_map from the master tables')
+    parser.add_argument('--market', nargs='+', choices=sorted(MARKET_SOURCES), default=sorted(MARKET_SOURCES),
+                        help='Markets to sync (default: all)')
+    args = parser.parse_args()
+
+    log_dir = "logs"
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(log_dir, "symbol_master.log")),
+            logging.StreamHandler()
+        ]
+    )
+
+    conn = pyodbc.connect(
+        f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={server};"
+        f"DATABASE={database};Trusted_Connection=yes;"
+    )
+    try:
+        for market in args.market:
+            sync_symbol_master(conn, market)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()